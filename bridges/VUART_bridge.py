@@ -69,7 +69,7 @@ class VUART_bridge(ConsoleBridge):
     # Max timeout value (in seconds)
     MAX_TIMEOUT = 5
 
-    def __init__(self, interface, port, verbose=False):
+    def __init__(self, interface, port, verbose=False, pool=None):
         '''
         Constructor
 
@@ -78,6 +78,7 @@ class VUART_bridge(ConsoleBridge):
             port (str) : Port number or IP/mask. Examples: "01:00.0" for pci, and
             "192.168.1.1" for ethernet.
             verbose (bool) : Enables verbose output
+            pool (EthBonePool) : Share the Etherbone socket/device handles with other bridges
 
         Raises:
             BadData exception if any of the input parameters are not valid.
@@ -94,6 +95,7 @@ class VUART_bridge(ConsoleBridge):
         self.port = "udp/"+port
         self.bus = None
         self.verbose = verbose
+        self.pool = pool
 
     def open(self, ethbone_dbg=False):
         '''
@@ -107,17 +109,15 @@ class VUART_bridge(ConsoleBridge):
         '''
         if self.interface == 'eth':
             try:
-                self.bus = EthBone(self.port, False)
+                self.bus = EthBone(self.port, False, self.pool)
             except BusCritical:
                 BadData(4, self.port)
         elif self.interface == 'pci':
             raise Error(1, "PCI bus not implemented")
 
         # Look for VUART address in the sdb bus
-        sdb = SDBNode(self.bus, None)
-        sdb.base = sdb.scan()
-        sdb.parse()
-        self.VUART_OFFSET = sdb.findProduct(self.VENDOR_ID_CERN, self.WR_UART_ID)[0][1] # Check this assignment
+        sdb = SDBNode.parse_cached(self.bus, self.port, lazy=True)
+        self.VUART_OFFSET = sdb.findProduct(self.VENDOR_ID_CERN, self.WR_UART_ID, first=True)[0][1] # Check this assignment
         if self.verbose:
             print("VUART address is 0x%x" % (self.VUART_OFFSET))
 
@@ -251,6 +251,30 @@ class VUART_bridge(ConsoleBridge):
         #TODO: put the following setences inside a try-except block
         return self.bus.devread(bar, offset, width)
 
+    def devblockread(self, bar, offset, bsize, incr=0x4):
+        '''
+        Method that read a data block through the bus (see GenDrvr.devblockread())
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            bsize : size in bytes
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        return self.bus.devblockread(bar, offset, bsize, incr)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''
+        Method that write a data block through the bus (see GenDrvr.devblockwrite())
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            ldata : list of data to write
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        return self.bus.devblockwrite(bar, offset, ldata, incr)
+
     @staticmethod
     def scan(bus="all", subnet="192.168.7.0/24"):
         '''
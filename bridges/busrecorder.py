@@ -0,0 +1,329 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+This file contains the BusRecorder class which wraps any child of the abstract class GenDrv (gendrvr.py)
+to log its accesses in a binary file, and the BusReplayer class to play them again.
+
+    bus=BusRecorder(EthBone("udp/192.168.7.2"), "session.p7sbus")
+    ... ##i.e. update the flash
+    bus.close()
+
+    rep=BusReplayer("session.p7sbus")
+    print rep.replay(SimBus())  ##(operations, seconds, read mismatches)
+
+Log file
+========
+
+The file starts with a 8 bytes magic (LOG_MAGIC) followed by fixed size
+records (LOG_RECORD, 32 bytes little endian):
+
+    +-----------+---------+-------+-------+----+-------+--------+------+
+    | time (d)  | address | value | count | op | width | status | incr |
+    +-----------+---------+-------+-------+----+-------+--------+------+
+
+time is in seconds from the opening of the log. A block operation logs its
+number of words in count; when status has LOG_DATA, count 32bits words
+follow the record. A transaction is logged as a LOG_TRANSACTION record
+followed by count records, one per operation.
+
+@file
+@date Created on Oct 16, 2026
+@copyright LGPL v2.1
+@see http://www.ohwr.org
+@see http://www.sevensols.com
+@ingroup bridges
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import time
+import struct
+from array import array
+
+# Import common modules
+from core.gendrvr import *
+
+LOG_MAGIC       = "P7SBUS\x00\x01"
+LOG_RECORD      = struct.Struct("<dQQIBBBB")
+
+## Operations
+LOG_READ        = 0x01
+LOG_WRITE       = 0x02
+LOG_RMW         = 0x03
+LOG_BLOCKREAD   = 0x04
+LOG_BLOCKWRITE  = 0x05
+LOG_TRANSACTION = 0x06
+
+## Status
+LOG_OK          = 0x00
+LOG_WARNING     = 0x01 ## The operation raised a BusWarning
+LOG_CRITICAL    = 0x02 ## The operation raised a BusCritical
+LOG_DATA        = 0x80 ## The words of the block follow the record
+
+_LOG_KINDS={BusTransaction.OP_READ: LOG_READ, BusTransaction.OP_WRITE: LOG_WRITE, BusTransaction.OP_RMW: LOG_RMW}
+
+
+class BusRecorder(GenDrvr):
+    '''
+    The BusRecorder class logs the accesses done through another driver.
+
+    The records are packed in memory and written to the file by flush(), which
+    is called when flush_records records are pending, on the first record after
+    flush_period seconds, and by close_log() (called by close() and when the
+    recorder is deleted). The other methods and attributes of the wrapped
+    driver are still reachable.
+    '''
+
+    def __init__(self, bus, fpath, data=True, flush_records=4096, flush_period=1.0):
+        '''Constructor
+
+        Args:
+            bus : driver to record (any GenDrvr child)
+            fpath : path of the log file (overwritten)
+            data : log the words of the block operations
+            flush_records : number of pending records that triggers a flush
+            flush_period : maximum seconds between two flushes
+        '''
+        self.bus=bus
+        self.bar=bus.bar
+        self.libname=getattr(bus, "libname", type(bus).__name__)
+        self.data=data
+        self.flush_records=flush_records
+        self.flush_period=flush_period
+        self.nrecords=0
+        self._pending=[]
+        self.f=open(fpath, "wb")
+        self.f.write(LOG_MAGIC)
+        self.t0=time.time()
+        self._lastflush=self.t0
+
+    def __del__(self):
+        if self.__dict__.get("f") is not None: self.close_log()
+
+    def __getattr__(self, name):
+        ## Only called for the attributes that we don't have (i.e. readconfig())
+        if name=="bus": raise AttributeError(name)
+        return getattr(self.bus, name)
+
+    def _log(self, t, op, address, width, value, status, count=0, incr=0, words=None):
+        if words is not None and self.data: status|=LOG_DATA
+        self._pending.append(LOG_RECORD.pack(t, address, value & 0xFFFFFFFFFFFFFFFF, count, op, width, status, incr))
+        if status & LOG_DATA: self._pending.append(array('I', words).tostring())
+        self.nrecords+=1
+        if len(self._pending)>=self.flush_records or time.time()-self._lastflush>=self.flush_period: self.flush()
+
+    def flush(self):
+        ''' Write the pending records to the log file '''
+        if self.f is None: return
+        self.f.write("".join(self._pending))
+        self.f.flush()
+        self._pending=[]
+        self._lastflush=time.time()
+
+    @staticmethod
+    def _status(e):
+        return LOG_CRITICAL if isinstance(e, BusCritical) else LOG_WARNING
+
+    def devread(self, bar, offset, width):
+        t=time.time()-self.t0
+        try:
+            datum=self.bus.devread(bar, offset, width)
+        except BusException, e:
+            self._log(t, LOG_READ, offset, width, 0, self._status(e))
+            raise
+        self._log(t, LOG_READ, offset, width, datum, LOG_OK)
+        return datum
+
+    def devwrite(self, bar, offset, width, datum):
+        t=time.time()-self.t0
+        status=LOG_OK
+        try:
+            return self.bus.devwrite(bar, offset, width, datum)
+        except BusException, e:
+            status=self._status(e)
+            raise
+        finally:
+            self._log(t, LOG_WRITE, offset, width, datum, status)
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        t=time.time()-self.t0
+        nwords=self.bufferWords(buf)
+        try:
+            ret=self.bus.devblockread_into(bar, offset, buf, incr)
+        except BusException, e:
+            self._log(t, LOG_BLOCKREAD, offset, 4, 0, self._status(e), nwords, incr)
+            raise
+        words=None
+        if self.data:
+            words=array('I')
+            words.fromstring((buf.tobytes() if isinstance(buf, memoryview) else buffer(buf))[:4*nwords])
+        self._log(t, LOG_BLOCKREAD, offset, 4, 0, LOG_OK, nwords, incr, words)
+        return ret
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        t=time.time()-self.t0
+        words=self.toWords(ldata)
+        status=LOG_OK
+        try:
+            return self.bus.devblockwrite(bar, offset, words, incr)
+        except BusException, e:
+            status=self._status(e)
+            raise
+        finally:
+            self._log(t, LOG_BLOCKWRITE, offset, 4, 0, status, len(words), incr, words)
+
+    def commit_transaction(self, ops):
+        t=time.time()-self.t0
+        status=LOG_OK
+        try:
+            self.bus.commit_transaction(ops)
+        except BusException, e:
+            status=self._status(e)
+            raise
+        finally:
+            self._log(t, LOG_TRANSACTION, ops[0][1] if ops else 0, 0, 0, status, len(ops))
+            for kind, offset, width, datum, mask, fut in ops:
+                ## RMW logs the mask in the upper half of its value (32bits registers)
+                if kind==BusTransaction.OP_RMW: value=(mask << 32) | (datum & 0xFFFFFFFF)
+                elif kind==BusTransaction.OP_WRITE: value=datum
+                else: value=fut.value if fut.done and fut.error is None else 0
+                self._log(t, _LOG_KINDS[kind], offset, width, value, status)
+
+    def open(self, LUN):
+        ''' Open the wrapped driver '''
+        return self.bus.open(LUN)
+
+    def close_log(self):
+        ''' Flush the pending records and close the log file, the wrapped driver stays opened '''
+        if self.f is not None:
+            self.flush()
+            self.f.close()
+            self.f=None
+
+    def close(self):
+        ''' Close the log file and the wrapped driver '''
+        self.close_log()
+        return self.bus.close()
+
+    def getsdbroot(self):
+        """return the address of the SDB root known by the wrapped driver"""
+        return self.bus.getsdbroot()
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "BusRecorder: %s" % (self.bus.info())
+
+    @staticmethod
+    def scan(options=None):
+        '''
+        Nothing to scan, use the scan() method of the wrapped driver
+        '''
+        return []
+
+
+class BusReplayer(object):
+    '''
+    The BusReplayer class reads a log of BusRecorder and plays it against a bus
+    '''
+
+    def __init__(self, fpath):
+        '''Constructor
+
+        Args:
+            fpath : path of the log file
+
+        Raises:
+            BusCritical: if the file is not a log of BusRecorder
+        '''
+        self.fpath=fpath
+        with open(fpath, "rb") as f:
+            if f.read(len(LOG_MAGIC))!=LOG_MAGIC: raise BusCritical("%s is not a bus log" % (fpath))
+
+    def records(self):
+        '''
+        Iterate over the records of the log
+
+        Returns:
+            A generator of (time, op, address, width, value, status, count, incr, words) tuples,
+            words is an array('I') for the block operations with LOG_DATA, None otherwise
+        '''
+        size=LOG_RECORD.size
+        with open(self.fpath, "rb") as f:
+            f.seek(len(LOG_MAGIC))
+            while True:
+                rec=f.read(size)
+                if len(rec)<size: break
+                t, address, value, count, op, width, status, incr = LOG_RECORD.unpack(rec)
+                words=None
+                if status & LOG_DATA:
+                    words=array('I')
+                    words.fromstring(f.read(4*count))
+                yield (t, op, address, width, value, status, count, incr, words)
+
+    def replay(self, bus, timing=False, check=False):
+        '''
+        Do the logged accesses again on a bus
+
+        The operations that failed when recording are done as well, their
+        errors are ignored. When the bus is a BusRecorder, its pending records
+        are flushed at the end.
+
+        Args:
+            bus : driver where the accesses are done (i.e. a SimBus)
+            timing : wait to reproduce the time between operations, otherwise run at full speed
+            check : count the reads that do not return the logged value
+
+        Returns:
+            A tuple (number of operations, elapsed seconds, read mismatches)
+        '''
+        nops=0
+        mismatches=0
+        start=time.time()
+        it=self.records()
+        for t, op, address, width, value, status, count, incr, words in it:
+            status&=~LOG_DATA ## Only keep the error bits
+            if timing:
+                delay=t-(time.time()-start)
+                if delay>0: time.sleep(delay)
+            try:
+                if op==LOG_READ:
+                    rd=bus.devread(bus.bar, address, width)
+                    if check and not status and rd!=value: mismatches+=1
+                elif op==LOG_WRITE:
+                    bus.devwrite(bus.bar, address, width, value)
+                elif op==LOG_BLOCKREAD:
+                    rd=bus.devblockread(bus.bar, address, 4*count, incr)
+                    if check and words is not None and not status and list(rd)!=list(words): mismatches+=1
+                elif op==LOG_BLOCKWRITE:
+                    bus.devblockwrite(bus.bar, address, words if words is not None else [0]*count, incr)
+                elif op==LOG_TRANSACTION:
+                    trans=bus.transaction()
+                    checks=[]
+                    for i in xrange(count):
+                        top, taddress, twidth, tvalue, tstatus = next(it)[1:6]
+                        if top==LOG_WRITE: trans.write(taddress, tvalue, twidth)
+                        elif top==LOG_RMW: trans.rmw(taddress, tvalue >> 32, tvalue & 0xFFFFFFFF, twidth)
+                        else: checks.append((trans.read(taddress, twidth), tvalue))
+                    trans.commit()
+                    if check and not status: mismatches+=sum(1 for fut, v in checks if fut.value!=v)
+            except BusException:
+                if not status: raise
+            nops+=1
+        if isinstance(bus, BusRecorder): bus.flush()
+        return (nops, time.time()-start, mismatches)
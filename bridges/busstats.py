@@ -0,0 +1,335 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+This file contains the BusStats class which wraps any child of the abstract class GenDrv (gendrvr.py)
+to count its accesses and measure their latency.
+
+    bus=BusStats(EthBone("udp/192.168.7.2"))
+    sdb=SDBNode(bus, None)
+    sdb.parse()
+    bus.add_sdb(sdb)  ##Account the accesses per SDB device
+    ...
+    bus.dump()
+
+The instrumentation is only done while it is enabled: bus.enable(False) binds the
+methods of the wrapped driver so that the wrapper has no overhead anymore.
+
+@file
+@date Created on Oct 16, 2026
+@copyright LGPL v2.1
+@see http://www.ohwr.org
+@see http://www.sevensols.com
+@ingroup bridges
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import sys
+import time
+import bisect
+
+# Import common modules
+from core.gendrvr import *
+
+
+class RangeStats(object):
+    '''
+    Counters of the accesses done in an address range
+    '''
+
+    def __init__(self, name, first=0, last=0xFFFFFFFFFFFFFFFF):
+        self.name=name
+        self.first=first
+        self.last=last
+        self.reads=0
+        self.writes=0
+        self.blockreads=0
+        self.blockwrites=0
+        self.bytes=0
+        self.errors=0
+
+    def todict(self):
+        return dict((k, getattr(self, k)) for k in ("first", "last", "reads", "writes", "blockreads", "blockwrites", "bytes", "errors"))
+
+
+class LatencyStats(object):
+    '''
+    Latency histogram of an operation type
+
+    The bucket i counts the operations that took [2^(i-1), 2^i) microseconds
+    (the bucket 0 those under a microsecond).
+    '''
+    NBUCKETS=32
+
+    def __init__(self, name):
+        self.name=name
+        self.count=0
+        self.total=0.0
+        self.min=None
+        self.max=0.0
+        self.hist=[0]*self.NBUCKETS
+
+    def add(self, latency):
+        self.count+=1
+        self.total+=latency
+        if self.min is None or latency<self.min: self.min=latency
+        if latency>self.max: self.max=latency
+        self.hist[min(int(latency*1e6).bit_length(), self.NBUCKETS-1)]+=1
+
+    def todict(self):
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max, "hist": list(self.hist)}
+
+
+class BusStats(GenDrvr):
+    '''
+    The BusStats class counts the accesses done through another driver.
+
+    The reads, writes, block operations, bytes and errors are counted per address
+    range (see add_range() and add_sdb()), the accesses out of any range are
+    counted in the "other" range. The latency of each operation type (devread,
+    devwrite, devblockread, devblockwrite, transaction) is kept in a log2 histogram.
+
+    The other methods and attributes of the wrapped driver are still reachable.
+    '''
+    OPS=("devread", "devwrite", "devblockread", "devblockwrite", "transaction")
+    WRAPPED=("devread", "devwrite", "devblockread_into", "devblockwrite", "commit_transaction")
+
+    def __init__(self, bus, enabled=True, dump_period=0, dumpfile=None):
+        '''Constructor
+
+        Args:
+            bus : driver to instrument (any GenDrvr child)
+            enabled : start counting right now
+            dump_period : dump the statistics every dump_period seconds (0 to disable)
+            dumpfile : file where the statistics are dumped (stdout by default)
+        '''
+        self.bus=bus
+        self.bar=bus.bar
+        self.libname=getattr(bus, "libname", type(bus).__name__)
+        self.dump_period=dump_period
+        self.dumpfile=dumpfile
+        self._starts=[]
+        self._ranges=[]
+        self._index=None ## (bounds, owners) built by getrange() on the first access
+        self.reset()
+        self.enable(enabled)
+
+    def __getattr__(self, name):
+        ## Only called for the attributes that we don't have (i.e. readconfig())
+        if name=="bus": raise AttributeError(name)
+        return getattr(self.bus, name)
+
+    def enable(self, enabled=True):
+        '''
+        Enable or disable the instrumentation
+
+        When disabled, the methods of the wrapped driver are called directly.
+        '''
+        self.enabled=enabled
+        for name in self.WRAPPED:
+            if enabled: self.__dict__.pop(name, None)
+            else: setattr(self, name, getattr(self.bus, name))
+        self._lastdump=time.time()
+
+    def reset(self):
+        ''' Clear all the counters (the ranges are kept) '''
+        self.other=RangeStats("other")
+        for r in self._ranges: r.__init__(r.name, r.first, r.last)
+        self.latency=dict((op, LatencyStats(op)) for op in self.OPS)
+
+    def add_range(self, name, first, size):
+        '''
+        Count separately the accesses done in [first, first+size)
+
+        Args:
+            name : name of the range in the statistics
+            first : first address of the range
+            size : size in bytes
+        '''
+        r=RangeStats(name, first, first+size-1)
+        i=bisect.bisect_left(self._starts, first)
+        self._starts.insert(i, first)
+        self._ranges.insert(i, r)
+        self._index=None
+        return r
+
+    def add_sdb(self, node):
+        '''
+        Add a range for each device of a parsed SDB tree
+
+        Args:
+            node : SDBNode already parsed
+        '''
+        for e, addr, buspath in node.walk():
+            self.add_range("%s %s" % (buspath, e.name.strip()), addr, e.addr_end-e.addr_first+1)
+
+    def buildIndex(self):
+        '''
+        Flatten the ranges in sorted segments that do not overlap
+
+        Within nested ranges (i.e. a bridge and its devices) an address belongs
+        to the innermost one, the one with the highest first address.
+
+        Returns:
+            The (bounds, owners) lists: [bounds[i], bounds[i+1]) is counted in owners[i] (None for other)
+        '''
+        bounds=sorted(set([r.first for r in self._ranges]+[r.last+1 for r in self._ranges]))
+        owners=[]
+        inside=[]
+        j=0
+        for b in bounds:
+            ## The ranges starting here are the innermost ones until they end
+            while j<len(self._ranges) and self._ranges[j].first<=b:
+                inside.append(self._ranges[j])
+                j=j+1
+            inside=[r for r in inside if r.last>=b]
+            owners.append(inside[-1] if inside else None)
+        self._index=(bounds, owners)
+        return self._index
+
+    def getrange(self, offset):
+        ''' Return the RangeStats where offset is counted '''
+        bounds, owners = self._index or self.buildIndex()
+        i=bisect.bisect_right(bounds, offset)-1
+        if i>=0 and owners[i] is not None: return owners[i]
+        return self.other
+
+    def stats(self):
+        '''
+        Return the statistics
+
+        Returns:
+            A dictionary {"ranges": {name: counters}, "latency": {operation: histogram}}
+        '''
+        ranges=dict((r.name, r.todict()) for r in self._ranges+[self.other])
+        return {"ranges": ranges, "latency": dict((op, l.todict()) for op, l in self.latency.items())}
+
+    def dump(self, out=None):
+        '''
+        Print the statistics
+
+        Args:
+            out : file where they are written (self.dumpfile or stdout by default)
+        '''
+        out=out or self.dumpfile or sys.stdout
+        out.write("%-32s %10s %10s %8s %8s %12s %6s\n" % ("Range", "Reads", "Writes", "BlkRd", "BlkWr", "Bytes", "Errors"))
+        for r in self._ranges+[self.other]:
+            if r.reads or r.writes or r.blockreads or r.blockwrites or r.errors:
+                out.write("%-32s %10d %10d %8d %8d %12d %6d\n" % (r.name[:32], r.reads, r.writes, r.blockreads, r.blockwrites, r.bytes, r.errors))
+        for op in self.OPS:
+            l=self.latency[op]
+            if not l.count: continue
+            out.write("%-16s %8d ops, avg %10.1f us, min %10.1f us, max %10.1f us\n" % (op, l.count, 1e6*l.total/l.count, 1e6*l.min, 1e6*l.max))
+            out.write("    " + " ".join("<%dus:%d" % (1 << i, n) for i, n in enumerate(l.hist) if n) + "\n")
+        out.flush()
+        self._lastdump=time.time()
+
+    def _account(self, op, start, end):
+        self.latency[op].add(end-start)
+        if self.dump_period and end-self._lastdump>=self.dump_period: self.dump()
+
+    def devread(self, bar, offset, width):
+        r=self.getrange(offset)
+        start=time.time()
+        try:
+            datum=self.bus.devread(bar, offset, width)
+        except BusException:
+            r.errors+=1
+            raise
+        self._account("devread", start, time.time())
+        r.reads+=1
+        r.bytes+=width
+        return datum
+
+    def devwrite(self, bar, offset, width, datum):
+        r=self.getrange(offset)
+        start=time.time()
+        try:
+            ret=self.bus.devwrite(bar, offset, width, datum)
+        except BusException:
+            r.errors+=1
+            raise
+        self._account("devwrite", start, time.time())
+        r.writes+=1
+        r.bytes+=width
+        return ret
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        r=self.getrange(offset)
+        start=time.time()
+        try:
+            ret=self.bus.devblockread_into(bar, offset, buf, incr)
+        except BusException:
+            r.errors+=1
+            raise
+        self._account("devblockread", start, time.time())
+        r.blockreads+=1
+        r.bytes+=4*self.bufferWords(buf)
+        return ret
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        r=self.getrange(offset)
+        words=self.toWords(ldata)
+        start=time.time()
+        try:
+            ret=self.bus.devblockwrite(bar, offset, words, incr)
+        except BusException:
+            r.errors+=1
+            raise
+        self._account("devblockwrite", start, time.time())
+        r.blockwrites+=1
+        r.bytes+=4*len(words)
+        return ret
+
+    def commit_transaction(self, ops):
+        start=time.time()
+        try:
+            self.bus.commit_transaction(ops)
+        except BusException:
+            self.getrange(ops[0][1]).errors+=1
+            raise
+        self._account("transaction", start, time.time())
+        for kind, offset, width, datum, mask, fut in ops:
+            r=self.getrange(offset)
+            if kind!=BusTransaction.OP_WRITE: r.reads+=1
+            if kind!=BusTransaction.OP_READ: r.writes+=1
+            r.bytes+=width
+
+    def open(self, LUN):
+        ''' Open the wrapped driver '''
+        return self.bus.open(LUN)
+
+    def close(self):
+        ''' Close the wrapped driver '''
+        return self.bus.close()
+
+    def getsdbroot(self):
+        """return the address of the SDB root known by the wrapped driver"""
+        return self.bus.getsdbroot()
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "BusStats: %s" % (self.bus.info())
+
+    @staticmethod
+    def scan(options=None):
+        '''
+        Nothing to scan, use the scan() method of the wrapped driver
+        '''
+        return []
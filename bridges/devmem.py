@@ -30,8 +30,12 @@ This file contains the DevMem class which is a child of the abstract class GenDr
 #                                            Import                           --
 #-------------------------------------------------------------------------------
 # Import system modules
-import subprocess
 import os
+import stat
+import glob
+import mmap
+import struct
+from array import array
 
 # Import common modules
 from core.gendrvr import *
@@ -39,68 +43,181 @@ from core.gendrvr import *
 class DevMem(GenDrvr):
     '''Class to interface all embedded devices that map the FPGA address space.
 
-    The DevMem class has been created to interface in a slow but universal
+    The DevMem class has been created to interface in a fast and universal
     way all embedded devices that map the FPGA address space by using /dev/mem
     devices.
 
-    This class simply used the `devmem` command tool to write/read value using
-    calls to the OS terminal.
+    The device (/dev/mem, /dev/uioX or any regular file) is mapped once, when
+    it is opened or on the first access, and all the accesses are then done
+    through the mapping. On a character device the blocks are accessed word
+    by word so that the registers only see 32bits accesses.
 
     Attributes:
-        bar : Bar is the offset that need to be used by devmem
+        bar : Bar is the physical address where the FPGA address space starts
+        size : Size in bytes of the mapped window
     '''
 
-    def __init__(self, bar, verbose=False):
+    DEFAULT_SIZE = 0x100000 ## Size of the window mapped on character devices (1MB)
+
+    def __init__(self, bar, verbose=False, LUN="/dev/mem", size=None):
         '''
         Constructor
 
         Args:
-            bar : he offset that need to be used by devmem
+            bar : physical address of the FPGA address space (0 for UIO devices or files)
+            verbose : enables debug info
+            LUN : path of the device to map (/dev/mem, /dev/uio0, a regular file...)
+            size : size in bytes of the window, by default the size of a regular
+            file or DEFAULT_SIZE for a device.
         '''
         self.bar=bar
         self.verbose = verbose
+        self.size=size
+        self.LUN=LUN
+        self.fd=None
+        self.mem=None
+        self.chardev=False
+        ## Native formats: each access is a single load/store of the width (the standard "=" ones go byte by byte)
+        self._structs={1: struct.Struct("@B"), 2: struct.Struct("@H"), 4: struct.Struct("@I"), 8: struct.Struct("@Q")}
+
+    def __del__(self):
+        self.close()
 
     def open(self, LUN):
-        '''Do nothing
+        '''Open the device and map the window starting at bar
+
+        The mapping has to start on a page, so we map from the page that contains bar.
         '''
+        self.LUN=LUN
+        try:
+            self.fd=os.open(LUN, os.O_RDWR | getattr(os,"O_SYNC",0))
+        except EnvironmentError, e:
+            raise BusCritical("Could not open %s: %s" %(LUN, e))
+        try:
+            self.base=self.bar & ~(mmap.PAGESIZE-1)
+            size=self.size
+            st=os.fstat(self.fd)
+            self.chardev=stat.S_ISCHR(st.st_mode)
+            if size is None:
+                size=st.st_size-self.bar if stat.S_ISREG(st.st_mode) else self.DEFAULT_SIZE
+            self.length=(self.bar-self.base)+size
+            self.mem=mmap.mmap(self.fd, self.length, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE, offset=self.base)
+        except (EnvironmentError, ValueError, OverflowError), e:
+            self.close()
+            raise BusCritical("Could not map %s @0x%08x: %s" %(LUN, self.bar, e))
         if self.verbose:
-            print "opened"
-
+            print "%s mapped @0x%08X (%d bytes)" %(LUN, self.bar, self.length)
 
     def close(self):
-        '''Do nothing
+        '''Unmap and close the device
         '''
-        if self.verbose:
-            print "closed"
+        if self.mem is not None:
+            self.mem.close()
+            self.mem=None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd=None
+            if self.verbose:
+                print "closed"
+
+    def _index(self, bar, offset, nbytes):
+        ''' Return the index in the mapping of the physical address bar+offset '''
+        if self.mem is None:
+            if not self.LUN: raise BusCritical("DevMem is not opened")
+            self.open(self.LUN)
+        idx=bar+offset-self.base
+        if idx<0 or idx+nbytes>self.length:
+            raise BusWarning("Address 0x%08X out of the mapped window [0x%08X-0x%08X]" %(bar+offset, self.base, self.base+self.length))
+        return idx
 
     def devread(self, bar, offset, width):
-        '''Method that do a read on the devices using /dev/mem device
+        '''Method that do a read on the devices using the mapping of /dev/mem
 
         Args:
             bar : BAR used by PCIe bus
             offset : address within bar
-            width : data size (1, 2, or 4 bytes)
+            width : data size (1, 2, 4 or 8 bytes)
         '''
-        ret=subprocess.check_output(["devmem","0x%08X" %(bar+offset), "%d" %(width*8)]).rstrip()
+        idx=self._index(bar, offset, width) ## Maps the device on the first access
+        ret=self._structs[width].unpack_from(self.mem, idx)[0]
         if self.verbose:
-            print "%s (devmem 0x%08X)" % (ret, bar+offset)
-        return c_uint(int(ret,0)).value;
+            print "0x%x (devmem 0x%08X)" % (ret, bar+offset)
+        return ret
 
 
     def devwrite(self, bar, offset, width, datum):
-        '''Method that do a write on the devices using /dev/mem device
+        '''Method that do a write on the devices using the mapping of /dev/mem
 
         Args:
             bar : BAR used by PCIe bus
             offset : address within bar
-            width : data size (1, 2, or 4 bytes)
+            width : data size (1, 2, 4 or 8 bytes)
             datum : data value that need to be written
         '''
-        data = c_uint(datum)
-        #print "0x%x => 0x%x" % (datum, data.value)
-        cmd="devmem 0x%08X %d 0x%08x" %(bar+offset, width*8,data.value)
         if self.verbose:
-            print cmd
-        ret=os.system(cmd)
-        if ret !=0:
-            raise BusException("Bad return while Writing @ 0x%x \n(%s)" %(bar+offset,cmd))
+            print "devmem 0x%08X %d 0x%08x" %(bar+offset, width*8, datum)
+        idx=self._index(bar, offset, width) ## Maps the device on the first access
+        self._structs[width].pack_into(self.mem, idx, datum & ((1 << 8*width)-1))
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that read a data block directly from the mapped window
+
+        On a character device (i.e. /dev/mem) the words are read one by one, a
+        slice copy of the mapping could do byte or 64bits bus accesses.
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        nwords=self.bufferWords(buf)
+        if nwords==0: return buf
+        idx=self._index(bar, offset, 4)
+        self._index(bar, offset+(nwords-1)*incr, 4)
+        if incr==4 and not self.chardev:
+            words=array('I')
+            words.fromstring(self.mem[idx:idx+nwords*4])
+        else:
+            unpack_from, mem = self._structs[4].unpack_from, self.mem
+            words=array('I',[unpack_from(mem, idx+i*incr)[0] for i in xrange(nwords)])
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''Method that write a data block directly into the mapped window
+
+        On a character device (i.e. /dev/mem) the words are written one by one,
+        a slice copy of the mapping could do byte or 64bits bus accesses.
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        nwords=len(words)
+        if nwords==0: return 0
+        idx=self._index(bar, offset, 4)
+        self._index(bar, offset+(nwords-1)*incr, 4)
+        if incr==4 and not self.chardev:
+            self.mem[idx:idx+nwords*4]=words.tostring()
+        else:
+            pack_into, mem = self._structs[4].pack_into, self.mem
+            for i in xrange(nwords):
+                pack_into(mem, idx+i*incr, words[i])
+        return 0
+
+    @staticmethod
+    def scan(options=None):
+        '''
+        Method that list the devices that can be mapped (/dev/mem and UIO devices)
+
+        Returns:
+            A list with the path of the devices
+        '''
+        return [p for p in ["/dev/mem"] if os.path.exists(p)]+sorted(glob.glob("/dev/uio*"))
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "DevMem: %s @0x%08X" %(self.LUN, self.bar)
@@ -69,20 +69,24 @@ Install lua libraries
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
 # Import system modules
-import subprocess
 import os
 import sys
 from ctypes import *
 import time
 import struct
-import math
+import select
+import socket
+import errno
+import random
 import platform
 import binascii
-from subprocess import check_output
+import itertools
+from array import array
 
 # Import common modules
 from core.gendrvr import *
-from core.p7sException import p7sException
+from core.p7sException import p7sException, BadData
+from core.ewberrno import Ewberrno
 
 EB_PROTOCOL_VERSION = 1
 EB_ABI_VERSION      = 0x04
@@ -90,13 +94,160 @@ EB_BUS_MODEL        = [0x44,0x88][sys.maxsize > 2**32]
 EB_MEMORY_MODEL     = 0x0000
 EB_ABI_CODE         = ((EB_ABI_VERSION << 8) + EB_BUS_MODEL + EB_MEMORY_MODEL)
 
+## Width of eb_address_t/eb_data_t in the library according to the bus model (32 or 64 bits)
+eb_address_t = [c_uint32, c_uint64][EB_BUS_MODEL == 0x88]
+eb_data_t    = [c_uint32, c_uint64][EB_BUS_MODEL == 0x88]
+
+## Prototypes of the libetherbone functions: (restype, argtypes)
+## Declaring them let us pass python integers without wrapping each of them in a ctypes object.
+## The handles (eb_socket_t, eb_device_t, eb_cycle_t) are stored in c_uint and the
+## callbacks/user data are passed as void pointers (0 or None for a blocking call).
+EB_PROTOTYPES = {
+    'eb_socket_open'         : (c_int, [c_uint16, c_char_p, c_uint8, c_void_p]),
+    'eb_socket_close'        : (c_int, [c_uint]),
+    'eb_socket_run'          : (c_long, [c_uint, c_long]),
+    'eb_device_open'         : (c_int, [c_uint, c_char_p, c_uint8, c_int, c_void_p]),
+    'eb_device_close'        : (c_int, [c_uint]),
+    'eb_device_read'         : (c_int, [c_uint, eb_address_t, c_uint8, c_void_p, c_void_p, c_void_p]),
+    'eb_device_write'        : (c_int, [c_uint, eb_address_t, c_uint8, eb_data_t, c_void_p, c_void_p]),
+    'eb_cycle_open'          : (c_int, [c_uint, c_void_p, c_void_p, c_void_p]),
+    'eb_cycle_close'         : (c_int, [c_uint]),
+    'eb_cycle_close_silently': (c_int, [c_uint]),
+    'eb_cycle_read'          : (None, [c_uint, eb_address_t, c_uint8, c_void_p]),
+    'eb_cycle_write'         : (None, [c_uint, eb_address_t, c_uint8, eb_data_t]),
+    'eb_cycle_read_config'   : (None, [c_uint, eb_address_t, c_uint8, c_void_p]),
+    'eb_operation_next'      : (c_uint16, [c_uint16]),
+    'eb_operation_had_error' : (c_int, [c_uint16]),
+    'eb_operation_address'   : (eb_address_t, [c_uint16]),
+}
+EB_NULL = 0xFFFF ## Null handle (i.e. end of the list of operations)
+
+## Etherbone wire protocol (used to probe devices without libetherbone)
+EB_UDP_PORT       = 0xEBD0
+EB_MAGIC          = 0x4E6F
+EB_FLAG_PF        = 0x01 ## Probe flag
+EB_FLAG_PR        = 0x02 ## Probe response flag
+
+## Config space registers of the Etherbone slave
+EB_CONFIG_ERR_HI  = 0x00 ## Error shift register (one bit per WB operation, bit0 is the last one)
+EB_CONFIG_ERR_LO  = 0x04
+EB_CONFIG_SDB_HI  = 0x08 ## Address of the SDB root
+EB_CONFIG_SDB_LO  = 0x0C
+
+## Size of the Etherbone packets used to split large block transfers
+EB_UDP_MTU        = 1500 ## Default Ethernet MTU
+EB_UDP_OVERHEAD   = 28   ## IPv4 + UDP headers
+EB_MAX_RECORD_OPS = 255  ## WCount/RCount of an Etherbone record are 8 bits
+
+## void (*eb_callback_t)(eb_user_data_t user, eb_device_t dev, eb_operation_t op, eb_status_t status)
+eb_callback_t = CFUNCTYPE(None, c_void_p, c_uint16, c_uint16, c_int)
+
 PYDIR=os.path.dirname(os.path.abspath(__file__))
+EB_LIBPATH="%s/../lib/libetherbone.so" % PYDIR
+
+def eb_data_to_words(dataVec, nwords):
+    '''
+    Convert a ctypes vector of eb_data_t into an array('I') in bulk
+
+    Args:
+        dataVec: ctypes array of eb_data_t filled by the library
+        nwords: number of words to convert
+
+    Returns:
+        An array('I') with the lowest 32bits of each eb_data_t
+    '''
+    words=array('I')
+    words.fromstring(string_at(dataVec,nwords*sizeof(eb_data_t)))
+    if sizeof(eb_data_t)==8:
+        words=words[::2] if sys.byteorder=='little' else words[1::2]
+    return words
+
+## Asynchronous cycles waiting for completion: {tag: (ondone(status, op), inflight_set)}
+_eb_pending = {}
+_eb_tags = itertools.count(1)
+
+def _eb_cycle_done(user, dev, op, status):
+    '''
+    Callback called by libetherbone (inside eb_socket_run) when an asynchronous cycle completes.
+
+    Exceptions can not be propagated through ctypes callbacks, so errors are
+    stored in the future of the transfer by the ondone() handler. The list of
+    operations (op) is only valid during the callback.
+    '''
+    rec=_eb_pending.pop(user, None)
+    if rec is None: return
+    ondone, inflight = rec
+    inflight.discard(user)
+    ondone(status, op)
 
-def py_cb_func(user, dev, op, status):
-     if status: raise NameError('Callback Error: %s' % (status))
-     print "%x" %(status)
+
+class _EBTransfer(object):
+    '''
+    Track the cycles of a (possibly chunked) asynchronous transfer and resolve
+    its future when the last one completes.
+    '''
+
+    def __init__(self, fut, result, keep=None):
+        '''
+        Args:
+            fut: BusFuture of the whole transfer
+            result: callable that returns the value of the future on success
+            keep: memory the library writes into (i.e. the vector of a read), kept
+            alive until all the cycles have completed, even if the caller gave up waiting
+        '''
+        self.fut=fut
+        self.result=result
+        self.keep=keep
+        self.remaining=0
+        self.sealed=False
+        self.error=None
+
+    def ondone(self, offset):
+        ''' Return the handler to call when the cycle starting at offset completes '''
+        self.remaining=self.remaining+1
+        return lambda status, op: self._done(offset, status)
+
+    def seal(self):
+        ''' Called once all the cycles have been issued '''
+        self.sealed=True
+        self._resolve()
+
+    def _done(self, offset, status):
+        if status and self.error is None:
+            self.error=BusWarning('Cycle @0x%08x: %s' % (offset, EthBone.eb_status(status)))
+        self.remaining=self.remaining-1
+        self._resolve()
+
+    def _resolve(self):
+        if not self.sealed or self.remaining>0: return
+        self.keep=None ## No cycle can write into it anymore
+        if self.fut.done: return
+        if self.error is not None: self.fut.fail(self.error)
+        else: self.fut.set(self.result())
+
+## Keep a single reference on the C callback so it is never garbage collected
+_eb_cycle_cb = eb_callback_t(_eb_cycle_done)
 
 # Import Etherbone structures
+def eb_subnet_hosts(subnet):
+    '''
+    Return the list of host addresses of a subnet
+
+    Args:
+        subnet (str) : IP and mask of the subnet (i.e. "192.168.1.0/24"), a single IP is also accepted
+
+    Returns:
+        A list of IP strings (without the network and broadcast addresses when mask < 31)
+    '''
+    ip, bits = (subnet.split("/") + ["32"])[:2]
+    bits=int(bits)
+    if bits<0 or bits>32: raise ValueError("Invalid mask /%d" % (bits))
+    mask=(0xFFFFFFFF << (32-bits)) & 0xFFFFFFFF
+    net=struct.unpack(">I", socket.inet_aton(ip))[0] & mask
+    first, last = net, net | (~mask & 0xFFFFFFFF)
+    if bits<31: first, last = first+1, last-1
+    return [socket.inet_ntoa(struct.pack(">I", n)) for n in xrange(first, last+1)]
+
 class eb_handler(Structure):
      _fields_ = [("sdb_dev", POINTER(c_uint)),
                  ("eb_data", POINTER(c_uint)),
@@ -105,6 +256,96 @@ class eb_handler(Structure):
 
 
 
+class EthBonePool(object):
+    '''Pool of Etherbone device handles multiplexed over a single Etherbone socket.
+
+    A host talking to many nodes would otherwise open one socket (and one file
+    descriptor) per EthBone instance. With a pool, all the EthBone created with
+    the ``pool`` argument share the same eb_socket, and opening again a LUN
+    that is already (or was recently) opened reuses its eb_device handle
+    without a new connection handshake:
+
+        pool=EthBonePool()
+        buses=[EthBone("udp/192.168.7.%d" % i, pool=pool) for i in range(10,210)]
+
+    Handles are reference-counted, the ones that are not used anymore are
+    closed after max_idle seconds (0 to close them as soon as they are released).
+    '''
+
+    def __init__(self, max_idle=60, verbose=False):
+        '''Constructor
+
+        Args:
+            max_idle : Number of seconds an unused device handle is kept opened
+            verbose : enables debug info
+        '''
+        self.lib=load_native_lib(EB_LIBPATH, EB_PROTOTYPES)
+        self.socket=None
+        self.devices={} ##LUN => [device handle, refcount, time of last release]
+        self.max_idle=max_idle
+        self.verbose=verbose
+
+    def __del__(self):
+        self.close()
+
+    def getSocket(self):
+        '''Return the shared socket, opening it the first time'''
+        if self.socket is None:
+            sock=c_uint(0)
+            status=self.lib.eb_socket_open(EB_ABI_CODE, None, EthBone.EB_ADDRX|EthBone.EB_DATAX, GenDrvr.getPtrData(sock))
+            if status: raise BusCritical('failed to open Etherbone socket: %s\n' % (EthBone.eb_status(status)));
+            self.socket=sock
+        return self.socket
+
+    def acquire(self, LUN, attempts=3):
+        '''Return a device handle for LUN, reusing the opened one if any
+
+        Args:
+            LUN : netaddress of the device (i.e. udp/192.168.7.2)
+            attempts : Number of connection attempts when a new handle is opened
+        '''
+        self.evict()
+        if LUN in self.devices:
+            self.devices[LUN][1]+=1
+            return self.devices[LUN][0]
+
+        device=c_uint(0)
+        if self.verbose: print "Connecting to '%s' with %d retry attempts...\n" % (LUN, attempts);
+        status=self.lib.eb_device_open(self.getSocket(), LUN, EthBone.EB_ADDRX|EthBone.EB_DATAX, attempts, GenDrvr.getPtrData(device))
+        if status: raise BusCritical("failed to open Etherbone device: %s\n" % (EthBone.eb_status(status)));
+        self.devices[LUN]=[device, 1, 0.0]
+        return device
+
+    def release(self, LUN):
+        '''Release a handle obtained by acquire(), it is closed once idle for max_idle seconds'''
+        if LUN not in self.devices: return
+        entry=self.devices[LUN]
+        entry[1]=max(0,entry[1]-1)
+        if entry[1]==0: entry[2]=time.time()
+        self.evict()
+
+    def evict(self, max_idle=None):
+        '''Close the unused handles that have been idle for more than max_idle seconds'''
+        if max_idle is None: max_idle=self.max_idle
+        now=time.time()
+        for LUN, (device, refcount, released) in self.devices.items():
+            if refcount==0 and now-released>=max_idle:
+                del self.devices[LUN]
+                status=self.lib.eb_device_close(device)
+                if status: raise BusCritical("Close device: %s\n" % (EthBone.eb_status(status)));
+
+    def close(self):
+        '''Close all the device handles and the shared socket'''
+        for LUN, (device, refcount, released) in self.devices.items():
+            self.lib.eb_device_close(device)
+        self.devices={}
+        if self.socket is not None:
+            status=self.lib.eb_socket_close(self.socket)
+            self.socket=None
+            if status: raise BusCritical("Close socket: %s\n" % (EthBone.eb_status(status)));
+
+
+
 class EthBone(GenDrvr):
     '''The EthBone class has been created to interface WB access using network and etherbone core.
 
@@ -117,6 +358,10 @@ class EthBone(GenDrvr):
     This need to be improved.
     '''
 
+    EB_DATA8  = 0x01
+    EB_DATA16 = 0x02
+    EB_DATA32 = 0x04
+    EB_DATA64 = 0x08
     EB_DATAX = 0x0F
     EB_ADDRX = 0xF0
 
@@ -126,22 +371,45 @@ class EthBone(GenDrvr):
 
     EB_OK        = 0  # success
 
+    BACKENDS = ("auto", "native", "python")
+
+    def __new__(cls, LUN, verbose=False, pool=None, backend="auto"):
+        '''Select the Etherbone implementation
 
-    def __init__(self,LUN, verbose=False):
+        With the "python" backend, or when libetherbone.so can not be loaded in
+        "auto" mode, the returned handle is an EthBoneUDP (pure-Python client
+        with the same interface) instead of an EthBone.
+        '''
+        if backend not in cls.BACKENDS: raise BusCritical("Unknown Etherbone backend '%s'" % (backend))
+        if backend=="auto" and pool is None:
+            try:
+                load_native_lib(EB_LIBPATH, EB_PROTOTYPES)
+            except OSError:
+                if verbose: print "libetherbone not found, using the python Etherbone client"
+                backend="python"
+        if backend=="python":
+            from bridges.ethbone_udp import EthBoneUDP
+            return EthBoneUDP(LUN, verbose) ## Not an EthBone: its __init__() is not called again
+        return GenDrvr.__new__(cls)
+
+    def __init__(self,LUN, verbose=False, pool=None, backend="auto"):
         '''Constructor
 
         Args:
             LUN : the logical unit, in etherbone we use a netaddress format given by:
             show_dbg : enables debug info
+            pool : EthBonePool used to share the socket and device handle with other instances
+            backend : "native" (libetherbone.so), "python" (EthBoneUDP) or "auto" (native when the library is available)
         '''
 
         if verbose: print "LD_LIBRARY_PATH=%s" % (os.getenv('LD_LIBRARY_PATH'))
 
-        self.load_lib("%s/../lib/libetherbone.so" % PYDIR)
+        self.load_lib(EB_LIBPATH, EB_PROTOTYPES)
 
         ##Create empty ptr on structure used by ethbone
         self.socket    = c_uint(0)
-        self.device    = c_uint(0)
+        self.device    = c_uint(0xFFFF) ##EB_NULL
+        self.pool      = pool
         self.operation = c_uint(0)
         self.wcrc      = 0
 
@@ -155,7 +423,30 @@ class EthBone(GenDrvr):
         self.data_width=self.EB_DATAX
         self.attempts=3
         self.silent=True
-        self.format=c_uint8(self.EB_BIG_ENDIAN | self.data_width)
+        self.window=8        ## Maximum number of asynchronous cycles in flight
+        self.mtu=EB_UDP_MTU  ## Used to split large block transfers in several cycles
+        self.last_xfer=(0,0,0.0) ## (bytes, cycles, seconds) of the last block transfer
+        self.timeout=1000000 ## Time in us that eb_socket_run() waits for an event
+        self.access_timeout=None ## Seconds a single access waits for its cycle (None to block, see set_timeout())
+        self._inflight=set()
+        self.posted=False    ## Post the single writes (see enable_posted_writes())
+        self.barrier_every=256 ## Posted writes between two automatic barriers
+        self._posted=[]      ## Posted writes not yet sent: (address, eb_format_t, data)
+        self._nposted=0      ## Posted writes since the last barrier
+        self._posted_errors=[] ## (addresses, status) of the failed posted cycles
+        self.format=c_uint8(self.EB_BIG_ENDIAN | self.EB_DATA32)
+
+        ##eb_format_t and data mask of the single accesses by width in bytes
+        ##With big endian format, libetherbone selects the byte lanes from the address
+        self._formats={}
+        for width in [(1,2,4),(1,2,4,8)][sizeof(eb_data_t)==8]:
+            self._formats[width]=(self.EB_BIG_ENDIAN | width, (1 << 8*width)-1)
+
+        ##Scratch buffer of devread() allocated once for the handle (no allocation per access)
+        self._rdata=eb_data_t(0xBADC0FFE)
+        self._prdata=addressof(self._rdata)
+        self._device_read=self.lib.eb_device_read
+        self._device_write=self.lib.eb_device_write
 
 
         ##Open the device
@@ -167,7 +458,13 @@ class EthBone(GenDrvr):
     def open(self, LUN):
         '''Open the device and map to the FPGA bus
         '''
-        status=self.lib.eb_socket_open(EB_ABI_CODE, 0, self.addr_width|self.data_width, self.getPtrData(self.socket))
+        if self.pool is not None:
+            self.LUN=LUN
+            self.socket=self.pool.getSocket()
+            self.device=self.pool.acquire(LUN, self.attempts)
+            return
+
+        status=self.lib.eb_socket_open(EB_ABI_CODE, None, self.addr_width|self.data_width, self.getPtrData(self.socket))
         if status: raise BusCritical('failed to open Etherbone socket: %s\n' % (self.eb_status(status)));
 
         if self.verbose: print "Connecting to '%s' with %d retry attempts...\n" % (LUN, self.attempts);
@@ -178,10 +475,17 @@ class EthBone(GenDrvr):
         '''Close the device and unmap
         '''
         if (self.device.value & 0xFFFF)==0xFFFF: return 0
+        if self._nposted: self.barrier()
+        if self._inflight: self.wait()
+
+        if self.pool is not None:
+            self.pool.release(self.LUN)
+            self.device=c_uint(0xFFFF)
+            return
 
         status=self.lib.eb_device_close(self.device)
         if status: raise BusCritical("Close device: %s\n" % (self.eb_status(status)));
-        self.device=c_uint(0)
+        self.device=c_uint(0xFFFF)
 
         status=self.lib.eb_socket_close(self.socket)
         if status: raise BusCritical("Close socket: %s\n" % (self.eb_status(status)));
@@ -192,6 +496,85 @@ class EthBone(GenDrvr):
         '''
         self.silent=enable
 
+    def enable_posted_writes(self, enable=True, barrier_every=None):
+        '''Enable posted writes: devwrite() queues the write and returns without waiting its acknowledgment
+
+        The queued writes are sent together in asynchronous cycles and their
+        errors are raised by barrier(), which is called before any read, block
+        transfer or transaction, every barrier_every writes and when the posted
+        mode is disabled.
+
+        Args:
+            enable: True to post the writes
+            barrier_every: number of posted writes between two automatic barriers
+        '''
+        if not enable and self._nposted: self.barrier()
+        self.posted=enable
+        if barrier_every is not None: self.barrier_every=barrier_every
+
+    def barrier(self):
+        '''Send the posted writes, wait for their completion and raise their errors
+
+        Raises:
+            BusWarning: with the addresses of the posted writes that failed
+        '''
+        self._nposted=0
+        self._send_posted()
+        if self._inflight: self.wait()
+        errors=self._posted_errors
+        if not errors: return
+        self._posted_errors=[]
+        addrs=", ".join("0x%08x" % (addr) for failed, status in errors for addr in failed)
+        raise BusWarning('Bad posted Wishbone Write @%s: %s' % (addrs, self.eb_status(errors[0][1])))
+
+    def _send_posted(self):
+        ''' Send the queued posted writes in an asynchronous cycle '''
+        writes=self._posted
+        if not writes: return
+        self._posted=[]
+        cycle=self._cycle_open_async(writes[0][0], lambda status, op: self._posted_done(writes, status, op))
+        cycle_write=self.lib.eb_cycle_write
+        for addr, fmt, data in writes:
+            cycle_write(cycle,addr,fmt,data)
+        self._cycle_close_async(cycle, False)
+
+    def _posted_done(self, writes, status, op):
+        ''' Completion of a posted cycle: keep the addresses of the failed writes '''
+        if not status: return
+        failed=[]
+        while op!=EB_NULL:
+            if self.lib.eb_operation_had_error(op): failed.append(self.lib.eb_operation_address(op))
+            op=self.lib.eb_operation_next(op)
+        ## The library did not tell which operation failed: report the whole cycle
+        self._posted_errors.append((failed or [addr for addr, fmt, data in writes], status))
+
+    def set_timeout(self, timeout):
+        '''Set the time (in seconds) to wait for the device
+
+        It is the time that eb_socket_run() waits for the asynchronous cycles and,
+        once set, devread()/devwrite() also run their cycle asynchronously and
+        raise BusWarning when it has not completed after timeout seconds, instead
+        of blocking in eb_device_read()/eb_device_write() until the library gives up.
+
+        Args:
+            timeout : seconds, or None to let the single accesses block again
+        '''
+        self.access_timeout=timeout
+        if timeout is not None: self.timeout=int(timeout*1e6)
+
+    def getFormat(self, width):
+        '''Return the (eb_format_t, data mask) used for a single access of width bytes
+
+        Args:
+            width : data size (1, 2, 4 or 8 bytes)
+
+        Raises:
+            BusWarning: when the width is not supported by the bus model of libetherbone
+        '''
+        if width not in self._formats:
+            raise BusWarning('Unsupported access width: %s bytes (bus model 0x%x)' % (width, EB_BUS_MODEL))
+        return self._formats[width]
+
 
     def devread(self, bar, offset, width):
         '''Method that do a cycle read on the devices using ed_device_read()
@@ -203,22 +586,15 @@ class EthBone(GenDrvr):
         Args:
             bar : BAR used by PCIe bus (Not used)
             offset : address within bar
-            width : data size (1, 2, or 4 bytes) => Must be 4 bytes
+            width : data size (1, 2, 4 or 8 bytes, 8 only with a 64bits libetherbone)
         '''
-        address = offset
-
-        UINT32P = POINTER(c_uint32)
-        data = c_uint32(0xBADC0FFE)
-        pData = cast(addressof(data), UINT32P)
-
-        user_data=c_uint32(0)
-        cb=c_uint(0)
-
-
-        status=self.lib.eb_device_read(self.device,c_uint(address),self.format,pData,user_data,cb)
-        if self.verbose: print "R@x%08X > 0x%08x" %(address, pData[0])
+        if self._nposted: self.barrier()
+        fmt, mask = self._formats.get(width) or self.getFormat(width)
+        if self.access_timeout is not None: return self._timed_access(offset, fmt, None) & mask
+        status=self._device_read(self.device,offset,fmt,self._prdata,None,None)
+        if self.verbose: print "R@x%08X > 0x%08x" %(offset, self._rdata.value)
         if status: raise BusWarning('Bad Etherbone Read: %s' % (self.eb_status(status)))
-        return pData[0]
+        return self._rdata.value & mask
 
 
     def devwrite(self, bar, offset, width, datum):
@@ -226,117 +602,414 @@ class EthBone(GenDrvr):
 
         Convenience methods which create single-operation cycles and it is
         equivalent to: eb_cycle_open, eb_cycle_write, eb_cycle_close.
+        In posted mode the write is only queued (see enable_posted_writes()).
 
         Args:
             bar : BAR used by PCIe bus (Not used)
             offset : address within bar
-            width : data size (1, 2, or 4 bytes) => Must be 4 bytes
+            width : data size (1, 2, 4 or 8 bytes, 8 only with a 64bits libetherbone)
             datum : data value that need to be written
         '''
-        address = offset
-        data = c_uint32(datum)
-
-        user_data=c_uint32(0)
-        cb=c_uint(0)
-
-        if self.verbose: print "W@x%08X < 0x%08x" %( address, datum)
-        status=self.lib.eb_device_write(self.device,c_uint(address),self.format,data,user_data,cb)
-        if status: raise BusWarning('Bad Wishbone Write @0x%08x > 0x%08x : %s' % (address, datum, self.eb_status(status)))
-        return data
+        fmt, mask = self._formats.get(width) or self.getFormat(width)
+        if self.verbose: print "W@x%08X < 0x%08x" %(offset, datum)
+        if self.posted:
+            self._posted.append((offset, fmt, datum & mask))
+            self._nposted+=1
+            if self._nposted>=self.barrier_every: self.barrier()
+            elif len(self._posted)>=self.getChunkWords(): self._send_posted()
+            return datum
+        if self.access_timeout is not None:
+            self._timed_access(offset, fmt, datum & mask)
+            return datum
+        status=self._device_write(self.device,offset,fmt,datum & mask,None,None)
+        if status: raise BusWarning('Bad Wishbone Write @0x%08x > 0x%08x : %s' % (offset, datum, self.eb_status(status)))
+        return datum
+
+
+    def _timed_access(self, offset, fmt, datum):
+        '''Do a single read (datum is None) or write in an asynchronous cycle waiting at most self.access_timeout
+
+        A scratch eb_data_t is allocated for each read because a cycle that
+        timed out may still complete later and fill it.
 
+        Returns:
+            The value read, or datum for a write
 
-    def devblockread(self, bar, offset, bsize, incr=0x4):
-        '''Method that do a multiple cycle-read to read a data block
-
-        WARNING: THE CALLBACK CALL OF THIS FUNCTION IS NOT WORKING AT THE MOMENT.
-
-        Call back:
-        http://stackoverflow.com/questions/7259794/how-can-i-get-methods-to-work-as-callbacks-with-python-ctypes
+        Raises:
+            BusWarning: when the cycle fails or does not complete in time
+        '''
+        fut=BusFuture()
+        if datum is None:
+            rdata=eb_data_t(0xBADC0FFE)
+            result=lambda: rdata.value
+        else:
+            result=lambda: datum
+        def ondone(status, op):
+            if status: fut.fail(BusWarning('Bad Etherbone %s @0x%08x: %s' % (["Write","Read"][datum is None], offset, self.eb_status(status))))
+            else: fut.set(result())
+        cycle=self._cycle_open_async(offset, ondone)
+        if datum is None: self.lib.eb_cycle_read(cycle,offset,fmt,addressof(rdata))
+        else: self.lib.eb_cycle_write(cycle,offset,fmt,datum)
+        self._cycle_close_async(cycle, False)
+        self._run(lambda: fut.done, self.access_timeout)
+        if self.verbose and datum is None and fut.error is None: print "R@x%08X > 0x%08x" %(offset, fut.value)
+        return fut.value
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that do a multiple cycle-read filling a caller-supplied buffer in place
+
+        No Python object is created per word: when the library uses a 32bit
+        eb_data_t the results are directly stored in the buffer memory, otherwise
+        they are narrowed in bulk from a 64bit scratch vector.
+
+        When the block does not fit in one Etherbone packet it is split in
+        cycles of getChunkWords() words, up to self.window of them in flight.
 
         Args:
             bar : BAR used by PCIe bus (Not used)
             offset : address at the device
-            bsize: The size in bytes of data to read (Should be multiply by 4)
-            incr: By default we increment the direction by 4 because we are reading 32bit words,
-            but if we want to read from a FIFO we should use incr=0x0
+            buf : writable buffer (bytearray, array('I'), memoryview, numpy array...)
+            whose size in bytes gives the number of 32bits words to read
+            incr: address increment between words (0x0 to read from a FIFO)
 
         Returns:
-            A list of 32bits words
+            The same buffer filled with the 32bits words (in host byte order)
         '''
-        UINT32P = POINTER(c_uint32)
-        cycle       = c_uint(0)
-
-#        user_data   = c_uint32(0xDEADBEEF)
-#        CBFUNC = CFUNCTYPE(None, c_uint16, c_uint16, c_uint16,c_int)
-#        cb          = CBFUNC(py_cb_func)
-#        pUData = cast(addressof(user_data), UINT32P)
-
-        dataVec= (c_uint32*(bsize/4))()
-
-        ldata=[]
-        addr=offset
-        i=0
-        status= self.lib.eb_cycle_open(self.device,0,0,self.getPtrData(cycle))
-        if status: raise BusWarning('Cycle open : 0x%x, %s' % (offset,self.eb_status(status)))
-        while i<bsize:
-            pData = cast(addressof(dataVec)+i, UINT32P)
-            self.lib.eb_cycle_read(cycle,addr,self.format,pData)
-            addr=addr+incr
-            i=i+4
-        status=self.lib.eb_cycle_close(cycle)
-        if status: raise BusWarning('Cycle close: %s' % (self.eb_status(status)))
+        if self._nposted: self.barrier()
+        nwords=self.bufferWords(buf)
+        nbytes=nwords*4
+        if nwords==0: return buf
+
+        try:
+            target=(c_uint32*nwords).from_buffer(buf)
+        except TypeError:
+            target=None ##Read-only or buffer without old-style protocol (memoryview in python2)
+        if target is not None and sizeof(eb_data_t)==4: dataVec=target
+        else: dataVec=(eb_data_t*nwords)()
+
+        t0=time.time()
+        if nwords<=self.getChunkWords():
+            cycle=c_uint(0)
+            status= self.lib.eb_cycle_open(self.device,0,0,self.getPtrData(cycle))
+            if status: raise BusWarning('Cycle open : 0x%x, %s' % (offset,self.eb_status(status)))
+            self._cycle_reads(cycle, offset, addressof(dataVec), nwords, incr)
+            status=self.lib.eb_cycle_close(cycle)
+            if status: raise BusWarning('Cycle close: %s' % (self.eb_status(status)))
+            ncycles=1
+        else:
+            fut=BusFuture(self.wait)
+            ## The pending cycles keep the transfer, hence dataVec and target, until they complete
+            ncycles=self._issue_reads(offset, dataVec, nwords, incr, _EBTransfer(fut, lambda: None, (dataVec, target)))
+            fut.value
+        self._xfer_done(nbytes, ncycles, t0)
 
-        ###Convert the c_uint32 array to list of c_uint32
-        ldata=[]
-        for d in dataVec: ldata.append(d)
+        if dataVec is target: words=target
+        else:
+            words=eb_data_to_words(dataVec,nwords)
+            if target is not None: memmove(target,words.buffer_info()[0],nwords*4)
+            else: buf[:nwords*4]=words.tostring()
 
         ## Print the result if we are using verbose
         if self.verbose:
             addr=offset
-            for d in dataVec:
+            for d in words:
                 print "@x%08X > %8x" % (addr, d)
                 addr=addr+incr
 
-        return ldata
+        return buf
 
 
     def devblockwrite(self, bar, offset, ldata, incr=0x4):
         '''Method that do a multiple cycle-writes to write a data block
 
+        The running CRC (self.wcrc) is updated once over the whole block. Blocks
+        larger than getChunkWords() are split in several cycles kept in flight
+        together, so a whole image can be given in one call.
+
         Args:
             bar : BAR used by PCIe bus (Not used)
             offset : address in the device
-            ldata : A list of 32bits words
+            ldata : A list of 32bits words or any buffer object (array('I'), bytes,
+            bytearray, numpy array...) holding 32bits words in host byte order
             incr: By default we increment the direction by 4 because we are writing 32bit words,
             but if we want to write into a FIFO we should use incr=0x0
         '''
+        if self._nposted: self.barrier()
 
         cycle       = c_uint(0)
-        user_data   = c_uint32(0)
-        cb          = 0 #NULL pointer
 
+        words=self.toWords(ldata)
+        self.wcrc=binascii.crc32(words, self.wcrc)
 
-        addr=offset
-        status= self.lib.eb_cycle_open(self.device,user_data,cb,self.getPtrData(cycle))
-        if status: raise BusWarning('Cycle open : 0x%x, %s' % (offset,self.eb_status(status)))
-        for data in ldata:
-            ##Chequear endianess de format
-            if self.verbose: print "@x%08X > %8x" % (addr, data)
-            self.lib.eb_cycle_write(cycle,addr,self.format,c_uint32(data))
-            self.wcrc=binascii.crc32(c_uint32(data), self.wcrc)
-            addr=addr+incr
-        if self.silent:
-            status=self.lib.eb_cycle_close_silently(cycle) #Close without asking acknowledgment of the device (faster)
+        t0=time.time()
+        if len(words)<=self.getChunkWords():
+            status= self.lib.eb_cycle_open(self.device,None,None,self.getPtrData(cycle))
+            if status: raise BusWarning('Cycle open : 0x%x, %s' % (offset,self.eb_status(status)))
+            self._cycle_writes(cycle, offset, words, incr)
+            if self.silent:
+                status=self.lib.eb_cycle_close_silently(cycle) #Close without asking acknowledgment of the device (faster)
+            else:
+                status=self.lib.eb_cycle_close(cycle)
+            if status: raise BusWarning('Cycle close: %s' % (self.eb_status(status)))
+            ncycles=1
         else:
-            status=self.lib.eb_cycle_close(cycle)
-        if status: raise BusWarning('Cycle close: %s' % (self.eb_status(status)))
+            fut=BusFuture(self.wait)
+            ncycles=self._issue_writes(offset, words, incr, _EBTransfer(fut, lambda: len(words)))
+            fut.value
+        self._xfer_done(len(words)*4, ncycles, t0)
 
+        ## Print the written data if we are using verbose
+        if self.verbose:
+            addr=offset
+            for data in words:
+                print "@x%08X > %8x" % (addr, data)
+                addr=addr+incr
 
         return 0;
 
+    def getChunkWords(self):
+        '''Return the maximum number of 32bits words of a block transfer that fit in one cycle
+
+        The cycle must fit in one UDP packet of self.mtu bytes: after the IP/UDP
+        headers, the Etherbone header, the record header and the base address
+        remain the 32bits values (data to write, or addresses to read), with at
+        most EB_MAX_RECORD_OPS of them per record.
+        '''
+        nwords=(self.mtu-EB_UDP_OVERHEAD-3*4)/4
+        return max(1,min(EB_MAX_RECORD_OPS,nwords))
+
+    def throughput(self):
+        '''Return the throughput (in bytes/s) achieved by the last block transfer'''
+        nbytes, ncycles, secs = self.last_xfer
+        if secs<=0: return 0.0
+        return nbytes/secs
+
+    def devblockread_async(self, bar, offset, bsize, incr=0x4):
+        '''Method that issue block read cycles without waiting their completion
+
+        The cycles are opened with a callback and up to self.window cycles are
+        kept in flight, so several calls fill the network pipe instead of waiting
+        a full round trip each. Large blocks are split in getChunkWords() cycles.
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address at the device
+            bsize: The size in bytes of data to read (Should be multiply by 4)
+            incr: address increment between words (0x0 to read from a FIFO)
+
+        Returns:
+            A BusFuture resolved with an array('I') of 32bits words once the cycles complete
+        '''
+        if self._nposted: self.barrier()
+        nwords=bsize/4
+        dataVec=(eb_data_t*nwords)()
+        fut=BusFuture(self.wait)
+        self._issue_reads(offset, dataVec, nwords, incr, _EBTransfer(fut, lambda: eb_data_to_words(dataVec,nwords)))
+        return fut
+
+    def devblockwrite_async(self, bar, offset, ldata, incr=0x4):
+        '''Method that issue block write cycles without waiting their completion
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address in the device
+            ldata : A list of 32bits words or any buffer object (see devblockwrite())
+            incr: address increment between words (0x0 to write into a FIFO)
+
+        Returns:
+            A BusFuture resolved with the number of written words once the cycles complete
+        '''
+        if self._nposted: self.barrier()
+        words=self.toWords(ldata)
+        self.wcrc=binascii.crc32(words, self.wcrc)
+        fut=BusFuture(self.wait)
+        self._issue_writes(offset, words, incr, _EBTransfer(fut, lambda: len(words)))
+        return fut
+
+    def wait(self, fut=None):
+        '''Process the socket events until the asynchronous cycles complete
+
+        Args:
+            fut: The BusFuture to wait for, if None we wait for all the pending cycles
+
+        Raises:
+            BusWarning: if nothing completes after self.attempts timeouts
+        '''
+        if fut is None: self._run(lambda: not self._inflight)
+        else: self._run(lambda: fut.done)
+
+    def _run(self, done, timeout=None):
+        '''Call eb_socket_run() until done() is True or no cycle is pending
+
+        Args:
+            done: callable returning True when the wait is over
+            timeout: seconds after which BusWarning is raised, if None we give up after self.attempts idle runs
+        '''
+        if timeout is not None:
+            deadline=time.time()+timeout
+            while self._inflight and not done():
+                left=deadline-time.time()
+                if left<=0: raise BusWarning('Timeout (%.3f s) waiting the Etherbone cycle' % (timeout))
+                self.lib.eb_socket_run(self.socket, max(1,int(left*1e6)))
+            return
+        idle=0
+        while self._inflight and not done():
+            npending=len(self._inflight)
+            self.lib.eb_socket_run(self.socket, self.timeout)
+            if len(self._inflight)<npending: idle=0
+            else: idle=idle+1
+            if idle>self.attempts:
+                raise BusWarning('Timeout waiting %d asynchronous cycles' % (len(self._inflight)))
+
+    def _issue_reads(self, offset, dataVec, nwords, incr, xfer):
+        ''' Issue the asynchronous read cycles of a block and return the number of cycles '''
+        chunk=self.getChunkWords()
+        ptr=addressof(dataVec)
+        step=sizeof(eb_data_t)
+        ncycles=0
+        for first in xrange(0,nwords,chunk):
+            addr=offset+first*incr
+            cycle=self._cycle_open_async(addr, xfer.ondone(addr))
+            self._cycle_reads(cycle, addr, ptr+first*step, min(chunk,nwords-first), incr)
+            self._cycle_close_async(cycle, False)
+            ncycles=ncycles+1
+        xfer.seal()
+        return ncycles
+
+    def _issue_writes(self, offset, words, incr, xfer):
+        ''' Issue the asynchronous write cycles of a block and return the number of cycles '''
+        chunk=self.getChunkWords()
+        ncycles=0
+        for first in xrange(0,len(words),chunk):
+            addr=offset+first*incr
+            cycle=self._cycle_open_async(addr, xfer.ondone(addr))
+            self._cycle_writes(cycle, addr, itertools.islice(words,first,first+chunk), incr)
+            self._cycle_close_async(cycle, self.silent)
+            ncycles=ncycles+1
+        xfer.seal()
+        return ncycles
+
+    def _cycle_reads(self, cycle, addr, ptr, nwords, incr):
+        ''' Queue nwords reads in a cycle storing the eb_data_t results from address ptr '''
+        fmt=self.format
+        step=sizeof(eb_data_t)
+        cycle_read=self.lib.eb_cycle_read
+        for i in xrange(nwords):
+            cycle_read(cycle,addr,fmt,ptr+i*step)
+            addr=addr+incr
+
+    def _cycle_writes(self, cycle, addr, words, incr):
+        ''' Queue the writes of an iterable of words in a cycle '''
+        fmt=self.format
+        cycle_write=self.lib.eb_cycle_write
+        for data in words:
+            cycle_write(cycle,addr,fmt,data)
+            addr=addr+incr
+
+    def _cycle_open_async(self, offset, ondone):
+        ''' Open a cycle with a callback, waiting first for a free slot in the window '''
+        self._run(lambda: len(self._inflight)<max(self.window,1))
+        tag=_eb_tags.next()
+        cycle=c_uint(0)
+        status=self.lib.eb_cycle_open(self.device,c_void_p(tag),_eb_cycle_cb,self.getPtrData(cycle))
+        if status: raise BusWarning('Cycle open : 0x%x, %s' % (offset,self.eb_status(status)))
+        _eb_pending[tag]=(ondone, self._inflight)
+        self._inflight.add(tag)
+        return cycle
+
+    def _cycle_close_async(self, cycle, silent):
+        ''' Close an asynchronous cycle, the callback is called later by eb_socket_run() '''
+        if silent: self.lib.eb_cycle_close_silently(cycle)
+        else: self.lib.eb_cycle_close(cycle)
+
+    def _xfer_done(self, nbytes, ncycles, t0):
+        ''' Store the statistics of the last block transfer '''
+        self.last_xfer=(nbytes, ncycles, time.time()-t0)
+        if self.verbose:
+            print "%d bytes in %d cycles: %.1f kB/s" % (nbytes, ncycles, self.throughput()/1024.0)
+
+
+    def readconfig(self, offsets):
+        '''Read registers of the config space of the Etherbone slave in a single cycle
+
+        Args:
+            offsets : list of offsets in the config space (i.e. EB_CONFIG_SDB_HI)
+
+        Returns:
+            A list with the 32bits value of each register
+        '''
+        if self._nposted: self.barrier()
+        dataVec=(eb_data_t*len(offsets))()
+        cycle=c_uint(0)
+        status=self.lib.eb_cycle_open(self.device,None,None,self.getPtrData(cycle))
+        if status: raise BusWarning('Cycle open : %s' % (self.eb_status(status)))
+        for i, offset in enumerate(offsets):
+            self.lib.eb_cycle_read_config(cycle,offset,self.format,addressof(dataVec)+sizeof(eb_data_t)*i)
+        status=self.lib.eb_cycle_close(cycle)
+        if status: raise BusWarning('Config read: %s' % (self.eb_status(status)))
+        return [d & 0xFFFFFFFF for d in dataVec]
+
+    def getsdbroot(self):
+        '''Return the address of the SDB root published in the config space of the Etherbone slave
+
+        Returns:
+            The address, or None if the slave does not publish it
+        '''
+        try:
+            hi, lo = self.readconfig([EB_CONFIG_SDB_HI, EB_CONFIG_SDB_LO])
+        except BusWarning, e:
+            if self.verbose: print e
+            return None
+        return ((hi << 32) | lo) or None
+
+    def commit_transaction(self, ops):
+        '''Method that execute the operations queued by a BusTransaction
 
+        All the operations are packed in a single Etherbone cycle (eb_cycle_open ...
+        eb_cycle_close). A read-modify-write needs the read value before writing,
+        so the cycle is closed after its read and its write starts the next cycle.
 
-    def eb_status(self,status):
+        Args:
+            ops : list of (kind, offset, width, datum, mask, future) tuples
+        '''
+        if self._nposted: self.barrier()
+        dataVec = (eb_data_t*len(ops))()
+        carry=[] ##RMW writes that are resolved by the previous cycle
+        i=0
+        while i<len(ops) or carry:
+            cycle=c_uint(0)
+            status=self.lib.eb_cycle_open(self.device,0,0,self.getPtrData(cycle))
+            if status: raise BusWarning('Cycle open : %s' % (self.eb_status(status)))
+            for addr, fmt, data in carry:
+                if self.verbose: print "W@x%08X < 0x%08x" %(addr, data)
+                self.lib.eb_cycle_write(cycle,addr,fmt,data)
+            carry=[]
+            reads=[]
+            while i<len(ops):
+                kind, addr, width, datum, mask, fut = ops[i]
+                fmt, wmask = self._formats.get(width) or self.getFormat(width)
+                i=i+1
+                if kind==BusTransaction.OP_WRITE:
+                    if self.verbose: print "W@x%08X < 0x%08x" %(addr, datum)
+                    self.lib.eb_cycle_write(cycle,addr,fmt,datum & wmask)
+                    fut.set(datum)
+                else:
+                    self.lib.eb_cycle_read(cycle,addr,fmt,addressof(dataVec)+sizeof(eb_data_t)*len(reads))
+                    reads.append(ops[i-1])
+                    if kind==BusTransaction.OP_RMW: break
+            status=self.lib.eb_cycle_close(cycle)
+            if status: raise BusWarning('Cycle close: %s' % (self.eb_status(status)))
+            for j, (kind, addr, width, datum, mask, fut) in enumerate(reads):
+                fmt, wmask = self._formats[width]
+                rd=dataVec[j] & wmask
+                if self.verbose: print "R@x%08X > 0x%08x" %(addr, rd)
+                fut.set(rd)
+                if kind==BusTransaction.OP_RMW:
+                    carry.append((addr, fmt, ((rd & ~mask) | (datum & mask)) & wmask))
+
+
+    @staticmethod
+    def eb_status(status):
         ''' Print the status code returned by libetherbone'''
 
         if status==0: return "OK"
@@ -493,9 +1166,8 @@ class EthBone(GenDrvr):
         '''
         Method for scan the bus to find WR devices connected.
 
-        This method is aided by "fping" to make a fast scan. If "fping" is not
-        available in the system, a slow scan will be performed (bcast vs. individual
-        ping). Also Etherbone support must be installed in the system.
+        An Etherbone probe is sent to every address of the subnet at once and
+        the replies are collected within a single timeout window (see discover()).
 
         Args:
             options (str) : subnet IP and mask to make the scan. Example: "192.168.1.0/24"
@@ -506,61 +1178,71 @@ class EthBone(GenDrvr):
         Raises:
             BadData: if "options" param doesn't contains a valid ip/mask.
         '''
-        if options == None or type(options) != type("") :
-            raise BadData(str(options))
-
-        subnet = options
-        devices = []
-
-        # If fping is installed, only check with eb-discover alive IPs
-        if not os.system("command -v fping > /dev/null") :   # FAST MODE
-            # Retrieve a list of alive devices in the subnet
-            cmd = """fping -C 1 -q -g %s 2>&1 | grep -v \": -\"""" % (subnet)
-            raw_alive_devs = check_output(cmd,shell=True).splitlines()
-            unknown_devices = [None, ] * len(raw_alive_devs)
-            i = 0
-            for dev in raw_alive_devs :
-                unknown_devices[i] = dev.split(":")[0].rstrip(' ')
-                i += 1
-            raw_alive_devs = None
-
-            # Now check which ones are WR devices using eb-discover
-            for udev in unknown_devices :
-                cmd = "%s/../bin/eb-discover" % PYDIR
-                args = "udp/%s" % (udev)
-                ret = check_output([cmd, args])
-                if ret != '' : # is a WR device
-                    devices.append(udev)
-
-        else :                                              # SLOW MODE
-            # Scan to find WR devices in the network
-            ip, bcast = subnet.split("/")
-            end = int( (( math.ceil((32-int(bcast)) / 8.0) % 3) * 2) % 3 )
-            lip = ip.split(".")[:end+1]
-
-            buildNextSubnet = lambda root : root.append('0')
-            # Generate next ip
-            nextIP = lambda ip : ip.append( str( int(ip.pop())+1 ) ) if int(ip[-1]) < 255 else False
-            # Check wether a ip direction is complete
-            isLastByte = lambda ip : (len(ip) == 4) if (type(ip) == type(list())) else (len(ip.split(".")) == 4)
-
-            def checkDevices(ip,devices) :
-                for i in range(1,255) :
-                    ip[-1] = str(i)
-                    #print "probando ip: %s" % ('.'.join(ip))
-                    if isLastByte(ip) :
-                        cmd = "%s/../bin/eb-discover" % PYDIR
-                        args = "udp/%s" % (ip if type(ip) == type("") else '.'.join(ip))
-                        ret = check_output([cmd, args])
-                        if ret != '' : # is a WR device
-                            devices.append('.'.join(ip))
-                        if int(ip[-1]) == 254 : return
-
-                    else :
-                        checkDevices( buildNextSubnet(ip) )
-
-
-            buildNextSubnet(lip)
-            checkDevices(lip,devices)
-
-        return devices
+        return [ip for ip, rtt in EthBone.discover(options)]
+
+    @staticmethod
+    def discover(subnet, timeout=1.0, port=EB_UDP_PORT):
+        '''
+        Method that probe concurrently all the addresses of a subnet for Etherbone devices.
+
+        The probes are sent from one non-blocking UDP socket as fast as the
+        socket accepts them while the replies are collected, so scanning a /24
+        or a /16 takes about one timeout instead of one round trip per address.
+
+        Args:
+            subnet (str) : subnet IP and mask to scan. Example: "192.168.1.0/24"
+            timeout (float) : Seconds to wait for replies after the last probe is sent
+            port (int) : UDP port of the Etherbone slaves
+
+        Returns:
+            A list of (ip, rtt) tuples sorted by address, with the round trip time in seconds.
+
+        Raises:
+            BadData: if "subnet" doesn't contains a valid ip/mask.
+        '''
+        if subnet == None or type(subnet) != type("") :
+            raise BadData(Ewberrno.EINVAL, str(subnet))
+        try:
+            hosts=eb_subnet_hosts(subnet)
+        except (ValueError, socket.error):
+            raise BadData(Ewberrno.EINVAL, subnet)
+
+        probe_id=random.randint(0,0xFFFFFFFF)
+        probe=struct.pack(">HBBI", EB_MAGIC, (EB_PROTOCOL_VERSION << 4) | EB_FLAG_PF,
+                          EthBone.EB_ADDRX|EthBone.EB_DATAX, probe_id)
+        sent={}
+        found={}
+        sock=socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(0)
+        try:
+            pending=iter(hosts)
+            nextip=next(pending, None)
+            deadline=time.time()+timeout
+            while True:
+                now=time.time()
+                if nextip is None and now>=deadline: break
+                wlist=[sock] if nextip is not None else []
+                r, w, x = select.select([sock], wlist, [], max(0.0, deadline-now) if nextip is None else 0.1)
+                for ready in w:
+                    try:
+                        sock.sendto(probe, (nextip, port))
+                        sent[nextip]=time.time()
+                    except socket.error as e:
+                        if e.errno in (errno.EAGAIN, errno.ENOBUFS): continue
+                        ## Unreachable hosts are simply skipped
+                    nextip=next(pending, None)
+                    if nextip is None: deadline=time.time()+timeout
+                if r:
+                    try:
+                        data, (ip, rport) = sock.recvfrom(64)
+                    except socket.error:
+                        continue
+                    if len(data)<8 or ip not in sent or ip in found: continue
+                    magic, flags, sizes, rid = struct.unpack(">HBBI", data[:8])
+                    if magic==EB_MAGIC and (flags & EB_FLAG_PR) and rid==probe_id:
+                        found[ip]=time.time()-sent[ip]
+        finally:
+            sock.close()
+
+        key=lambda item: struct.unpack(">I", socket.inet_aton(item[0]))[0]
+        return sorted(found.items(), key=key)
@@ -0,0 +1,540 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+This file contains a pure-Python Etherbone client (EthBoneUDP) which is a child of the abstract class GenDrv (gendrvr.py)
+
+It speaks the Etherbone wire protocol directly over UDP, so it does not need
+libetherbone.so. It can be used in place of EthBone on any host, and EthBone()
+returns one when libetherbone.so can not be loaded (see EthBone.__new__()).
+
+Etherbone packet (32bits addresses and data)
+============================================
+
+    +-----------------+-------------------+---------+
+    | Magic (0x4E6F)  | Ver | NR | PR | PF | AS | PS |   Packet header
+    +--------+--------+---------+---------+---------+
+    | Flags  | ByteEn | WCount  | RCount  |             Record header
+    +--------+--------+---------+---------+
+    | BaseWriteAddr (if WCount)           |
+    | WCount x data                       |
+    | BaseRetAddr   (if RCount)           |
+    | RCount x read addresses             |
+    +-------------------------------------+
+    | ... more records ...                |
+
+The slave answers each record by a record that writes the read values to
+BaseRetAddr, that we use as a tag to match the replies with the requests.
+A cycle is a sequence of records ending with the CYC flag; each cycle is sent
+in its own packet and several packets are kept in flight.
+
+@file
+@date Created on Oct 16, 2026
+@copyright LGPL v2.1
+@see http://www.ohwr.org/projects/etherbone-core/wiki
+@see http://www.sevensols.com
+@ingroup bridges
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import sys
+import time
+import struct
+import select
+import socket
+import binascii
+from array import array
+
+# Import common modules
+from core.gendrvr import *
+from bridges.ethbone import EthBone, EB_PROTOCOL_VERSION, EB_UDP_PORT, EB_MAGIC, EB_FLAG_PF, EB_FLAG_PR
+from bridges.ethbone import EB_UDP_MTU, EB_UDP_OVERHEAD, EB_MAX_RECORD_OPS
+from bridges.ethbone import EB_CONFIG_ERR_HI, EB_CONFIG_ERR_LO, EB_CONFIG_SDB_HI, EB_CONFIG_SDB_LO
+
+EB_FLAG_NR      = 0x04 ## No reads: the slave does not answer the packet
+EB_SIZES_32     = 0x44 ## 32bits addresses and data
+
+## Record flags
+EB_RECORD_BCA   = 0x80 ## BaseRetAddr is in the config space
+EB_RECORD_RCA   = 0x40 ## Read addresses are in the config space
+EB_RECORD_RFF   = 0x20 ## Read back to a FIFO
+EB_RECORD_CYC   = 0x08 ## Drop the cycle line after this record
+EB_RECORD_WCA   = 0x04 ## Write addresses are in the config space
+EB_RECORD_WFF   = 0x02 ## Write to a FIFO (do not increment the address)
+
+EB_MAX_RECORDS  = 64   ## The record index is stored in 6 bits of the reply tag (see eb_reply_tag())
+EB_CHECK_BYTES  = 16   ## Record that reads the error shift register at the end of a cycle
+
+
+def eb_join_record(r, is_write, addr, config=False):
+    '''
+    Return True when an operation can be appended to the last record r of a cycle
+
+    Consecutive writes to incrementing (or identical, FIFO) addresses share a
+    record while it has no reads, the reads are appended to the previous record.
+    '''
+    if r is None: return False
+    if is_write:
+        if r[3] or not 0<len(r[2])<EB_MAX_RECORD_OPS: return False
+        if r[0] & EB_RECORD_WFF: return addr==r[1]
+        if len(r[2])==1 and addr==r[1]: return True ## Becomes a FIFO record
+        return addr==r[1]+4*len(r[2])
+    return len(r[3])<EB_MAX_RECORD_OPS and bool(r[0] & EB_RECORD_RCA)==config
+
+def eb_split_cycles(ops, maxbytes, check=True, config=False):
+    '''
+    Split a list of operations in cycles that eb_encode_cycle() encodes in packets of at most maxbytes
+
+    A cycle also has at most EB_MAX_RECORDS records, so that each record can
+    be recognized by its reply tag.
+
+    Args:
+        ops: list of (is_write, address, data) tuples
+        maxbytes: size of the Etherbone packet (without the IP/UDP headers)
+        check: the error shift register is read at the end of each cycle
+        config: the reads are done in the config space of the slave
+
+    Returns:
+        A list of cycles (lists of operations)
+    '''
+    empty=4+[0,EB_CHECK_BYTES][check]
+    cycles=[]
+    records=None
+    for is_write, addr, data in ops:
+        r=records[-1] if records else None
+        join=eb_join_record(r, is_write, addr, config)
+        if join: cost=4 if is_write or r[3] else 8 ## A value, or the BaseRetAddr and the first read address
+        else: cost=12                             ## Record header, base address and value
+        if records is None or size+cost>maxbytes or (not join and len(records)+1+check>EB_MAX_RECORDS):
+            cycles.append([])
+            records=[]
+            size=empty
+            cost=12
+        eb_add_op(records, is_write, addr, data, config)
+        cycles[-1].append((is_write, addr, data))
+        size+=cost
+    return cycles
+
+def eb_add_op(records, is_write, addr, data, config=False):
+    ''' Append an operation to the records of a cycle: [flags, base, writes, read addresses] '''
+    r=records[-1] if records else None
+    if not eb_join_record(r, is_write, addr, config):
+        r=[[0, EB_RECORD_RCA][config and not is_write], addr if is_write else 0, [], []]
+        records.append(r)
+    if is_write:
+        if len(r[2])==1 and addr==r[1]: r[0]|=EB_RECORD_WFF
+        r[2].append(data & 0xFFFFFFFF)
+    else:
+        r[3].append(addr)
+
+
+def eb_encode_cycle(tag, ops, check=True, config=False):
+    '''
+    Encode a cycle in a packet of Etherbone records
+
+    Consecutive writes to incrementing (or identical, FIFO) addresses are packed in
+    a single record with their base address, the reads are appended to the
+    record that precede them (see eb_join_record()). Use eb_split_cycles() to
+    keep the packet in the MTU.
+
+    Args:
+        tag: 16bits value used to recognize the reply (stored in BaseRetAddr)
+        ops: list of (is_write, address, data) tuples (data is None for reads)
+        check: append the reads of the error shift register to check the cycle
+        config: the reads are done in the config space of the slave
+
+    Returns:
+        A tuple (packet string, list of the record indexes that will be answered)
+    '''
+    records=[] ## [flags, base, writes, read addresses]
+    for is_write, addr, data in ops:
+        eb_add_op(records, is_write, addr, data, config)
+    if len(records)+check>EB_MAX_RECORDS: raise BusWarning("Too many Etherbone records in a cycle (%d)" % (len(records)))
+    if check: records.append([EB_RECORD_RCA, 0, [], [EB_CONFIG_ERR_HI, EB_CONFIG_ERR_LO]])
+    if not records: return "", []
+    records[-1][0]|=EB_RECORD_CYC
+
+    answered=[]
+    chunks=[]
+    for i, (flags, base, writes, reads) in enumerate(records):
+        chunks.append(struct.pack(">BBBB", flags, 0x0F, len(writes), len(reads)))
+        if writes:
+            chunks.append(struct.pack(">I%dI" % len(writes), base, *writes))
+        if reads:
+            chunks.append(struct.pack(">I%dI" % len(reads), eb_reply_tag(tag, i), *reads))
+            answered.append(i)
+    flags=(EB_PROTOCOL_VERSION << 4) | (0 if answered else EB_FLAG_NR)
+    return struct.pack(">HBB", EB_MAGIC, flags, EB_SIZES_32)+"".join(chunks), answered
+
+def eb_reply_tag(tag, index):
+    '''
+    BaseRetAddr of the record index of the packet tag (a record carries less than 1024 bytes)
+
+    Only EB_MAX_RECORDS records of a packet can be tagged.
+    '''
+    if not 0<=index<EB_MAX_RECORDS: raise BusWarning("Etherbone record index %d can not be tagged" % (index))
+    return ((tag & 0xFFFF) << 16) | (index << 10)
+
+def eb_decode_reply(data):
+    '''
+    Decode an Etherbone packet sent by the slave
+
+    Args:
+        data: string with the UDP payload
+
+    Returns:
+        A dictionary {BaseWriteAddr: tuple of written values} (i.e. the read values by tag),
+        or None if this is not an Etherbone packet.
+    '''
+    if len(data)<4: return None
+    magic, flags, sizes = struct.unpack_from(">HBB", data, 0)
+    if magic!=EB_MAGIC or (flags & (EB_FLAG_PF|EB_FLAG_PR)): return None
+    pos=4
+    writes={}
+    while pos+4<=len(data):
+        rflags, be, wcount, rcount = struct.unpack_from(">BBBB", data, pos)
+        pos+=4
+        if wcount:
+            if pos+4*(wcount+1)>len(data): break
+            vals=struct.unpack_from(">I%dI" % wcount, data, pos)
+            writes[vals[0]]=vals[1:]
+            pos+=4*(wcount+1)
+        if rcount:
+            pos+=4*(rcount+1)
+    return writes
+
+
+class EthBoneUDP(GenDrvr):
+    '''The EthBoneUDP class interface WB access through Etherbone without libetherbone.
+
+    It has the same interface as EthBone (devread, devwrite, devblockread(_into),
+    devblockwrite, transaction, scan) but packs the operations itself: consecutive
+    accesses share the same record (one base address for a burst) and up to
+    self.window packets are in flight at the same time.
+
+    Lost packets are sent again up to self.attempts times. Be aware that a write
+    to a FIFO might then be executed twice if only the reply has been lost.
+    '''
+
+    def __init__(self, LUN, verbose=False, timeout=0.5):
+        '''Constructor
+
+        Args:
+            LUN : netaddress of the device: "udp/192.168.7.2", "udp/192.168.7.2/60368" or "192.168.7.2"
+            verbose : enables debug info
+            timeout : seconds to wait a reply before sending the packet again
+        '''
+        self.LUN=LUN
+        self.libname="python"
+        self.verbose=verbose
+        self.timeout=timeout
+        self.attempts=3
+        self.silent=True
+        self.window=8
+        self.mtu=EB_UDP_MTU
+        self.wcrc=0
+        self.sock=None
+        self._tag=0
+
+        if LUN!="": self.open(LUN)
+
+    def __del__(self):
+        self.close()
+
+    def open(self, LUN):
+        '''Open the UDP socket and probe the device
+        '''
+        parts=LUN.split("/")
+        if parts[0]=="udp": parts=parts[1:]
+        host=parts[0]
+        port=int(parts[1],0) if len(parts)>1 else EB_UDP_PORT
+        self.LUN=LUN
+        self.sock=socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.connect((host, port))
+            self.probe()
+        except (socket.error, BusException), e:
+            self.close()
+            raise BusCritical("failed to open Etherbone device %s: %s" % (LUN, e))
+
+    def close(self):
+        '''Close the UDP socket
+        '''
+        if self.sock is not None:
+            self.sock.close()
+            self.sock=None
+
+    def set_timeout(self, timeout):
+        '''Set the seconds to wait a reply before sending the packet again
+        '''
+        self.timeout=timeout
+
+    def probe(self):
+        '''Send an Etherbone probe and wait for the response of the device
+
+        Returns:
+            The address/port sizes byte announced by the device
+        '''
+        for attempt in range(0,max(self.attempts,1)):
+            tag=self._nexttag()
+            self.sock.send(struct.pack(">HBBI", EB_MAGIC, (EB_PROTOCOL_VERSION << 4) | EB_FLAG_PF, EthBone.EB_ADDRX|EthBone.EB_DATAX, tag))
+            deadline=time.time()+self.timeout
+            while time.time()<deadline:
+                r, w, x = select.select([self.sock], [], [], max(0.0, deadline-time.time()))
+                if not r: break
+                data=self.sock.recv(65536)
+                if len(data)<8: continue
+                magic, flags, sizes, rtag = struct.unpack(">HBBI", data[:8])
+                if magic==EB_MAGIC and (flags & EB_FLAG_PR) and rtag==tag:
+                    if not (sizes & 0x44)==0x44: raise BusCritical("Device does not support 32bits access (0x%02x)" % (sizes))
+                    return sizes
+        raise BusWarning("No response to Etherbone probe")
+
+    def devread(self, bar, offset, width):
+        '''Method that do a single read cycle
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            width : data size => Must be 4 bytes
+
+        Raises:
+            BusWarning: when the width is not 4 bytes
+        '''
+        self.checkWidth(width)
+        datum=self.transfer([[(False, offset, None)]])[0][0]
+        if self.verbose: print "R@x%08X > 0x%08x" %(offset, datum)
+        return datum
+
+    def devwrite(self, bar, offset, width, datum):
+        '''Method that do a single write cycle (waiting for its acknowledgment)
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            width : data size => Must be 4 bytes
+            datum : data value that need to be written
+
+        Raises:
+            BusWarning: when the width is not 4 bytes
+        '''
+        self.checkWidth(width)
+        if self.verbose: print "W@x%08X < 0x%08x" %(offset, datum)
+        self.transfer([[(True, offset, datum)]])
+        return datum
+
+    def checkWidth(self, width):
+        '''Raise BusWarning when width is not 4 bytes, the only width encoded by this client (ByteEn=0x0F)
+        '''
+        if width!=4: raise BusWarning('Unsupported access width: %s bytes (only 4 bytes)' % (width))
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that read a data block filling a caller-supplied buffer in place
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address at the device
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr: address increment between words (0x0 to read from a FIFO)
+
+        Returns:
+            The same buffer filled with the 32bits words (in host byte order)
+        '''
+        nwords=self.bufferWords(buf)
+        if nwords==0: return buf
+        cycles=self.split([(False, offset+i*incr, None) for i in xrange(nwords)])
+        words=array('I')
+        for values in self.transfer(cycles):
+            words.extend(values)
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''Method that write a data block in pipelined cycles
+
+        The acknowledgment of the device is only checked when silent mode is disabled.
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address in the device
+            ldata : A list of 32bits words or any buffer object (see toWords())
+            incr: address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        self.wcrc=binascii.crc32(words, self.wcrc)
+        cycles=self.split([(True, offset+i*incr, d) for i, d in enumerate(words)], not self.silent)
+        self.transfer(cycles, not self.silent)
+        return 0
+
+    def commit_transaction(self, ops):
+        '''Method that execute the operations queued by a BusTransaction
+
+        The operations are packed in as few cycles as possible, a read-modify-write
+        ends the cycles sent together since its write needs the read value.
+
+        Args:
+            ops : list of (kind, offset, width, datum, mask, future) tuples
+
+        Raises:
+            BusWarning: when an operation is not 4 bytes wide
+        '''
+        for op in ops: self.checkWidth(op[2])
+        carry=[]
+        i=0
+        while i<len(ops) or carry:
+            batch=[(True, addr, data) for addr, data in carry]
+            carry=[]
+            reads=[]
+            while i<len(ops):
+                kind, addr, width, datum, mask, fut = ops[i]
+                i=i+1
+                if kind==BusTransaction.OP_WRITE:
+                    batch.append((True, addr, datum))
+                    fut.set(datum)
+                else:
+                    batch.append((False, addr, None))
+                    reads.append(ops[i-1])
+                    if kind==BusTransaction.OP_RMW: break
+            cycles=self.split(batch)
+            values=[]
+            for res in self.transfer(cycles): values.extend(res)
+            for j, (kind, addr, width, datum, mask, fut) in enumerate(reads):
+                fut.set(values[j])
+                if kind==BusTransaction.OP_RMW:
+                    carry.append((addr, (values[j] & ~mask) | (datum & mask)))
+
+    def readconfig(self, offsets):
+        '''Read registers of the config space of the Etherbone slave in a single packet
+
+        Args:
+            offsets : list of offsets in the config space (i.e. EB_CONFIG_SDB_HI)
+
+        Returns:
+            A list with the 32bits value of each register
+        '''
+        return self.transfer([[(False, offset, None) for offset in offsets]], False, True)[0]
+
+    def getsdbroot(self):
+        '''Return the address of the SDB root published in the config space of the Etherbone slave
+
+        Returns:
+            The address, or None if the slave does not publish it
+        '''
+        try:
+            hi, lo = self.readconfig([EB_CONFIG_SDB_HI, EB_CONFIG_SDB_LO])
+        except BusWarning, e:
+            if self.verbose: print e
+            return None
+        return ((hi << 32) | lo) or None
+
+    def getChunkWords(self):
+        '''Return the maximum number of 32bits words of a block transfer that fit in one packet
+
+        After the IP/UDP headers and the Etherbone header, a packet holds the
+        record of the words (header, base address, values) and the record
+        checking the error register (header, base address, 2 config reads).
+        '''
+        nwords=(self.mtu-EB_UDP_OVERHEAD-4-2*4-4*4)/4
+        return max(1,min(EB_MAX_RECORD_OPS,nwords))
+
+    def split(self, ops, check=True, config=False):
+        '''Split a list of (is_write, address, data) operations in cycles that fit in one packet of self.mtu bytes (see eb_split_cycles())
+        '''
+        return eb_split_cycles(ops, self.mtu-EB_UDP_OVERHEAD, check, config)
+
+    def transfer(self, cycles, check=True, config=False):
+        '''Send the cycles (one packet each) with up to self.window packets in flight
+
+        Args:
+            cycles: list of cycles, each one a list of (is_write, address, data) tuples
+            check: read the error register of the slave at the end of each cycle.
+            Without check and without reads, the packets are posted (no reply).
+            config: the reads are done in the config space of the slave
+
+        Returns:
+            A list with the read values of each cycle
+
+        Raises:
+            BusWarning: on timeout or when the slave reports a failed operation
+        '''
+        if self.sock is None: raise BusCritical("Etherbone device %s is not opened" % (self.LUN))
+        results=[None]*len(cycles)
+        inflight={} ## tag => [cycle index, packet, answered records, time sent, attempts]
+        inext=0
+        while inext<len(cycles) or inflight:
+            while inext<len(cycles) and len(inflight)<max(self.window,1):
+                tag=self._nexttag()
+                packet, answered = eb_encode_cycle(tag, cycles[inext], check, config)
+                if packet: self.sock.send(packet)
+                if answered: inflight[tag]=[inext, packet, answered, time.time(), 1]
+                else: results[inext]=[]
+                inext=inext+1
+            if not inflight: break
+
+            r, w, x = select.select([self.sock], [], [], self.timeout)
+            if r:
+                try:
+                    data=self.sock.recv(65536)
+                except socket.error, e:
+                    raise BusWarning("Etherbone receive: %s" % (e))
+                replies=eb_decode_reply(data)
+                if replies: self._dispatch(replies, inflight, cycles, results, check)
+            now=time.time()
+            for tag, entry in inflight.items():
+                if now-entry[3]<self.timeout: continue
+                if entry[4]>=self.attempts:
+                    raise BusWarning("Etherbone timeout @0x%08x (%d attempts)" % (cycles[entry[0]][0][1], entry[4]))
+                self.sock.send(entry[1])
+                entry[3]=now
+                entry[4]+=1
+        return results
+
+    def _dispatch(self, replies, inflight, cycles, results, check):
+        ''' Store the values of a reply and check the error register of its cycle '''
+        tag=(replies.keys()[0] >> 16) & 0xFFFF
+        if tag not in inflight: return ##Late reply of a packet sent again
+        index, packet, answered, sent, tries = inflight.pop(tag)
+        values=[]
+        for i in answered:
+            values.extend(replies.get(eb_reply_tag(tag, i), ()))
+        ops=cycles[index]
+        if check:
+            errhi, errlo = values[-2:]
+            values=values[:-2]
+            nops=min(len(ops),64)
+            err=((errhi << 32) | errlo) & ((1 << nops)-1)
+            if err:
+                k=0
+                while not (err >> k) & 1: k=k+1
+                raise BusWarning('Bad Etherbone access @0x%08x' % (ops[len(ops)-1-k][1]))
+        results[index]=values
+
+    def _nexttag(self):
+        self._tag=(self._tag+1) & 0xFFFF
+        return self._tag
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "Etherbone python client (v%d): %s" % (EB_PROTOCOL_VERSION,self.LUN)
+
+    @staticmethod
+    def scan(options):
+        '''
+        Method for scan the bus to find WR devices connected (see EthBone.scan())
+        '''
+        return EthBone.scan(options)
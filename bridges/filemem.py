@@ -31,90 +31,176 @@ This file contains the debug class FileMem which is a child of the abstract clas
 #----------------------------------------- -------------------------------------
 # Import system modules
 from ctypes import *
-import os, errno, re, sys, struct
+import os, errno, re, sys, struct, mmap
 import os.path
+from array import array
 # Import common modules
 from core.gendrvr import *
 
 
-# python 2.4 kludge
-if not 'SEEK_SET' in dir(os):
-    os.SEEK_SET = 0
-
 class FileMem(GenDrvr):
     '''
     This class is used for debugging or developing purpose only.
 
     It can fake behaviour without the need of a real device.
+
+    The memory is kept in a dictionary {address: value} loaded once from a text
+    file with one "@0xADDR: 0xVAL" line per word, and written back only when
+    flush() or close() is called. A binary image (32bits little endian words)
+    can also be given to back the window [base, base+size of the image]: it is
+    memory-mapped, so the accesses inside this window go straight to the file.
     '''
 
     fid=None
 
-    def __init__(self, fpath):
-        """Constructor method: call open()"""
-        self.open(fpath)
+    def __init__(self, fpath, verbose=False, image=None, base=0):
+        """Constructor method: call open()
 
-    def __del__(self):
-        self.fid.close()
+        Args:
+            fpath : text file with the "@0xADDR: 0xVAL" lines (None to only use the image)
+            verbose : print each access
+            image : optional binary image that is memory-mapped
+            base : address of the first word of the image
+        """
+        self.verbose=verbose
+        self.mem={}
+        self.dirty=False
+        self.fpath=None
+        self.image=None
+        self.imgfd=None
+        self.base=base
+        self.open(fpath, image)
 
-    def open(self,fpath):
-        """Open a read/write file using filepath"""
-        self.fid = open(fpath,'r+')
+    def __del__(self):
+        self.close()
+
+    def open(self,fpath,image=None):
+        """Load the text file at fpath and map the binary image if any"""
+        self.fpath=fpath
+        if fpath is not None and os.path.exists(fpath):
+            with open(fpath,'r') as fid:
+                for m in re.finditer(r'@0x([0-9a-f]+):\s*0x([0-9a-f]+)', fid.read(), re.IGNORECASE):
+                    self.mem[int(m.group(1),16)]=int(m.group(2),16)
+        if image is not None:
+            self.imgfd=os.open(image, os.O_RDWR)
+            size=os.fstat(self.imgfd).st_size & ~0x3
+            self.image=mmap.mmap(self.imgfd, size, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE)
+            self.end=self.base+size
+
+    def flush(self):
+        """Write back the modified words to the text file and the image"""
+        if self.image is not None: self.image.flush()
+        if not self.dirty or self.fpath is None: return
+        with open(self.fpath,'w') as fid:
+            fid.write("".join(["@0x%08X: 0x%08x\n" % (a, self.mem[a]) for a in sorted(self.mem)]))
+        self.dirty=False
 
     def close(self):
         """Flush and close the file"""
-        self.fid.flush()
-        self.fid.close()
-
-
+        self.flush()
+        if self.image is not None:
+            self.image.close()
+            os.close(self.imgfd)
+            self.image=None
 
     def find(self,address):
         """Find a value at a specific address"""
-        line=self.fid.readline()
-        val=0
-        pos=line.find('@0x%08X:' % (address))
-        if pos<0:
-            self.fid.seek(0)
-            lines = self.fid.read()
-            pos = lines.find('@0x%08X:' % (address))
-            if pos >=0:
-                self.fid.seek(pos)
-                line=self.fid.readline()
-        if pos>=0:
-            val=re.search('@0x%08X: 0x([0-9a-f]{8})' % (address),line, re.IGNORECASE).group(1)
-            val=int(val,16)
-        return {'pos':pos, 'val':val}
+        if self.image is not None and self.base<=address<self.end:
+            return {'pos':address-self.base, 'val':struct.unpack_from("<I",self.image,address-self.base)[0]}
+        val=self.mem.get(address)
+        if val is None: return {'pos':-1, 'val':0}
+        return {'pos':address, 'val':val}
 
 
     def devread(self, bar, offset, width):
         '''
-        Method that do a read on the opened file
+        Method that do a read on the memory
 
         Args:
             bar : BAR used by PCIe bus (not need here)
             offset : address within bar
-            width : data size (1, 2, or 4 bytes)
+            width : data size (1, 2, or 4 bytes) => 32bits words are always used
         '''
-        address = offset
-        ret=self.find(address)
-        print "R: @0x%08X: 0x%08x (%d)" % (address, ret['val'],ret['pos'])
-        return ret['val']
+        if self.image is not None and self.base<=offset<self.end:
+            val=struct.unpack_from("<I",self.image,offset-self.base)[0]
+        else:
+            val=self.mem.get(offset,0)
+        if self.verbose: print "R: @0x%08X: 0x%08x" % (offset, val)
+        return val
 
 
     def devwrite(self, bar, offset, width,datum):
         '''
-        Method that do a write of datatum on the opened file
+        Method that do a write of datatum on the memory
 
         Args:
             bar : BAR used by PCIe bus (not need here)
             offset : address within bar
-            width : data size (1, 2, or 4 bytes)
+            width : data size (1, 2, or 4 bytes) => 32bits words are always used
             datum : data value that need to be written
         '''
-        address = offset
-        wstr="@0x%08X: 0x%08x" % (address,datum)
-        ret=self.find(address)
-        if ret["pos"]>=0:
-            self.fid.seek(ret["pos"])
-        print "W: %s" % (wstr)
-        self.fid.write(wstr+"\n")
+        if self.verbose: print "W: @0x%08X: 0x%08x" % (offset,datum)
+        if self.image is not None and self.base<=offset<self.end:
+            struct.pack_into("<I",self.image,offset-self.base,datum & 0xFFFFFFFF)
+        else:
+            self.mem[offset]=datum & 0xFFFFFFFF
+            self.dirty=True
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''
+        Method that read a data block from the memory
+
+        Args:
+            bar : BAR used by PCIe bus (not need here)
+            offset : address of the first word
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        nwords=self.bufferWords(buf)
+        if incr==4 and self._inimage(offset, nwords):
+            idx=offset-self.base
+            words=array('I')
+            words.fromstring(self.image[idx:idx+nwords*4])
+            if sys.byteorder!='little': words.byteswap()
+        else:
+            read=type(self).devread
+            words=array('I',[read(self, bar, offset+i*incr, 4) for i in xrange(nwords)])
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''
+        Method that write a data block into the memory
+
+        Args:
+            bar : BAR used by PCIe bus (not need here)
+            offset : address of the first word
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        if incr==4 and self._inimage(offset, len(words)):
+            if sys.byteorder!='little': words=array('I',words); words.byteswap()
+            idx=offset-self.base
+            self.image[idx:idx+len(words)*4]=words.tostring()
+        elif incr==4 and self.image is None and not self.verbose:
+            self.mem.update(zip(xrange(offset, offset+4*len(words), 4), words))
+            self.dirty=True
+        else:
+            write=type(self).devwrite
+            for i in xrange(len(words)):
+                write(self, bar, offset+i*incr, 4, words[i])
+        return 0
+
+    def _inimage(self, offset, nwords):
+        return self.image is not None and self.base<=offset and offset+4*nwords<=self.end
+
+    @staticmethod
+    def scan(options=None):
+        '''
+        There is nothing to scan with a file
+        '''
+        return []
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "FileMem: %s (%d words)" %(self.fpath, len(self.mem))
@@ -32,16 +32,26 @@ This file contains the FPGABGD class which is a child of the abstract class GenD
 # Import system modules
 import subprocess
 import os
+from array import array
 # Import common modules
 from core.gendrvr import *
 
+## Prototypes of the libfpgabgd functions: (restype, argtypes)
+FPGABGD_PROTOTYPES = {
+    'FPGABGD_open'        : (c_void_p, [c_uint, c_uint]),
+    'FPGABGD_close'       : (c_int, []),
+    'FPGABGD_wishbone_RW' : (c_int, [c_void_p, c_uint, c_void_p, c_int]),
+    'FPGABGD_version'     : (None, [c_char_p]),
+}
+
+
 class FPGABGD(GenDrvr):
     '''The FPGABGD class has been created to interface WB access within the WRS.
 
     We have create a simple library that open the device and can perform
     read/write on the WB bus.
-    The read/write block data function are not implemented for this driver
-    to keep it as simple as possible.
+    The library has no block access, so the read/write block data functions
+    loop on FPGABGD_wishbone_RW() directly over the memory of the data block.
     '''
 
     def __init__(self,baseaddr, show_dbg=False):
@@ -52,18 +62,23 @@ class FPGABGD(GenDrvr):
             show_dbg : enables debug info
         '''
         self.show_dbg=show_dbg
-        self.load_lib("libfpgabgd.so")
+        self.load_lib("libfpgabgd.so", FPGABGD_PROTOTYPES)
         self.baseaddr=baseaddr
         self.sizeaddr=0 #0 is used for default size addr
 
+        ##Scratch buffer of devread()/devwrite() allocated once for the handle
+        self._data=c_uint(0xBADC0FFE)
+        self._pdata=addressof(self._data)
+        self._wishbone_RW=self.lib.FPGABGD_wishbone_RW
+
         if self.show_dbg: print self.info()+"\n"
         self.open(0)
 
     def open(self, LUN):
         '''Open the device and map to the FPGA bus
         '''
-        self.hdev=self.lib.FPGABGD_open(c_uint(self.baseaddr),c_uint(self.sizeaddr))
-        if self.hdev==0:
+        self.hdev=self.lib.FPGABGD_open(self.baseaddr,self.sizeaddr)
+        if not self.hdev:
             raise NameError("Could not open device")
 
     def close(self):
@@ -79,15 +94,11 @@ class FPGABGD(GenDrvr):
             offset : address within bar
             width : data size (1, 2, or 4 bytes)
         '''
-        address = offset
-        INTP = POINTER(c_uint)
-        data = c_uint(0xBADC0FFE)
-        pData = cast(addressof(data), INTP)
-        ret=self.lib.FPGABGD_wishbone_RW(self.hdev,c_uint(address),pData,0)
-        if self.show_dbg: print "R@x%08X > 0x%08x" %(address, pData[0])
+        ret=self._wishbone_RW(self.hdev,offset,self._pdata,0)
+        if self.show_dbg: print "R@x%08X > 0x%08x" %(offset, self._data.value)
         if ret !=0:
             raise NameError('Bad Wishbone Read')
-        return pData[0]
+        return self._data.value
 
 
     def devwrite(self, bar, offset, width, datum):
@@ -99,15 +110,54 @@ class FPGABGD(GenDrvr):
             width : data size (1, 2, or 4 bytes)
             datum : data value that need to be written
         '''
-        address = offset
-        INTP = POINTER(c_uint)
-        data = c_uint(datum)
-        pData = cast(addressof(data), INTP)
-        if self.show_dbg: print "W@x%08X < 0x%08x" %( address, pData[0])
-        ret=self.lib.FPGABGD_wishbone_RW(self.hdev,c_uint(address),pData,1)
+        self._data.value=datum
+        if self.show_dbg: print "W@x%08X < 0x%08x" %(offset, self._data.value)
+        ret=self._wishbone_RW(self.hdev,offset,self._pdata,1)
         if ret !=0:
-            raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(address,datum, ret))
-        return pData[0]
+            raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(offset,datum, ret))
+        return self._data.value
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that read a data block calling the library in a tight loop
+
+        The library writes each word directly in the memory of an array('I').
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        nwords=self.bufferWords(buf)
+        words=array('I',[0])*nwords
+        if nwords==0: return buf
+        rw, hdev, ptr = self._wishbone_RW, self.hdev, words.buffer_info()[0]
+        for i in xrange(nwords):
+            if rw(hdev,offset+i*incr,ptr+4*i,0) !=0:
+                raise NameError('Bad Wishbone Read @0x%08x' %(offset+i*incr))
+        if self.show_dbg: print "R@x%08X > %d words" %(offset, nwords)
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''Method that write a data block calling the library in a tight loop
+
+        The library reads each word directly from the memory of an array('I').
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        if self.show_dbg: print "W@x%08X < %d words" %(offset, len(words))
+        if len(words)==0: return 0
+        rw, hdev, ptr = self._wishbone_RW, self.hdev, words.buffer_info()[0]
+        for i in xrange(len(words)):
+            ret=rw(hdev,offset+i*incr,ptr+4*i,1)
+            if ret !=0:
+                raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(offset+i*incr,words[i], ret))
+        return 0
 
     def info(self):
         """get a string describing the interface the driver is bound to """
@@ -2,8 +2,11 @@
 #   :vi:ts=4 sw=4 et
 
 from ctypes import *
-import os, errno, re, sys, struct
+import os, errno, re, sys, struct, mmap
 import os.path
+from array import array
+
+from core.gendrvr import *
 
 # python 2.4 kludge
 if not 'SEEK_SET' in dir(os):
@@ -28,6 +31,22 @@ bar_map = {
 	4: RR_BAR_4,
 	0xc: RR_BAR_BUF }
 
+# one syscall per contiguous block (os.pread/os.pwrite when python provides them)
+if hasattr(os, 'pread'):
+    def rr_pread(fd, nbytes, address):
+        return os.pread(fd, nbytes, address)
+
+    def rr_pwrite(fd, data, address):
+        return os.pwrite(fd, data, address)
+else:
+    def rr_pread(fd, nbytes, address):
+        os.lseek(fd, address, os.SEEK_SET)
+        return os.read(fd, nbytes)
+
+    def rr_pwrite(fd, data, address):
+        os.lseek(fd, address, os.SEEK_SET)
+        return os.write(fd, data)
+
 # classes to interface with the driver via ctypes
 
 Plist = c_int * 256
@@ -163,7 +182,8 @@ class Gennum(object):
                 ds.subvendor, ds.subdevice,
                 ds.bus, ds.devfn)
 
-    def parse_addr(self, addr):
+    @staticmethod
+    def parse_addr(addr):
         """take a string of the form
                vendor:device[/subvendor:subdevice][@bus:devfn]
         and return a dictionary object with the corresponding values,
@@ -194,6 +214,177 @@ class Gennum(object):
         self.errno = self.lib.rr_devsel(self.fd, byref(ds))
         return self.errno
 
+class RawRabbit(GenDrvr):
+    """GenDrvr interface of the rawrabbit driver (SPEC and other GN4124 boards)
+
+    The accesses use the read/write interface of the driver: a single access
+    or a whole contiguous block is one pread/pwrite on the device. The DMA
+    buffer (RR_BAR_BUF) is memory-mapped by getdmabuffer(). The ioctl helper
+    library (rrlib.so) is only loaded for bind(), info() and the DMA/IRQ calls.
+
+    Attributes:
+        bar : BAR used by the shortcut methods (0, 2, 4 or 0xc for the DMA buffer)
+    """
+    device = '/dev/rawrabbit'
+    rrlib = Gennum.rrlib
+
+    def __init__(self, LUN=None, verbose=False, bar=0, device=None):
+        """Constructor
+
+        Args:
+            LUN : device to bind, vendor:device[/subvendor:subdevice][@bus:devfn] (None to keep the current one)
+            verbose : enables debug info
+            bar : BAR used by read()/write() shortcuts
+            device : path of the rawrabbit device
+        """
+        self.verbose=verbose
+        self.bar=bar
+        self.fd=None
+        self.lib=None
+        self.libname=self.rrlib
+        self.dmabuf=None
+        self._dmaview=None
+        if device is not None: self.device=device
+        self._structs={1: struct.Struct("=B"), 2: struct.Struct("=H"), 4: struct.Struct("=I"), 8: struct.Struct("=Q")}
+        self.open(LUN)
+
+    def __del__(self):
+        self.close()
+
+    def open(self, LUN=None):
+        """Open the rawrabbit device and bind it to LUN"""
+        try:
+            self.fd = os.open(self.device, os.O_RDWR)
+        except OSError, e:
+            raise BusCritical("Could not open %s: %s" % (self.device, e))
+        if LUN: self.bind(LUN)
+
+    def close(self):
+        """Unmap the DMA buffer and close the device"""
+        self._dmaview=None
+        if self.dmabuf is not None:
+            self.dmabuf.close()
+            self.dmabuf=None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd=None
+
+    def getlib(self):
+        """Return the ioctl helper library, loading it the first time"""
+        if self.lib is None: self.lib=load_native_lib(self.rrlib)
+        return self.lib
+
+    def devread(self, bar, offset, width):
+        """do a read with a single pread
+
+            bar = 0, 2, 4 (or c for DMA buffer access)
+            offset = address within bar
+            width = data size (1, 2, 4 or 8 bytes)
+        """
+        address = bar_map[bar] + offset
+        buf = rr_pread(self.fd, width, address)
+        if len(buf)!=width: raise BusWarning("Short read @0x%08x (%d bytes)" % (address, len(buf)))
+        ret = self._structs[width].unpack(buf)[0]
+        if self.verbose: print "R@x%08X > 0x%08x" % (address, ret)
+        return ret
+
+    def devwrite(self, bar, offset, width, datum):
+        """do a write with a single pwrite
+
+            bar = 0, 2, 4 (or c for DMA buffer access)
+            offset = address within bar
+            width = data size (1, 2, 4 or 8 bytes)
+            datum = value to be written
+        """
+        address = bar_map[bar] + offset
+        if self.verbose: print "W@x%08X < 0x%08x" % (address, datum)
+        if rr_pwrite(self.fd, self._structs[width].pack(datum & ((1 << 8*width)-1)), address)!=width:
+            raise BusWarning("Short write @0x%08x" % (address))
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        """read a data block, with a single pread when the addresses are contiguous
+
+            bar = 0, 2, 4 (or c for DMA buffer access)
+            offset = address within bar
+            buf = writable buffer (bytearray, array('I'), memoryview...)
+            incr = address increment between words (0x0 to read from a FIFO)
+        """
+        nwords=self.bufferWords(buf)
+        if nwords==0: return buf
+        if incr!=4: return GenDrvr.devblockread_into(self, bar, offset, buf, incr)
+        address = bar_map[bar] + offset
+        data = rr_pread(self.fd, nwords*4, address)
+        if len(data)!=nwords*4: raise BusWarning("Short read @0x%08x (%d bytes)" % (address, len(data)))
+        words=array('I')
+        words.fromstring(data)
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        """write a data block, with a single pwrite when the addresses are contiguous
+
+            bar = 0, 2, 4 (or c for DMA buffer access)
+            offset = address within bar
+            ldata = list of 32bits words or any buffer object (see toWords())
+            incr = address increment between words (0x0 to write into a FIFO)
+        """
+        if incr!=4: return GenDrvr.devblockwrite(self, bar, offset, ldata, incr)
+        data = self.toWords(ldata).tostring()
+        address = bar_map[bar] + offset
+        if data and rr_pwrite(self.fd, data, address)!=len(data):
+            raise BusWarning("Short write @0x%08x" % (address))
+        return 0
+
+    def getdmabuffer(self):
+        """return the DMA buffer as a memoryview of bytes over its mapping (zero copy)"""
+        if self._dmaview is None:
+            size = self.getdmasize()
+            self.dmabuf = mmap.mmap(self.fd, size, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE, offset=RR_BAR_BUF)
+            self._dmaview = memoryview((c_uint8*size).from_buffer(self.dmabuf))
+        return self._dmaview
+
+    def irqwait(self):
+        """wait for an interrupt"""
+        return self.getlib().rr_irqwait(self.fd)
+
+    def irqena(self):
+        """enable the interrupt line"""
+        return self.getlib().rr_irqena(self.fd)
+
+    def getdmasize(self):
+        """return the size of the allocated DMA buffer (in bytes)"""
+        return self.getlib().rr_getdmasize(self.fd)
+
+    def getblocksize(self,index=0):
+        """return the size of the allocated DMA buffer (in bytes)"""
+        return self.getdmasize()
+
+    def getplist(self):
+        """get a list of pages for DMA access (see Gennum.getplist())"""
+        plist = Plist()
+        self.getlib().rr_getplist(self.fd, plist)
+        return plist
+
+    def bind(self, device):
+        """bind the rawrabbit driver to a device (see Gennum.parse_addr())"""
+        ds = RR_Devsel(**Gennum.parse_addr(device))
+        errno = self.getlib().rr_devsel(self.fd, byref(ds))
+        if errno < 0: raise BusCritical("Could not bind %s (%d)" % (device, errno))
+        return errno
+
+    def info(self):
+        """get a string describing the interface the driver is bound to"""
+        ds = RR_Devsel()
+        self.getlib().rr_devget(self.fd, byref(ds))
+        return 'rawrabbit %04x:%04x/%04x:%04x@%04x:%04x' % (
+                ds.vendor, ds.device,
+                ds.subvendor, ds.subdevice,
+                ds.bus, ds.devfn)
+
+    @staticmethod
+    def scan(options=None):
+        """return the rawrabbit device when the driver is loaded"""
+        return [d for d in [RawRabbit.device] if os.path.exists(d)]
+
 if __name__ == '__main__':
     g = Gennum()
     print g.parse_addr('1a39:0004/1a39:0004@0020:0000')
@@ -34,8 +34,16 @@ This file is based on the official version 1.1 of sdb.h
 
 # Import system modules
 import os
+import re
+import sys
+import struct
+import bisect
+import binascii
+from collections import deque
 from ctypes import *
 import ctypes
+import cPickle as pickle
+from array import array
 
 # User defined modules
 from core.gendrvr import BusWarning, BusCritical, BusException
@@ -52,6 +60,10 @@ SDB_DATA_READ               = 0x04
 SDB_DATA_WRITE              = 0x02
 SDB_DATA_EXEC               = 0x01
 
+# Cache of the parsed SDB trees (see SDBNode.parse_cached())
+SDB_CACHE_DIR               = os.path.join(os.path.expanduser("~"), ".py7slib", "sdb")
+SDB_CACHE_VERSION           = 1
+
 
 
 class StructStr(BigEndianStructure):
@@ -262,6 +274,111 @@ class sdb_record(Union):
 
 
 
+class SDBRecord(object):
+    """
+    Decoded SDB record
+
+    It is decoded once from the 64 bytes of a sdb_record: the fields are plain
+    int/long and str (the unused ones are None) and the record can not be
+    modified. The address is absolute (addr_first plus the offset of its
+    crossbar) and buspath is the one printed by ls(). A record of an unknown
+    type only keeps its record_type.
+    """
+    __slots__ = ("record_type", "vendor_id", "device_id", "version", "date", "name",
+                 "addr_first", "addr_end", "address", "buspath",
+                 "sdb_records", "sdb_version", "sdb_bus_type", "child",
+                 "abi_class", "abi_ver_major", "abi_ver_minor", "bus_specific",
+                 "commit_id", "tool_name", "user_name")
+
+    ## The component records (interconnect, device, bridge) and the integration one
+    ## share the layout of the product at the end of the record
+    _PRODUCT=struct.Struct(">8sQQQIII19sB")
+    _SYNTHESIS=struct.Struct(">16s16s8sII15sB")
+    _KNOWN=(sdb_record.TYPE_INTERCONNECT, sdb_record.TYPE_DEVICE, sdb_record.TYPE_BRIDGE, sdb_record.TYPE_INTEGRATION,
+            sdb_record.TYPE_REPO_URL, sdb_record.TYPE_SYNTHESIS, sdb_record.TYPE_EMPTY)
+
+    def __init__(self,raw,offset=0,buspath=""):
+        """
+        Args:
+            raw: the 64 bytes of the record (big endian string)
+            offset: offset of its crossbar (see SDBNode.offset)
+            buspath: buspath of the record
+        """
+        fields=dict.fromkeys(self.__slots__)
+        rtype=ord(raw[63])
+        fields["record_type"]=rtype
+        fields["buspath"]=buspath
+        if rtype in (sdb_record.TYPE_INTERCONNECT, sdb_record.TYPE_DEVICE, sdb_record.TYPE_BRIDGE, sdb_record.TYPE_INTEGRATION):
+            specific, first, end, vendor, device, version, date, name = self._PRODUCT.unpack(raw)[:8]
+            fields.update(vendor_id=vendor, device_id=device, version=version, date=date, name=self._str(name))
+            if rtype!=sdb_record.TYPE_INTEGRATION:
+                fields.update(addr_first=first, addr_end=end, address=offset+first)
+            if rtype==sdb_record.TYPE_INTERCONNECT:
+                fields["sdb_records"], fields["sdb_version"], fields["sdb_bus_type"] = struct.unpack(">4xHBB", specific)
+            elif rtype==sdb_record.TYPE_DEVICE:
+                fields["abi_class"], fields["abi_ver_major"], fields["abi_ver_minor"], fields["bus_specific"] = struct.unpack(">HBBI", specific)
+            elif rtype==sdb_record.TYPE_BRIDGE:
+                fields["child"]=struct.unpack(">Q", specific)[0]
+        elif rtype==sdb_record.TYPE_REPO_URL:
+            fields["name"]=self._str(raw[:63])
+        elif rtype==sdb_record.TYPE_SYNTHESIS:
+            name, commit, tool, version, date, user = self._SYNTHESIS.unpack(raw)[:6]
+            fields.update(name=self._str(name), commit_id=binascii.hexlify(commit), tool_name=self._str(tool),
+                          version=version, date=date, user_name=self._str(user))
+        self._setfields(fields)
+
+    def _setfields(self,fields):
+        for k, v in fields.iteritems(): object.__setattr__(self, k, v)
+
+    def __reduce__(self):
+        ## Rebuild the read-only record from its fields (pickle, copy)
+        return (_sdb_record_rebuild, (dict((k, getattr(self,k)) for k in self.__slots__),))
+
+    @staticmethod
+    def _str(raw):
+        return raw.split("\0",1)[0]
+
+    def __setattr__(self,name,value):
+        raise AttributeError("SDBRecord is read-only")
+
+    def __delattr__(self,name):
+        raise AttributeError("SDBRecord is read-only")
+
+    def is_type(self,type):
+        return self.record_type==type
+
+    def is_component(self):
+        return (self.record_type & 0xFC)==0 and self.is_known()
+
+    def is_known(self):
+        return self.record_type in self._KNOWN
+
+    def __repr__(self):
+        return "<SDBRecord 0x%02x %s %r>" %(self.record_type, self.buspath, self.name)
+
+    def __str__(self):
+        if not self.is_known(): raise BaseException("Sdb unknown type %0x" %(self.record_type))
+        msg=""
+        for name in self.__slots__:
+            var=getattr(self,name)
+            if var is None or name=="buspath": continue
+            if name=="vendor_id":
+                msg+="%-15s: 0x%016x" % (name,var)
+                msg+={0x651: " (GSI)\n", 0x7501: " (7S)\n", 0xCE42: " (CERN)\n"}.get(var,"\n")
+            elif isinstance(var,(int,long)):
+                msg+="%-15s: 0x%x\n" % (name,var)
+            else:
+                msg+="%-15s: %s\n" % (name,var)
+        return msg
+
+def _sdb_record_rebuild(fields):
+    """ Create a SDBRecord from the fields given by SDBRecord.__reduce__() """
+    record=SDBRecord.__new__(SDBRecord)
+    record._setfields(fields)
+    return record
+
+
+
 class SDBNode():
     """
     Main class that represent a SDB node:
@@ -275,6 +392,8 @@ class SDBNode():
     level=0      # return its sub-level (0 for root)
     buspath_prefix=""
     debug=False
+    keepraw=False  # keep the raw table after decoding it (see rawtable())
+    cache=None     # (LUN, fpath) of the cache file updated when a crossbar is read by expand()
 
     def __init__(self,bus,base,parent=None):
         """
@@ -289,13 +408,20 @@ class SDBNode():
         if parent!=None:
             self.level=parent.level+1
             self.debug=parent.debug
-        self.interconnect=sdb_interconnect()
+            self.keepraw=parent.keepraw
+            self.cache=parent.cache
+        self.interconnect=None
+        self.raw=None
         self.elements=[]
+        self.parsed=False
+        self._lazylevel=-1
+        self._tables=None ## Raw tables of the cache file, by address (see load_cache())
+        self._index=None
         self.bus=bus
         self.base=base
 
 
-    def parse(self,maxlevel=-1):
+    def parse(self,maxlevel=-1,lazy=False):
         """
         Parse the SDB structure
 
@@ -303,33 +429,212 @@ class SDBNode():
 
         Args:
             maxlevel: the maximum number of nested bus we can explore (if -1 we stop when we don't find new one)
+            lazy: only parse this crossbar, the nodes of the bridges are parsed when they are
+            first accessed (see expand())
         """
         ## Check that we have a correct base, otherwise we scan it
         if self.base==None:
             self.base=self.scan()
-        else:
-            if self.bus.read(self.base) != SDB_MAGIC: raise BaseException("Sdb base offset 0x%08x has not a valid sdb magic" %(self.base))
-
-        ## Read the interconnect info (Where the SDB is stored)
-        self.readrecord(self.base,self.interconnect)
-        #print self.interconnect
-        for i in range(1,self.interconnect.sdb_records):
-            #print ">>>>>>>>>>>>>>>>>> Device %s%d" %(self.buspath_prefix,i)
-            el=sdb_record()
-            self.readrecord(self.base + sizeof(el)*i, el)
-            #print el
+
+        ## Read the interconnect info (Where the SDB is stored) in one burst, then the whole table in another one
+        size=sizeof(sdb_record)
+        raw=self._readRaw(self.base,size)
+        magic, nrecords = struct.unpack_from(">IH",raw)
+        if magic != SDB_MAGIC: raise BaseException("Sdb base offset 0x%08x has not a valid sdb magic" %(self.base))
+        if nrecords>1: raw+=self._readRaw(self.base+size,(nrecords-1)*size)
+        if lazy: self._setTable(raw, maxlevel, lambda n, nextlevel: n._defer(nextlevel))
+        else: self._setTable(raw, maxlevel, lambda n, nextlevel: n.parse(nextlevel) or n)
+
+    def _defer(self,maxlevel,tables=None):
+        """ Let the node be parsed later by expand(), from the cached tables when they are still valid """
+        self._lazylevel=maxlevel
+        self._tables=tables
+        return self
+
+    def expand(self):
+        """
+        Parse the node if it has not been done yet (i.e. a bridge of a lazy parse())
+
+        When the node comes from a cache file, its table is read again in a single
+        burst and the cached one is used if it is the same, its children being
+        checked the same way when they are expanded. Otherwise the table is parsed
+        from the bus and the cache file is saved again.
+        """
+        if self.parsed: return self
+        tables=self._tables
+        if tables is not None and self.base in tables:
+            raw=tables[self.base]
+            if self._readRaw(self.base,len(raw))==raw:
+                self._setTable(raw, self._lazylevel, lambda n, nextlevel: n._defer(nextlevel,tables))
+                return self
+        self.parse(self._lazylevel,True)
+        if self.cache is not None:
+            root=self
+            while root.parent is not None: root=root.parent
+            try:
+                root.save_cache(*self.cache)
+            except (IOError, OSError), e:
+                if self.debug: print "Could not save the sdb cache: %s" %(e)
+        return self
+
+    def _setTable(self,raw,maxlevel,parsechild):
+        """
+        Fill the elements by decoding the records of the table
+
+        Args:
+            raw: big endian string with the interconnect record and the following ones
+            maxlevel: see parse()
+            parsechild: function parsechild(node, maxlevel) that fills the node of a bridge and
+            returns it (or None to not append it)
+        """
+        size=sizeof(sdb_record)
+        self.interconnect=SDBRecord(raw[:size],self.offset,"%s0" %(self.buspath_prefix))
+        self.raw=raw if self.keepraw else None
+        self.elements=[]
+        self.parsed=True
+        self._index=None
+        for i in range(1,len(raw)/size):
+            el=SDBRecord(raw[i*size:(i+1)*size],self.offset,"%s%d" %(self.buspath_prefix,i))
             n=None ##At the moment no node is appended
-            if el.is_type(sdb_record.TYPE_BRIDGE) and (maxlevel>0 or maxlevel==-1):
-                bridge=el.getTypedRecord()
-                n=SDBNode(self.bus,bridge.sdb_child,self)
+            if el.record_type==sdb_record.TYPE_BRIDGE and (maxlevel>0 or maxlevel==-1):
+                n=SDBNode(self.bus,el.child,self)
                 n.buspath_prefix=self.buspath_prefix+"%d." %(i)
-                n.offset=bridge.sdb_component.addr_first
+                n.offset=el.addr_first
                 if maxlevel>0: nextlevel=maxlevel-1
                 else: nextlevel=maxlevel
-                n.parse(nextlevel)
+                n=parsechild(n,nextlevel)
             self.elements.append((el,n))
 
+    def rawtable(self):
+        """
+        Return the SDB table of this crossbar (interconnect record and its records) as a big endian string
+
+        It is read again from the bus in a single burst when it has not been kept (see keepraw)
+        """
+        if self.raw is not None: return self.raw
+        return self._readRaw(self.base,sizeof(sdb_record)*self.interconnect.sdb_records)
+
+    @staticmethod
+    def cachefile(LUN):
+        """ Return the default path of the cache file of the device LUN """
+        return os.path.join(SDB_CACHE_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", str(LUN)) + ".sdb")
+
+    def save_cache(self,LUN,fpath=None):
+        """
+        Save the parsed tree to a cache file
+
+        The raw table of each crossbar is stored, keyed by its address. The cached
+        tables of the crossbars that have not been expanded yet are kept.
+
+        Args:
+            LUN: logical unit of the device (the cache is only valid for it)
+            fpath: path of the cache file (see cachefile() by default)
+        """
+        tables=dict(self._tables or {})
+        nodes=[self]
+        while nodes:
+            n=nodes.pop()
+            if not n.parsed: continue
+            tables[n.base]=n.rawtable()
+            nodes.extend(child for el, child in n.elements if child is not None)
+        fpath=fpath or self.cachefile(LUN)
+        if not os.path.isdir(os.path.dirname(fpath) or "."): os.makedirs(os.path.dirname(fpath))
+        data={"version": SDB_CACHE_VERSION, "LUN": LUN, "root": self.base, "tables": tables}
+        ## Write then rename so that a concurrent tool never reads a partial file
+        with open(fpath+".tmp", "wb") as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(fpath+".tmp", fpath)
+
+    @staticmethod
+    def load_cache(bus,LUN,fpath=None,debug=False):
+        """
+        Load a tree saved by save_cache() if the gateware has not changed
+
+        The root table (interconnect record, devices and synthesis records with the
+        commit id and date of the gateware) is read again in a single burst and
+        compared with the cached one. The tables of the other crossbars are checked
+        the same way by expand() when they are first accessed.
+
+        Args:
+            bus: instance of the gendriver class.
+            LUN: logical unit of the device
+            fpath: path of the cache file (see cachefile() by default)
+            debug: enable debug output
+
+        Return: The root SDBNode, or None when there is no valid cache
+        """
+        fpath=fpath or SDBNode.cachefile(LUN)
+        try:
+            with open(fpath, "rb") as f:
+                data=pickle.load(f)
+            if data["version"]!=SDB_CACHE_VERSION or data["LUN"]!=LUN: return None
+            root=data["root"]
+            tables=data["tables"]
+            raw=tables[root]
+        except Exception:
+            return None ## No cache, or corrupted
+
+        node=SDBNode(bus,root)
+        node.debug=debug
+        try:
+            current=node._readRaw(root, len(raw))
+        except BusException, e:
+            if node.debug: print e
+            return None
+        if current!=raw: return None
+        node.keepraw=True
+        node.cache=(LUN,fpath)
+        node._tables=tables
+        node._setTable(raw, -1, lambda n, nextlevel: n._defer(nextlevel,tables))
+        return node
+
+    @staticmethod
+    def parse_cached(bus,LUN,fpath=None,maxlevel=-1,lazy=False,debug=False):
+        """
+        Return the SDB tree of a device from its cache, or parse it and update the cache
+
+        Args:
+            bus: instance of the gendriver class.
+            LUN: logical unit of the device
+            fpath: path of the cache file (see cachefile() by default)
+            maxlevel: see parse()
+            lazy: see parse(), the crossbars are added to the cache when expand() reads them
+            debug: enable debug output
+        """
+        node=SDBNode.load_cache(bus,LUN,fpath,debug)
+        if node is not None:
+            if not lazy:
+                for p in node.walk(): pass ## Check all the cached crossbars now
+        else:
+            node=SDBNode(bus,None)
+            node.debug=debug
+            node.keepraw=True ## Saved just below without reading the tables again
+            node.cache=(LUN,fpath)
+            node.parse(maxlevel,lazy)
+            try:
+                node.save_cache(LUN,fpath)
+            except (IOError, OSError), e:
+                if node.debug: print "Could not save the sdb cache: %s" %(e)
+        return node
+
     def scan(self,mask=0x10000000):
+        """
+        This function find a valid sdb root
+
+        The address is first asked to the bus (i.e. Etherbone publishes it in
+        its config space) and checked with a single read of its magic. When
+        the bus does not know it, we fall back to probe() the FPGA memory map.
+        """
+        root=self.bus.getsdbroot() if hasattr(self.bus,"getsdbroot") else None
+        if root is not None:
+            try:
+                if self.bus.read(root)==SDB_MAGIC: return root
+            except BusWarning,e:
+                if self.debug: print e
+            if self.debug: print "sdb root given by the bus @0x%08x is not valid" %(root)
+        return self.probe(mask)
+
+    def probe(self,mask=0x10000000):
         """
         This function scan the FPGA memory map to find a valid sdb root
 
@@ -360,38 +665,106 @@ class SDBNode():
             except BusWarning,e:
                 if self.debug: print e
                 ##TODO: when bus error are well handle we can skip out of place
-        return self.scan(mask >> 4)
+        return self.probe(mask >> 4)
 
-    def findProduct(self,vendor_id,device_id, prods=None):
+    def walk(self):
+        """
+        Iterate over the components of this node and its children (depth first, in the table order)
+
+        Return: A generator of (SDBRecord,full_wb_address,buspath) tuples
+        """
+        self.expand()
+        for el, child in self.elements:
+            if el.is_component(): yield (el,el.address,el.buspath)
+            if child!=None:
+                for p in child.walk(): yield p
+
+    def _components(self):
+        """ Iterate over the components of this crossbar only (see walk()) """
+        for el, child in self.elements:
+            if el.is_component(): yield (el,el.address,el.buspath)
+
+    def buildIndex(self):
+        """
+        Build the lookup indexes of the components of this node and its children
+
+        It is called on the first lookup, and must be called again if the tree is changed.
+        The indexes are a dictionary by (vendor_id, device_id), a dictionary by
+        name and the sorted address ranges of the devices (bridges excluded).
+        """
+        byid={}
+        byname={}
+        spans=[]
+        for p in self.walk():
+            e, addr, buspath = p
+            byid.setdefault((e.vendor_id,e.device_id),[]).append(p)
+            byname.setdefault(e.name.strip(),[]).append(p)
+            if e.record_type!=sdb_record.TYPE_BRIDGE:
+                spans.append((addr,addr+e.addr_end-e.addr_first,p))
+        spans.sort(key=lambda span: span[0])
+        self._index=(byid,byname,[span[0] for span in spans],spans)
+        return self._index
+
+    def findProduct(self,vendor_id,device_id, prods=None, first=False):
         """
         Find SDB product according to vendor/device ID
 
-        Be aware that the address inside the sdb_record are relative and depend
-        on the direction of the above crossbar.
+        Be aware that the addr_first/addr_end of the records are relative and depend
+        on the direction of the above crossbar, the absolute one is given in the tuple.
 
         Args:
             vendor_id: The ID to describe the vendor (7501 <=> Seven Solutions)
             device_id: The ID to describe this device (WB Slave core)
+            prods: list where the products found are appended
+            first: stop at the first match, the crossbars are searched from the root
+            one (breadth first) so that a lazy tree only parses the ones on the way
 
         Return:
             A list of all the device found that match the vendor/device ID
-            We return a tupple with the (sdb structure,full_wb_address)
+            We return a tupple with the (SDBRecord,full_wb_address,buspath)
         """
         if prods is None: prods = []
-
-        for i in range(0,len(self.elements)):
-            if self.elements[i][0].is_component():
-                e=self.elements[i][0].getTypedRecord()
-                prod=e.sdb_component.product
-                if self.debug: print "%x:%x => %x:%x" %( vendor_id, device_id, prod.vendor_id, prod.device_id)
-                if long(prod.vendor_id)==vendor_id and int(prod.device_id)==device_id:
-                    buspath="%s%d" %(self.buspath_prefix,i+1)
-                    if self.debug: print "Found Device %s %s: %x\n%s" %(buspath,prod.name,self.offset+e.sdb_component.addr_first,e)
-                    prods.append((e,self.offset+e.sdb_component.addr_first,buspath))
-            if self.elements[i][1]!=None:
-                self.elements[i][1].findProduct(vendor_id,device_id,prods)
+        if first and self._index is None:
+            nodes=deque([self])
+            while nodes:
+                n=nodes.popleft().expand()
+                for p in n._components():
+                    if p[0].vendor_id==vendor_id and p[0].device_id==device_id:
+                        prods.append(p)
+                        return prods
+                nodes.extend(child for el, child in n.elements if child!=None)
+            return prods
+        byid=(self._index or self.buildIndex())[0]
+        found=byid.get((vendor_id,device_id),())
+        ## With the index, the first match is the one of the upper crossbar
+        if first and found: found=[min(found, key=lambda p: p[2].count("."))]
+        prods.extend(found)
+        if self.debug:
+            for e, addr, buspath in found: print "Found Device %s %s: %x\n%s" %(buspath,e.name,addr,e)
         return prods
 
+    def findName(self,name):
+        """
+        Find SDB products by name
+
+        Return:
+            A list of (SDBRecord,full_wb_address,buspath) tuples
+        """
+        byname=(self._index or self.buildIndex())[1]
+        return list(byname.get(name.strip(),()))
+
+    def findAddress(self,address):
+        """
+        Find the device whose address range contains a WB address
+
+        Return:
+            The (SDBRecord,full_wb_address,buspath) tuple of the device, or None
+        """
+        starts, spans = (self._index or self.buildIndex())[2:]
+        i=bisect.bisect_right(starts,address)-1
+        if i>=0 and address<=spans[i][1]: return spans[i][2]
+        return None
+
     def ls(self,verbose=False):
         """
         List all the sdb peripheral
@@ -420,21 +793,15 @@ class SDBNode():
             print "%s+--- Device %s%d" %(prefix,self.buspath_prefix,i+1)
             self._print_indent(self.elements[i][0],nspaces, "|   ")
             if self.elements[i][1]!=None:
-                self.elements[i][1].ls_full()
+                self.elements[i][1].expand().ls_full()
 
     def ls_brief(self):
-        for i in range(0,len(self.elements)):
-            if self.elements[i][0].is_component():
-                e=self.elements[i][0].getTypedRecord()
-                buspath="%s%d" %(self.buspath_prefix,i+1)
-                self.ls_oneline(e,self.offset+e.sdb_component.addr_first, buspath)
-            if self.elements[i][1]!=None:
-                self.elements[i][1].ls_brief()
+        for e, addr, buspath in self.walk():
+            self.ls_oneline(e,addr,buspath)
 
     @staticmethod
     def ls_oneline(e,offset,buspath=""):
-        prod=e.sdb_component.product
-        print "%-14s %016x:%08x  %16x  %s" %(buspath,prod.vendor_id,prod.device_id,offset,prod.name)
+        print "%-14s %016x:%08x  %16x  %s" %(buspath,e.vendor_id,e.device_id,offset,e.name)
 
 
     def readrecord(self,address,record):
@@ -447,27 +814,41 @@ class SDBNode():
 
         Return: The record after being read
         """
-        pData=cast(addressof(record), POINTER(c_uint8))
-        self._readWords(address, pData,sizeof(record))
+        self._readWords(address, addressof(record), sizeof(record))
         return record
 
-    def _readWords(self,offset,pData,nbytes):
-        """ Read words on the bus and fill it using a pointer on a buffer data """
-        for i in range(0,nbytes):
-            #pData[i]=BitManip.swap32(self.bus.read(offset+i*4))
-            mod=i%4
-            if mod==0:
-                rd=self.bus.read(offset+i)
-                tmp=(rd & 0xFF000000) >> 24
-            elif mod==1:
-                tmp=(rd & 0x00FF0000) >> 16
-            elif mod==2:
-                tmp=(rd & 0x0000FF00) >> 8
-            else:
-                tmp=(rd & 0x000000FF)
-            pData[i]=tmp
-            #print "%d: 0x%x" %(i,pData[i])
-        return pData
+    def readtable(self,address,nrecords):
+        """
+        Read consecutive records from the bus in a single burst
+
+        Args:
+            address: address of the first 64-bytes record on the WB bus.
+            nrecords: number of records to read
+
+        Return: A ctypes array of nrecords sdb_record
+        """
+        table=(sdb_record*nrecords)()
+        if nrecords>0: self._readWords(address, addressof(table), sizeof(table))
+        return table
+
+    def _readRaw(self,offset,nbytes):
+        """ Read a block of words on the bus and return them as a big endian string """
+        buf=create_string_buffer(nbytes)
+        self._readWords(offset, addressof(buf), nbytes)
+        return buf.raw
+
+    def _readWords(self,offset,dest,nbytes):
+        """ Read a block of words on the bus and store them in big endian at the address dest """
+        bar=getattr(self.bus,"bar",0)
+        if hasattr(self.bus,"devblockread_into"):
+            words=array('I',[0])*(nbytes/4)
+            self.bus.devblockread_into(bar, offset, words)
+        else:
+            words=array('I',self.bus.devblockread(bar, offset, nbytes))
+        ## The bus gives the words in host order while the sdb structures are big endian
+        if sys.byteorder=="little": words.byteswap()
+        memmove(dest, words.buffer_info()[0], nbytes)
+        return dest
 
 
     def _print_indent(self,obj,nspace,sep=""):
@@ -31,6 +31,7 @@ The serial_windows class allows to connect with WR devices over serial port in W
 from core.p7sException import *
 from core.serial_str_cleaner import *
 from bridges.consolebridge import ConsoleBridge
+from core.gendrvr import BusPolicy
 from bridges.serial_bridge import *
 from core.ewberrno import *
 import subprocess
@@ -67,6 +68,7 @@ class SerialWindows(ConsoleBridge) :
         self.RDTIMEOUT = rdtimeout
         self._serial = None
         self.ntries = ntries
+        self.set_policy(None)
         self.verbose = verbose
         self.errno = Ewberrno()
 
@@ -130,11 +132,27 @@ class SerialWindows(ConsoleBridge) :
 
 
 
+    def set_policy(self, policy) :
+        '''
+        Set the BusPolicy that retries devread() and devwrite()
+
+        By default a failed access is retried ntries times without waiting.
+        The accesses raise Retry, so it must be in the retry_on of the policy.
+
+        Args:
+            policy (BusPolicy) : Policy applied to the accesses, None to restore the default one
+        '''
+        if policy is None :
+            policy = BusPolicy(retries=self.ntries, backoff=0, threshold=0, retry_on=(Retry,))
+        self.policy = policy
+
     #Not in use in serial driver
     def devread(self, bar, offset, width) :
         '''
         Method that interfaces with wb read
 
+        A failed access is retried according to self.policy (see set_policy()).
+
         Args:
             bar : BAR used by PCIe bus
             offset : address within bar
@@ -143,52 +161,18 @@ class SerialWindows(ConsoleBridge) :
         cmd = "wb read 0x%X\r" % (offset)
         if self.verbose :
             print("\t %s" % (cmd))
-        ntries = self.ntries
-        read_ok = True
+        return self.policy.call(self._devread, cmd)
 
+    def _devread(self, cmd) :
+        '''
+        Single attempt of devread(), raise Retry when it fails
+        '''
         try :
-            while (True) :
-                self._serial.flushInput()
-                self._serial.flushOutput()
-                bwr = 0
-                # Is necessary to write char by char because is needed to make a
-                # timeout between each write
-                for c in cmd :
-                    bwr += self._serial.write(c)
-                    time.sleep(self.INTERCHARTIMEOUT) # Intern interCharTimeout isn't working, so put a manual timeout
-                self._serial.flush()
-
-                if bwr != len(cmd):
-                    if ntries <= 0 :
-                        raise Retry("Write of command string '%s' failed. \
-                        Bytes writed : %d of %d." % (cmd, bwr,len(cmd)))
-                    else : read_ok = False
-
-                time.sleep(self.WRTIMEOUT)
-
-                # First line readed is the previous command
-                rd = self._serial.readline()
-
-                cleaner = str_Cleaner() # Class to help cleaning control characters from str
-                clean = cleaner.cleanStr(rd)
-
-                # Remember: '\r' is inserted to cmd
-                if cmd[:-1] != clean :
-                    if ntries <= 0:
-                        raise Retry("Write of command %s failed : '%s'" \
-                        % (cmd, clean))
-                    else : read_ok = False
-
-                rd = self._serial.readline()
-
-                if ntries <= 0 or read_ok: break;
-                ntries -= 1
-                read_ok = True
-
-            return int(rd[:-1],0)
+            self._sendline(cmd)
+            return int(self._serial.readline()[:-1],0)
 
         except serial.SerialTimeoutException as e :
-            raise Retry("Write timeout (%d sec) exceeded : '%s'" % (self.WRTIMEOUT,e))
+            raise Retry(Ewberrno.EIO, "Write timeout (%d sec) exceeded : '%s'" % (self.WRTIMEOUT,e))
 
 
     #Not in use in serial driver
@@ -200,6 +184,8 @@ class SerialWindows(ConsoleBridge) :
         than the value just writed. 'wb read' interprets this behaviour as an
         error when actually it's not.
 
+        A failed access is retried according to self.policy (see set_policy()).
+
         Args:
             bar : BAR used by PCIe bus
             offset : address within bar
@@ -210,50 +196,53 @@ class SerialWindows(ConsoleBridge) :
         cmd = "wb write 0x%X 0x%X\r" % (offset, datum)
         if self.verbose :
             print("\t %s" % (cmd))
-        ntries = self.ntries
-        read_ok = True
+        return self.policy.call(self._devwrite, cmd)
 
+    def _devwrite(self, cmd) :
+        '''
+        Single attempt of devwrite(), raise Retry when it fails
+        '''
         try :
-            while (True) :
-                self._serial.flushInput()
-                self._serial.flushOutput()
-                bwr = 0
-                # Is necessary to write char by char because is needed to make a
-                # timeout between each write
-                for c in cmd :
-                    bwr += self._serial.write(c)
-                    time.sleep(self.INTERCHARTIMEOUT) # Intern interCharTimeout isn't working, so put a manual timeout
-                self._serial.flush()
-                time.sleep(self.WRTIMEOUT)
-
-                if bwr != len(cmd):
-                    if ntries <= 0:
-                        raise Retry("Write of string %s failed. Bytes writed : %d of %d.\n"\
-                        % (cmd, bwr,len(cmd)))
-                    else : read_ok = False
-
-                # Read first line, which is the command we previously send, check it!!
-                cleaner = str_Cleaner() # Class to help cleaning control characters from str
-
-                rd = self._serial.readline()
-
-                clean = cleaner.cleanStr(rd)
-
-                # Remember: '\r' is inserted to cmd
-                if cmd[:-1] != clean:
-                    if ntries <= 0:
-                        raise Retry("Write of command %s failed : %s.\n"\
-                        % (cmd, clean))
-                    else : read_ok = False
-
-                if ntries <= 0 or read_ok: break
-                ntries -= 1
-                read_ok = True
-
-            return bwr
+            return self._sendline(cmd)
 
         except serial.SerialTimeoutException as e :
-            raise Retry("Write timout (%d sec) exceeded : %s\n" % (self.WRTIMEOUT,e))
+            raise Retry(Ewberrno.EIO, "Write timout (%d sec) exceeded : %s\n" % (self.WRTIMEOUT,e))
+
+    def _sendline(self, cmd) :
+        '''
+        Write a wb command and check its echo
+
+        Returns:
+            The number of bytes written
+
+        Raises:
+            Retry : When the command is not fully written or not echoed back
+        '''
+        self._serial.flushInput()
+        self._serial.flushOutput()
+        bwr = 0
+        # Is necessary to write char by char because is needed to make a
+        # timeout between each write
+        for c in cmd :
+            bwr += self._serial.write(c)
+            time.sleep(self.INTERCHARTIMEOUT) # Intern interCharTimeout isn't working, so put a manual timeout
+        self._serial.flush()
+
+        if bwr != len(cmd):
+            raise Retry(Ewberrno.EIO, "Write of command string '%s' failed. Bytes writed : %d of %d." % (cmd, bwr,len(cmd)))
+
+        time.sleep(self.WRTIMEOUT)
+
+        # First line readed is the previous command
+        rd = self._serial.readline()
+
+        cleaner = str_Cleaner() # Class to help cleaning control characters from str
+        clean = cleaner.cleanStr(rd)
+
+        # Remember: '\r' is inserted to cmd
+        if cmd[:-1] != clean :
+            raise Retry(Ewberrno.EIO, "Write of command %s failed : '%s'" % (cmd, clean))
+        return bwr
 
 
     def cmd_w(self, cmd, output=True) :
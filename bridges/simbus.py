@@ -0,0 +1,340 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+This file contains the SimBus class which is a child of the abstract class GenDrv (gendrvr.py)
+
+It simulates a Wishbone address space to run the tools without hardware:
+
+    bus=SimBus(access_latency=20e-6, cycle_latency=200e-6) ##Etherbone-like timing
+    bus.load_image(open("sdb.bin").read(), 0x30000, sdbroot=True)
+    bus.attach(0x20000, SimFifo([0x41, 0x42]))
+    bus.attach(0x20004, SimStatus(busymask=0x1, busytime=1e-3))
+    sdb=SDBNode(bus, None)
+    sdb.base=sdb.scan()
+    print "%d cycles, %.3f s" % (bus.cycles, bus.now)
+
+@file
+@date Created on Oct 16, 2026
+@copyright LGPL v2.1
+@see http://www.ohwr.org
+@see http://www.sevensols.com
+@ingroup bridges
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import time
+import struct
+import bisect
+from array import array
+from collections import deque
+
+# Import common modules
+from core.gendrvr import *
+
+
+class SimRegister(object):
+    '''
+    Python model of a register mapped in a SimBus
+
+    By default it behaves as a memory word, the onread(bus, offset) and
+    onwrite(bus, offset, datum) callbacks can be given to model its behaviour
+    (offset is relative to the address where the model is attached).
+    '''
+
+    def __init__(self, value=0, onread=None, onwrite=None):
+        self.value=value
+        self.onread=onread
+        self.onwrite=onwrite
+
+    def read(self, bus, offset):
+        if self.onread: return self.onread(bus, offset)
+        return self.value
+
+    def write(self, bus, offset, datum):
+        if self.onwrite: self.onwrite(bus, offset, datum)
+        else: self.value=datum
+
+
+class SimFifo(SimRegister):
+    '''
+    FIFO register: a read pops the oldest word (empty value when there is none)
+    and a write pushes a word that can be checked in the written list.
+    '''
+
+    def __init__(self, data=None, empty=0):
+        SimRegister.__init__(self)
+        self.data=deque(data or [])
+        self.written=[]
+        self.empty=empty
+
+    def push(self, datum):
+        ''' Feed a word that will be returned by a next read '''
+        self.data.append(datum)
+
+    def read(self, bus, offset):
+        if self.data: return self.data.popleft()
+        return self.empty
+
+    def write(self, bus, offset, datum):
+        self.written.append(datum)
+
+
+class SimStatus(SimRegister):
+    '''
+    Status register whose busy bits stay set during busytime seconds (of the
+    virtual clock of the bus) after each write, i.e. a flash that is programming.
+    '''
+
+    def __init__(self, value=0, busymask=0x1, busytime=0.0):
+        SimRegister.__init__(self, value)
+        self.busymask=busymask
+        self.busytime=busytime
+        self.until=0.0
+
+    def read(self, bus, offset):
+        if bus.now<self.until: return self.value | self.busymask
+        return self.value & ~self.busymask
+
+    def write(self, bus, offset, datum):
+        self.value=datum
+        self.until=bus.now+self.busytime
+
+
+class SimBus(GenDrvr):
+    '''
+    The SimBus class simulates a sparse Wishbone address space.
+
+    The words that are not handled by a register model are stored in a dictionary,
+    so any address can be used. Each cycle (single access, block transfer or
+    transaction) advances the virtual clock (now) by cycle_latency and each
+    access by access_latency, so the timing of a bridge can be mimicked
+    deterministically: i.e. Etherbone pays the cycle latency once per packet
+    while wb_UART pays a long access latency per word. When realtime is set
+    we also sleep for this time.
+
+    Attributes:
+        now : virtual time in seconds
+        cycles : number of bus cycles done
+        accesses : number of single word accesses done
+    '''
+
+    def __init__(self, LUN="", verbose=False, access_latency=0.0, cycle_latency=0.0, realtime=False, strict=False):
+        '''Constructor
+
+        Args:
+            LUN : Not used
+            verbose : print each access
+            access_latency : seconds added to the virtual clock by each access
+            cycle_latency : seconds added to the virtual clock by each cycle
+            realtime : sleep as long as the simulated latency
+            strict : raise BusWarning when an address that was never written or mapped is read
+        '''
+        self.LUN=LUN
+        self.libname="SimBus"
+        self.verbose=verbose
+        self.access_latency=access_latency
+        self.cycle_latency=cycle_latency
+        self.realtime=realtime
+        self.strict=strict
+        self.mem={}
+        self.sdbroot=None
+        self._starts=[]  ## Sorted first addresses of the models
+        self._models=[]  ## (first, end, model) in the same order
+        self.reset_stats()
+
+    def open(self, LUN):
+        ''' Nothing to open '''
+        self.LUN=LUN
+
+    def close(self):
+        ''' Nothing to close '''
+        pass
+
+    def reset_stats(self):
+        ''' Reset the virtual clock and the counters '''
+        self.now=0.0
+        self.cycles=0
+        self.accesses=0
+
+    def attach(self, address, model, size=4):
+        '''
+        Map a register model on the address window [address, address+size)
+
+        Args:
+            address : first address of the window
+            model : SimRegister (or any object with read(bus, offset)/write(bus, offset, datum))
+            size : size in bytes of the window
+        '''
+        i=bisect.bisect_left(self._starts, address)
+        self._starts.insert(i, address)
+        self._models.insert(i, (address, address+size, model))
+        return model
+
+    def detach(self, address):
+        ''' Remove the register model attached at address '''
+        i=bisect.bisect_left(self._starts, address)
+        if i<len(self._starts) and self._starts[i]==address:
+            del self._starts[i]
+            del self._models[i]
+
+    def load_image(self, data, address, sdbroot=False):
+        '''
+        Load a binary image (i.e. a SDB table) as big endian 32bits words
+
+        Args:
+            data : string (or buffer) with the image
+            address : address of the first word
+            sdbroot : the image starts with the SDB root, so getsdbroot() returns its address
+        '''
+        data=buffer(data)[:]
+        data+="\0"*(-len(data) % 4)
+        words=struct.unpack(">%dI" % (len(data)/4), data)
+        self.mem.update(zip(xrange(address, address+4*len(words), 4), words))
+        if sdbroot: self.sdbroot=address
+
+    def getsdbroot(self):
+        """return the address of the SDB root when an image has been loaded as root"""
+        return self.sdbroot
+
+    def _cycle(self, naccesses):
+        ''' Account a cycle of naccesses word accesses '''
+        latency=self.cycle_latency+naccesses*self.access_latency
+        self.cycles+=1
+        self.accesses+=naccesses
+        self.now+=latency
+        if self.realtime and latency>0: time.sleep(latency)
+
+    def _model(self, address):
+        i=bisect.bisect_right(self._starts, address)-1
+        if i>=0:
+            first, end, model = self._models[i]
+            if address<end: return first, model
+        return None, None
+
+    def _read(self, address):
+        ''' Read the 32bits word at address (aligned) '''
+        first, model = self._model(address) if self._starts else (None, None)
+        if model is not None: return model.read(self, address-first) & 0xFFFFFFFF
+        if self.strict and address not in self.mem: raise BusWarning("Bad read @0x%08x" % (address))
+        return self.mem.get(address, 0)
+
+    def _write(self, address, datum):
+        ''' Write the 32bits word at address (aligned) '''
+        first, model = self._model(address) if self._starts else (None, None)
+        if model is not None: model.write(self, address-first, datum & 0xFFFFFFFF)
+        else: self.mem[address]=datum & 0xFFFFFFFF
+
+    def _access(self, kind, address, width, datum=None, mask=None):
+        ''' Do an access of width bytes (byte lanes are big endian as on Wishbone) '''
+        if width==8:
+            hi=self._access(kind, address, 4, None if datum is None else datum >> 32, None if mask is None else mask >> 32)
+            lo=self._access(kind, address+4, 4, None if datum is None else datum, mask)
+            return (hi << 32) | lo
+        aligned=address & ~0x3
+        if kind==BusTransaction.OP_WRITE and width==4:
+            self._write(aligned, datum)
+            return 0
+        shift=8*(4-width-(address & 0x3))
+        wmask=((1 << 8*width)-1) << shift
+        rd=self._read(aligned)
+        old=(rd & wmask) >> shift
+        if kind==BusTransaction.OP_RMW: datum=(old & ~mask) | (datum & mask)
+        if kind!=BusTransaction.OP_READ: self._write(aligned, (rd & ~wmask) | ((datum << shift) & wmask))
+        return old
+
+    def devread(self, bar, offset, width):
+        '''Method that do a single read cycle
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            width : data size (1, 2, 4 or 8 bytes)
+        '''
+        self._cycle(1)
+        datum=self._access(BusTransaction.OP_READ, offset, width)
+        if self.verbose: print "R@x%08X > 0x%08x" %(offset, datum)
+        return datum
+
+    def devwrite(self, bar, offset, width, datum):
+        '''Method that do a single write cycle
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address within bar
+            width : data size (1, 2, 4 or 8 bytes)
+            datum : data value that need to be written
+        '''
+        if self.verbose: print "W@x%08X < 0x%08x" %(offset, datum)
+        self._cycle(1)
+        self._access(BusTransaction.OP_WRITE, offset, width, datum & ((1 << 8*width)-1))
+        return datum
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that read a data block in a single cycle
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address of the first word
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        nwords=self.bufferWords(buf)
+        self._cycle(nwords)
+        words=array('I',[self._read(offset+i*incr) for i in xrange(nwords)])
+        if self.verbose: print "R@x%08X > %d words" %(offset, nwords)
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''Method that write a data block in a single cycle
+
+        Args:
+            bar : BAR used by PCIe bus (Not used)
+            offset : address of the first word
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        if self.verbose: print "W@x%08X < %d words" %(offset, len(words))
+        self._cycle(len(words))
+        for i in xrange(len(words)):
+            self._write(offset+i*incr, words[i])
+        return 0
+
+    def commit_transaction(self, ops):
+        '''Method that execute the operations queued by a BusTransaction in a single cycle
+
+        Args:
+            ops : list of (kind, offset, width, datum, mask, future) tuples
+        '''
+        self._cycle(len(ops))
+        for kind, offset, width, datum, mask, fut in ops:
+            rd=self._access(kind, offset, width, datum, mask)
+            fut.set(datum if kind==BusTransaction.OP_WRITE else rd)
+
+    def info(self):
+        """get a string describing the interface the driver is bound to """
+        return "SimBus: %d words, %d models, %d cycles in %.6f s" % (len(self.mem), len(self._models), self.cycles, self.now)
+
+    @staticmethod
+    def scan(options=None):
+        '''
+        There is nothing to scan with a simulated bus
+        '''
+        return []
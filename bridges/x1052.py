@@ -32,15 +32,26 @@ This file contains the x1052 class which is a child of the abstract class GenDrv
 # Import system modules
 import subprocess
 import os
+from array import array
 # Import common modules
 from core.gendrvr import *
 
+## Prototypes of the libx1052_api functions: (restype, argtypes)
+X1052_PROTOTYPES = {
+    'X1052_LibInit'      : (c_int, []),
+    'X1052_DeviceOpen'   : (c_void_p, None),
+    'X1052_DeviceClose'  : (c_int, None),
+    'X1052_Wishbone_CSR' : (c_int, [c_void_p, c_uint, c_void_p, c_int]),
+    'X1052_GetInfo'      : (None, [c_char_p, c_char]),
+}
+
+
 class X1052(GenDrvr):
     '''
     The X1052 class has been created to interface WB access using the x1052 pcie driver.
 
-    Currently, the read/write block data functions are not implemented
-    but they might be implemented in the next future.
+    The library has no block access, so the read/write block data functions
+    loop on X1052_Wishbone_CSR() directly over the memory of the data block.
     '''
     info_flag='a'
 
@@ -53,7 +64,12 @@ class X1052(GenDrvr):
             show_dbg : show debug info
         '''
         self.show_dbg=show_dbg
-        self.load_lib("libx1052_api.so")
+        self.load_lib("libx1052_api.so", X1052_PROTOTYPES)
+
+        ##Scratch buffer of devread()/devwrite() allocated once for the handle
+        self._data=c_uint(0xBADC0FFE)
+        self._pdata=addressof(self._data)
+        self._wishbone_CSR=self.lib.X1052_Wishbone_CSR
 
         self.errno=self.lib.X1052_LibInit()
         if self.errno!=0:
@@ -70,7 +86,7 @@ class X1052(GenDrvr):
             raise NameError("hDev already opened")
 
         self.hdev = self.lib.X1052_DeviceOpen(LUN)
-        if self.hdev==0:
+        if not self.hdev:
             raise NameError("Could not open device")
 
     def close(self):
@@ -89,15 +105,11 @@ class X1052(GenDrvr):
             offset : offset address within bar
             width : width data size (1, 2, or 4 bytes)
         '''
-        address = offset
-        INTP = POINTER(c_uint)
-        data = c_uint(0xBADC0FFE)
-        pData = cast(addressof(data), INTP)
-        ret=self.lib.X1052_Wishbone_CSR(self.hdev,c_uint(address),pData,0)
-        if self.show_dbg: print "R@x%08X > 0x%08x" %(address, pData[0])
+        ret=self._wishbone_CSR(self.hdev,offset,self._pdata,0)
+        if self.show_dbg: print "R@x%08X > 0x%08x" %(offset, self._data.value)
         if ret !=0:
             raise NameError('Bad Wishbone Read')
-        return pData[0]
+        return self._data.value
 
 
     def devwrite(self, bar, offset, width, datum):
@@ -110,15 +122,54 @@ class X1052(GenDrvr):
             width : data size (1, 2, or 4 bytes)
             datum : data value that need to be written
         '''
-        address = offset
-        INTP = POINTER(c_uint)
-        data = c_uint(datum)
-        pData = cast(addressof(data), INTP)
-        if self.show_dbg: print "W@x%08X < 0x%08x" %( address, pData[0])
-        ret=self.lib.X1052_Wishbone_CSR(self.hdev,c_uint(address),pData,1)
+        self._data.value=datum
+        if self.show_dbg: print "W@x%08X < 0x%08x" %(offset, self._data.value)
+        ret=self._wishbone_CSR(self.hdev,offset,self._pdata,1)
         if ret !=0:
-            raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(address,datum, ret))
-        return pData[0]
+            raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(offset,datum, ret))
+        return self._data.value
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''Method that read a data block calling the library in a tight loop
+
+        The library writes each word directly in the memory of an array('I').
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+        '''
+        nwords=self.bufferWords(buf)
+        words=array('I',[0])*nwords
+        if nwords==0: return buf
+        rw, hdev, ptr = self._wishbone_CSR, self.hdev, words.buffer_info()[0]
+        for i in xrange(nwords):
+            if rw(hdev,offset+i*incr,ptr+4*i,0) !=0:
+                raise NameError('Bad Wishbone Read @0x%08x' %(offset+i*incr))
+        if self.show_dbg: print "R@x%08X > %d words" %(offset, nwords)
+        return self.copyWords(buf, words)
+
+    def devblockwrite(self, bar, offset, ldata, incr=0x4):
+        '''Method that write a data block calling the library in a tight loop
+
+        The library reads each word directly from the memory of an array('I').
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
+        '''
+        words=self.toWords(ldata)
+        if self.show_dbg: print "W@x%08X < %d words" %(offset, len(words))
+        if len(words)==0: return 0
+        rw, hdev, ptr = self._wishbone_CSR, self.hdev, words.buffer_info()[0]
+        for i in xrange(len(words)):
+            ret=rw(hdev,offset+i*incr,ptr+4*i,1)
+            if ret !=0:
+                raise NameError('Bad Wishbone Write @0x%08x > 0x%08x (ret=%d)' %(offset+i*incr,words[i], ret))
+        return 0
 
     def info(self):
         """get a string describing the interface the driver is bound to """
@@ -32,9 +32,47 @@ File with generic abstract class for bus access
 # Import system modules
 import abc
 import os
+import time
+from array import array
 from ctypes import *
 
 
+## Native libraries already loaded in this process: {libname: CDLL}
+_native_libs={}
+
+def load_native_lib(libname, prototypes=None):
+    '''
+    Load a shared library only once per process and declare the prototypes of its functions
+
+    Declaring restype/argtypes let ctypes convert the python integers itself, so
+    the drivers do not need to wrap each argument in a new ctypes object.
+
+    Args:
+        libname : name or path of the shared library
+        prototypes : dictionary {function name: (restype, argtypes)}
+
+    Returns:
+        The CDLL object shared by all the drivers using this library
+    '''
+    lib=_native_libs.get(libname)
+    if lib is None:
+        ## First set library path
+        libpath = os.getenv('LD_LIBRARY_PATH')
+        here = os.getcwd()
+        if not libpath: os.environ['LD_LIBRARY_PATH'] = here+":/usr/lib:/usr/local/lib"
+        elif here not in libpath.split(':'): os.environ['LD_LIBRARY_PATH'] = here + ':' + libpath
+
+        ##Then load the library
+        lib = cdll.LoadLibrary(libname)
+        _native_libs[libname]=lib
+    if prototypes:
+        for fname, (restype, argtypes) in prototypes.items():
+            func=getattr(lib,fname)
+            func.restype=restype
+            if argtypes is not None: func.argtypes=argtypes
+    return lib
+
+
 class BusException(Exception):
     pass
 
@@ -44,6 +82,230 @@ class BusCritical(BusException):
 class BusWarning(BusException):
     pass
 
+class BusCircuitOpen(BusCritical):
+    ''' Raised without accessing the device while the circuit breaker of its BusPolicy is open '''
+    pass
+
+
+class BusPolicy(object):
+    '''
+    Timeout, retries and circuit breaker applied to the accesses of a driver.
+
+    It is set with GenDrvr.set_policy():
+
+        bus.set_policy(BusPolicy(timeout=0.2, retries=2, threshold=5, recovery=30))
+
+    A failed access (BusWarning by default) is tried again up to retries times,
+    waiting backoff seconds before the first retry and multiplying this delay by
+    backoff_factor for the next ones. After threshold consecutive failures the
+    circuit opens: the next accesses raise BusCircuitOpen at once, until recovery
+    seconds have passed and a single access is allowed to probe the device. If it
+    succeeds the circuit closes, otherwise it stays open for recovery seconds more.
+
+    Be aware that retrying a write to a FIFO may write the data twice. To keep
+    the state of the breaker when a device is opened again, use the same policy
+    object for each instance of its driver.
+    '''
+
+    def __init__(self, timeout=None, retries=0, backoff=0.01, backoff_factor=2.0, max_backoff=1.0,
+                 threshold=5, recovery=10.0, retry_on=(BusWarning,)):
+        '''
+        Constructor
+
+        Args:
+            timeout : seconds to wait for the device (None to keep the default of the driver)
+            retries : number of times a failed access is tried again
+            backoff : seconds to wait before the first retry
+            backoff_factor : multiply the waiting time at each retry
+            max_backoff : maximum waiting time between two retries
+            threshold : consecutive failures that open the circuit (0 to disable the breaker)
+            recovery : seconds before probing again a device whose circuit is open
+            retry_on : exceptions that are retried (the failures are counted for them and for BusException)
+        '''
+        self.timeout=timeout
+        self.retries=retries
+        self.backoff=backoff
+        self.backoff_factor=backoff_factor
+        self.max_backoff=max_backoff
+        self.threshold=threshold
+        self.recovery=recovery
+        self.retry_on=retry_on
+        self.reset()
+
+    def reset(self):
+        ''' Close the circuit and forget the failures '''
+        self.failures=0    ## Consecutive failures
+        self.opened=None   ## Time when the circuit has been opened (None when closed)
+
+    def isopen(self):
+        ''' Return True when the accesses are refused '''
+        return self.opened is not None and time.time()-self.opened<self.recovery
+
+    def call(self, func, *args, **kwargs):
+        '''
+        Call func(*args, **kwargs) applying the policy
+
+        Raises:
+            BusCircuitOpen: while the circuit is open
+            The exception of the last attempt otherwise
+        '''
+        if self.opened is not None:
+            if self.isopen(): raise BusCircuitOpen("Circuit open after %d consecutive failures" % (self.failures))
+            ## Probe the device with a single attempt
+            try:
+                ret=func(*args, **kwargs)
+            except (BusException,)+tuple(self.retry_on):
+                self.opened=time.time()
+                raise
+            self.reset()
+            return ret
+
+        delay=self.backoff
+        attempt=0
+        catch=(BusException,)+tuple(self.retry_on)
+        while True:
+            try:
+                ret=func(*args, **kwargs)
+            except catch, e:
+                self.failures+=1
+                if self.threshold and self.failures>=self.threshold:
+                    self.opened=time.time()
+                    raise
+                if attempt>=self.retries or not isinstance(e, self.retry_on): raise
+                attempt+=1
+                time.sleep(delay)
+                delay=min(delay*self.backoff_factor, self.max_backoff)
+                continue
+            self.failures=0
+            return ret
+
+    def wrap(self, func):
+        ''' Return a function that calls func applying the policy '''
+        call=self.call
+        def wrapped(*args, **kwargs):
+            return call(func, *args, **kwargs)
+        return wrapped
+
+
+class BusFuture(object):
+    '''
+    Placeholder for the result of an operation that is not yet executed.
+
+    It is returned by the operations queued in a BusTransaction (resolved when
+    the ``with bus.transaction()`` block exits) and by asynchronous driver calls.
+    '''
+
+    def __init__(self, waiter=None):
+        '''
+        Constructor
+
+        Args:
+            waiter : optional callable, waiter(future), used to drive the completion
+            of the operation when the value is requested before it is resolved.
+        '''
+        self.done=False
+        self.error=None
+        self._value=None
+        self._waiter=waiter
+
+    def set(self, value):
+        ''' Resolve the placeholder (called by the driver on completion) '''
+        self._value=value
+        self.done=True
+
+    def fail(self, error):
+        ''' Resolve the placeholder with an exception that is raised when reading the value '''
+        self.error=error
+        self.done=True
+
+    @property
+    def value(self):
+        ''' The resolved value, raise BusWarning if the operation is still pending '''
+        if not self.done and self._waiter: self._waiter(self)
+        if not self.done: raise BusWarning('Operation still pending')
+        if self.error is not None: raise self.error
+        return self._value
+
+    def __int__(self):
+        return int(self.value)
+
+    def __long__(self):
+        return long(self.value)
+
+    def __repr__(self):
+        if not self.done: return "<BusFuture pending>"
+        if self.error is not None: return "<BusFuture error: %s>" %(self.error)
+        if isinstance(self._value,(int,long)): return "<BusFuture 0x%x>" %(self._value)
+        return "<BusFuture %r>" %(self._value,)
+
+
+class BusTransaction(object):
+    '''
+    Queue of bus operations that are executed together when the block exits.
+
+    It is obtained with GenDrvr.transaction() and used as a context manager:
+
+        with bus.transaction() as t:
+            t.write(0x100, 0x1)
+            status=t.read(0x104)
+            t.rmw(0x108, 0xFF00, 0x1200)
+        print "0x%x" %(status.value)
+
+    Each queued operation returns a BusFuture that is resolved on commit. The
+    driver decides how to execute the queue (see GenDrvr.commit_transaction()),
+    i.e. EthBone packs it into as few Etherbone cycles as possible.
+    '''
+    OP_READ  = 0
+    OP_WRITE = 1
+    OP_RMW   = 2
+
+    def __init__(self, bus):
+        '''
+        Constructor
+
+        Args:
+            bus : instance of the GenDrvr that will execute the operations
+        '''
+        self.bus=bus
+        self.ops=[]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ## Only commit when the block has not raised
+        if exc_type is None: self.commit()
+        else: self.ops=[]
+        return False
+
+    def read(self, offset, width=4):
+        ''' Queue a read and return its BusFuture (resolved with the read value) '''
+        return self._append(self.OP_READ, offset, width, None, None)
+
+    def write(self, offset, datum, width=4):
+        ''' Queue a write and return its BusFuture (resolved with the written value) '''
+        return self._append(self.OP_WRITE, offset, width, datum, None)
+
+    def rmw(self, offset, mask, datum, width=4):
+        '''
+        Queue a read-modify-write: reg = (reg & ~mask) | (datum & mask)
+
+        Returns:
+            A BusFuture resolved with the value read before the modification
+        '''
+        return self._append(self.OP_RMW, offset, width, datum, mask)
+
+    def commit(self):
+        ''' Execute all the queued operations on the bus '''
+        ops=self.ops
+        self.ops=[]
+        if ops: self.bus.commit_transaction(ops)
+
+    def _append(self, kind, offset, width, datum, mask):
+        fut=BusFuture()
+        self.ops.append((kind, offset, width, datum, mask, fut))
+        return fut
+
 
 class GenDrvr(object):
     '''
@@ -61,18 +323,19 @@ class GenDrvr(object):
     hdev=-1
     bar=0
     ndev=1 ##Actual number detected device on the bus
+    policy=None ##BusPolicy applied to the accesses (see set_policy())
 
 
-    def load_lib(self,libname=""):
-        ## First set library path
-        libpath = os.getenv('LD_LIBRARY_PATH')
-        here = os.getcwd()
-        libpath = here+":/usr/lib:/usr/local/lib" if not libpath else here + ':' + libpath
-        os.environ['LD_LIBRARY_PATH'] = libpath
+    def load_lib(self,libname="",prototypes=None):
+        '''
+        Load the native library of the driver (see load_native_lib())
 
-        ##Then load the library
+        Args:
+            libname : name or path of the shared library
+            prototypes : dictionary {function name: (restype, argtypes)}
+        '''
         self.libname=libname
-        self.lib = cdll.LoadLibrary(self.libname)
+        self.lib = load_native_lib(libname, prototypes)
 
 
 ###################### Abstract method that MUST be redefine                                           --
@@ -128,26 +391,123 @@ class GenDrvr(object):
 
 ###################### Not implemented method that could be redefine
 
-    def devblockread(self, bar, offset, bsize, incr=0x4):
+    def devblockread(self, bar, offset, bsize, incr=0x4, as_buffer=False):
         '''
-        Abstract method that do a read on the devices
+        Method that read a data block (see devblockread_into())
+
+        Args:
             bar : BAR used by PCIe bus
             offset : address within bar
-            bsize : size in bytes
+            bsize : size in bytes (Should be multiply by 4)
+            incr : address increment between words (0x0 to read from a FIFO)
+            as_buffer : return an array('I') instead of a list
+
+        Returns:
+            A list of 32bits words (or an array('I') when as_buffer is set)
         '''
-        raise NameError('Undef function')
-        return 0;
+        buf=array('I',[0])*(bsize/4)
+        self.devblockread_into(bar, offset, buf, incr)
+        if as_buffer: return buf
+        return buf.tolist()
+
+    def devblockread_into(self, bar, offset, buf, incr=0x4):
+        '''
+        Method that read a data block filling a caller-supplied buffer in place
+
+        By default the words are read one by one with devread(), drivers that can
+        do bursts should redefine it.
+
+        Args:
+            bar : BAR used by PCIe bus
+            offset : address within bar
+            buf : writable buffer (bytearray, array('I'), memoryview...)
+            incr : address increment between words (0x0 to read from a FIFO)
+
+        Returns:
+            The same buffer filled with the 32bits words (in host byte order)
+        '''
+        nwords=self.bufferWords(buf)
+        ## Bypass the BusPolicy wrapper of devread(), the policy is already applied to the whole block
+        devread=type(self).devread
+        words=array('I',[devread(self, bar, offset+i*incr, 4) & 0xFFFFFFFF for i in xrange(nwords)])
+        return self.copyWords(buf, words)
 
     def devblockwrite(self, bar, offset, ldata, incr=0x4):
         '''
-        Abstract method that do a read on the devices
+        Method that write a data block
+
+        By default the words are written one by one with devwrite(), drivers that can
+        do bursts should redefine it.
+
+        Args:
             bar : BAR used by PCIe bus
             offset : address within bar
-            ldata : list of data to write
+            ldata : list of 32bits words or any buffer object (see toWords())
+            incr : address increment between words (0x0 to write into a FIFO)
         '''
-        raise NameError('Undef function')
-        return 0;
+        devwrite=type(self).devwrite
+        for i, datum in enumerate(self.toWords(ldata)):
+            devwrite(self, bar, offset+i*incr, 4, datum)
+        return 0
+
+
+    def set_policy(self, policy):
+        '''
+        Apply a BusPolicy (timeout, retries, circuit breaker) to the accesses of the driver
+
+        The access methods are replaced by wrappers on the instance, so a driver
+        without policy does not pay anything. The block and transaction methods
+        must then call the unwrapped primitives (i.e. type(self).devread(self, ...))
+        so that the policy is applied only once to each call.
+
+        Args:
+            policy : BusPolicy, or None to remove the current one
+        '''
+        self.policy=policy
+        for name in ("devread", "devwrite", "devblockread_into", "devblockwrite", "commit_transaction"):
+            self.__dict__.pop(name, None)
+            if policy is not None: setattr(self, name, policy.wrap(getattr(self, name)))
+        if policy is not None and policy.timeout is not None: self.set_timeout(policy.timeout)
+
+    def set_timeout(self, timeout):
+        '''
+        Set the time to wait for the device, drivers that have a timeout should redefine it
+
+        Args:
+            timeout : seconds
+        '''
+        pass
+
+    def transaction(self):
+        '''
+        Create a new BusTransaction to queue several operations in one go
+
+        Returns:
+            A BusTransaction to be used in a ``with`` statement
+        '''
+        return BusTransaction(self)
+
+    def commit_transaction(self, ops):
+        '''
+        Execute the operations queued by a BusTransaction
 
+        By default the operations are executed sequentially with devread()/devwrite(),
+        drivers that can group accesses into a single bus cycle should redefine it.
+
+        Args:
+            ops : list of (kind, offset, width, datum, mask, future) tuples
+        '''
+        devread=type(self).devread
+        devwrite=type(self).devwrite
+        for kind, offset, width, datum, mask, fut in ops:
+            if kind==BusTransaction.OP_WRITE:
+                devwrite(self, self.bar, offset, width, datum)
+                fut.set(datum)
+            else:
+                rd=devread(self, self.bar, offset, width)
+                if kind==BusTransaction.OP_RMW:
+                    devwrite(self, self.bar, offset, width, (rd & ~mask) | (datum & mask))
+                fut.set(rd)
 
     def irqena(self):
         """enable the interrupt line"""
@@ -159,6 +519,10 @@ class GenDrvr(object):
         raise NameError('Undef function')
         return 0;
 
+    def getsdbroot(self):
+        """return the address of the SDB root when the bus knows it without scanning (None otherwise)"""
+        return None
+
     def info(self):
         """get a string describing the interface the driver is bound to """
         return "%s" %(self.libname)
@@ -173,6 +537,10 @@ class GenDrvr(object):
         ''' Perform a simple 32b read '''
         return self.devread(self.bar, offset, 4)
 
+    def read64(self, offset):
+        ''' Perform a simple 64b read (only on buses that support it) '''
+        return self.devread(self.bar, offset, 8)
+
     def read16(self, offset):
         ''' Perform a simple 16b read '''
         return self.devread(self.bar, offset, 2)
@@ -189,6 +557,10 @@ class GenDrvr(object):
         ''' Perform a simple 32b write '''
         self.devwrite(self.bar, offset, 4, datum)
 
+    def write64(self, offset, datum):
+        ''' Perform a simple 64b write (only on buses that support it) '''
+        self.devwrite(self.bar, offset, 8, datum)
+
     def write16(self, offset, datum):
         ''' Perform a simple 16b write '''
         self.devwrite(self.bar, offset, 2, datum)
@@ -197,6 +569,57 @@ class GenDrvr(object):
         ''' Perform a simple 8b write '''
         self.devwrite(self.bar, offset, 1, datum)
 
+    @staticmethod
+    def toWords(ldata):
+        '''
+        Convert a block of data to an array('I') of 32bits words
+
+        Args:
+            ldata: A list of 32bits words or any buffer object (array, bytes, numpy array...)
+
+        Returns:
+            An array('I'), which is ldata itself when it already is an unsigned 32bits array.
+            The other arrays are converted by value (the signed values are masked to 32bits).
+        '''
+        if isinstance(ldata, array):
+            if ldata.typecode in ('I','L') and ldata.itemsize==4: return ldata
+            ldata=ldata.tolist()
+        if isinstance(ldata, (list, tuple)):
+            try:
+                return array('I', ldata)
+            except OverflowError:
+                return array('I', [d & 0xFFFFFFFF for d in ldata])
+        words=array('I')
+        if isinstance(ldata, memoryview): words.fromstring(ldata.tobytes())
+        else: words.fromstring(buffer(ldata)[:])
+        return words
+
+    @staticmethod
+    def bufferWords(buf):
+        ''' Return the number of 32bits words that fit in a buffer object '''
+        nbytes=getattr(buf,'nbytes',None) or len(buf)*getattr(buf,'itemsize',1)
+        return nbytes/4
+
+    @staticmethod
+    def copyWords(buf, words):
+        '''
+        Copy an array('I') into a writable buffer object
+
+        Args:
+            buf: writable buffer (bytearray, array('I'), memoryview...)
+            words: array('I') with at most as many words as buf can hold
+
+        Returns:
+            The buffer buf
+        '''
+        nwords=len(words)
+        if nwords==0: return buf
+        try:
+            memmove((c_uint32*nwords).from_buffer(buf), words.buffer_info()[0], nwords*4)
+        except TypeError:
+            buf[:nwords*4]=words.tostring()
+        return buf
+
     @staticmethod
     def getPtrData(data):
        INTP = POINTER(c_uint)
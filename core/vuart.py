@@ -33,7 +33,7 @@ import select
 import datetime as dt
 # User defined modules
 from bridges.VUART_bridge import VUART_bridge
-from gendrvr import BusCritical, BusWarning
+from gendrvr import BusCritical, BusWarning, BusPolicy
 from p7sException import p7sException, Retry, Error
 from ewberrno import Ewberrno
 
@@ -104,17 +104,7 @@ class VUART_shell():
             ConsoleError : When the specified device fails opening.
         '''
         self.vuart = VUART_bridge("eth", ip, verbose)
-        attemps = 3
-        cur = 0
-        while True:
-            try:
-                self.vuart.open()
-                break
-            except BusWarning as e:
-                if cur >= attemps:
-                    raise e
-                print("The desired device cannot be connected, retrying...")
-                cur += 1
+        self.__retry__(self.vuart.open, 3, "The desired device cannot be connected, retrying...")
 
         self.vuart.flushInput()
         self.ver_date = None
@@ -156,18 +146,29 @@ class VUART_shell():
         Raises:
 
         '''
-        attempts = 0
+        try:
+            return self.__retry__(lambda: self.vuart.sendCommand(cmd), retry, "The connection seems to be lost. Retrying...")
+        except BusWarning as e:
+            raise Error(Ewberrno.EIO , "Too many errors executing the command %s" % cmd)
 
-        while True:
-            try:
-                ret = self.vuart.sendCommand(cmd)
-                return ret
-            except BusWarning as e:
-                if attempts >= retry:
-                    raise Error(Ewberrno.EIO , "Too many errors executing the command %s" % cmd)
-                else:
-                    attempts += 1
-                if attempts == 1: print ("The connection seems to be lost. Retrying...")
+    def __retry__(self, func, retry, msg):
+        '''
+        Call func() retrying it with a BusPolicy when it raises BusWarning
+
+        Args:
+            func (callable) : The call to the driver
+            retry (int) : How many times repeat a failed call
+            msg (str) : Message printed before the first retry
+
+        Returns:
+            The value returned by func
+        '''
+        attempts = [0]
+        def attempt():
+            if attempts[0] == 1: print(msg)
+            attempts[0] += 1
+            return func()
+        return BusPolicy(retries=retry, backoff=0, threshold=0).call(attempt)
 
     def __get_firm_date__(self, raw_ver):
         '''
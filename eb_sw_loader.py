@@ -20,6 +20,7 @@ import subprocess
 import argparse as arg
 
 from bridges.ethbone import *
+from bridges.ethbone_udp import EthBoneUDP
 #from pts_core.bridges.wb_uart import *
 from periph.ipc_spiflash import *
 from bridges.sdb import SDBNode
@@ -32,7 +33,7 @@ def main():
 
     parser = arg.ArgumentParser(description='WR-LEN Software Loader v1.0')
 
-    parser.add_argument('--bus','-b',help='communication bus', choices=['EB','UART'],\
+    parser.add_argument('--bus','-b',help='communication bus', choices=['EB','EBPY','UART'],\
     required=True)
     parser.add_argument('--lun','-l',help='Logical unit Number (SerialPort / IP)',\
     type=str, required=True)
@@ -44,6 +45,8 @@ def main():
     try:
         if args.bus.lower() == "eb":
             bus = EthBone("udp/"+args.lun,args.debug)
+        elif args.bus.lower() == "ebpy": ##Etherbone without libetherbone
+            bus = EthBoneUDP("udp/"+args.lun,args.debug)
         #else: ##options.bus_type == "UART"
            # bus = wb_UART()
             #bus.open(options.lun)
@@ -136,8 +136,9 @@ class SpiFlash:
     def resetFifo(self):
         '''Method for resetting the FIFO
         '''
-        self.bus.devwrite( 0, self.baseFlash+self.FSR_offset, 4, 0x00000000)
-        self.bus.devwrite( 0, self.baseFlash+self.FSR_offset, 4, 0x80000000)
+        with self.bus.transaction() as t:
+            t.write(self.baseFlash+self.FSR_offset, 0x00000000)
+            t.write(self.baseFlash+self.FSR_offset, 0x80000000)
 
     def cidoMode(self):
         '''Method for performing the Check ID Only operation
@@ -427,7 +428,8 @@ class SpiFlash:
             RAM_file: The .ram file with the LM32 firmware
             RAM_offset: The offset of WB4-BlockRAM in the WB bus
             SYSCON_offset: The offset of WR-Periph-Syscon in the WB bus
-            pktwords: Number of words to send by packet (< MAXBYTE_PAYLOADPKT/4)
+            pktwords: Number of words to send by packet on the buses that do not split the blocks
+            by themselves (Etherbone splits the image according to its MTU)
 
         Returns:
             0 if everything was OK, 1 otherwise
@@ -447,23 +449,16 @@ class SpiFlash:
         for i in range(0, len(data_lines)):
             tmp_line=int(data_lines[i],16)
             int_lines.append(tmp_line)
-        #from lines to 128 word packets
-        data_packets=[]
-        self.bus.wordsToPackets(int_lines, data_packets,pktwords)
         #disable the processor
         self.bus.devwrite(0, SYSCON_offset, 4, 0x1deadbee)
         #Write the new sw at the ram memory
-        for i in range(0,len(data_packets)):
-            self.bus.devblockwrite(0, RAM_offset+(4*i*pktwords), data_packets[i], 0x4)
-            #check written RAM
-            #FIXME: do this with devblockread
-            rbdata_list=[]
-            #for j in range(0,len(data_packets[i])):
-                #rbdata=self.bus.devread(0, RAM_offset+4*i*pktwords+4*j, 4)
-                #rbdata_list.append(rbdata)
-            #fwLoad_er=self.cmpList(rbdata_list,data_packets[i])
-            #if fwLoad_er:
-                #return 1
+        if hasattr(self.bus, "getChunkWords"):
+            #in one call, the bus chunks it to fit its packets
+            self.bus.devblockwrite(0, RAM_offset, int_lines, 0x4)
+        else:
+            #in packets of pktwords words
+            for i in range(0,len(int_lines),pktwords):
+                self.bus.devblockwrite(0, RAM_offset+4*i, int_lines[i:i+pktwords], 0x4)
         #enable the processor
         self.bus.devwrite(0, SYSCON_offset, 4, 0x0deadbee)
         return 0
@@ -40,6 +40,7 @@ def main():
     parser.add_argument('--bus','-b',help='communication bus', choices=['EB','UART'],required=True)
     parser.add_argument('--lun','-l',help='Logical unit Number (Bus Index / SerialPort / IP)',type=str, required=True)
     parser.add_argument('--find','-f',help='Find a specific device vendor_id:dev_id',default=None)
+    parser.add_argument('--nocache','-n',help="Parse the sdb again instead of using the cached one",action='store_true')
 
 
 
@@ -61,9 +62,12 @@ def main():
 
     ##TODO: add sdb to detect where we should load on any bus.
 
-    sdbroot=SDBNode(bus,args.address)
-    sdbroot.debug=args.debug
-    sdbroot.parse()
+    if args.address==None and not args.nocache:
+        sdbroot=SDBNode.parse_cached(bus,args.lun,debug=args.debug)
+    else:
+        sdbroot=SDBNode(bus,args.address)
+        sdbroot.debug=args.debug
+        sdbroot.parse()
 
     if args.find==None:
         sdbroot.ls(args.verbose)
@@ -65,18 +65,16 @@ def main():
         print "Fatal: %s" % (e)
         return 1
 
-    sdb = SDBNode(bus, None)
-    sdb.base = sdb.scan()
-    sdb.parse()
-    blockrams = sdb.findProduct(VENDOR_ID_CERN, WR_MININIC_RAM)
-    spi_base = sdb.findProduct(VENDOR_ID_7SOLS, WR_SPI_FLASH)[0][1]
-
-    # Look for the Block RAM of the MINIC 1
-    ram_base = 0
-    for ram in blockrams:
-        if ram[1] > ram_base: ram_base = ram[1]
+    sdb = SDBNode.parse_cached(bus, options.lun, lazy=True)
+    spi_base = sdb.findProduct(VENDOR_ID_7SOLS, WR_SPI_FLASH, first=True)[0][1]
 
     if options.mode=="test":
+        # Look for the Block RAM of the MINIC 1
+        blockrams = sdb.findProduct(VENDOR_ID_CERN, WR_MININIC_RAM)
+        ram_base = 0
+        for ram in blockrams:
+            if ram[1] > ram_base: ram_base = ram[1]
+
         ##Check Endpoint Register
         bus.test_rw()
 
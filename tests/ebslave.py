@@ -0,0 +1,67 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Minimal Etherbone slave on a local UDP socket used by the tests of the Etherbone clients
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import socket
+import struct
+import threading
+
+from bridges.ethbone import EB_MAGIC, EB_FLAG_PF, EB_FLAG_PR
+from bridges.ethbone_udp import EB_RECORD_WFF, EB_RECORD_RCA
+
+
+class EBSlave(object):
+    '''
+    Answer the probes and the records of a single client with a dictionary as memory
+
+    The config space reads (error shift register) always return 0.
+    '''
+
+    def __init__(self):
+        self.mem={}
+        self.packets=0
+        self.sock=socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.LUN="udp/127.0.0.1/%d" % (self.sock.getsockname()[1])
+        self.thread=threading.Thread(target=self.serve)
+        self.thread.daemon=True
+        self.thread.start()
+
+    def close(self):
+        self.sock.close()
+
+    def serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except socket.error:
+                return
+            magic, flags, sizes = struct.unpack_from(">HBB", data, 0)
+            if flags & EB_FLAG_PF:
+                tag=struct.unpack_from(">I", data, 4)[0]
+                self.sock.sendto(struct.pack(">HBBI", EB_MAGIC, 0x10 | EB_FLAG_PR, 0x44, tag), addr)
+                continue
+            self.packets+=1
+            self.sock.sendto(struct.pack(">HBB", EB_MAGIC, 0x10, 0x44)+self.records(data, 4), addr)
+
+    def records(self, data, pos):
+        out=[]
+        while pos+4<=len(data):
+            rflags, byteen, wcount, rcount = struct.unpack_from(">BBBB", data, pos)
+            pos+=4
+            if wcount:
+                vals=struct.unpack_from(">I%dI" % wcount, data, pos)
+                pos+=4*(wcount+1)
+                for i, v in enumerate(vals[1:]):
+                    self.mem[vals[0]+[4*i, 0][bool(rflags & EB_RECORD_WFF)]]=v
+            if rcount:
+                vals=struct.unpack_from(">I%dI" % rcount, data, pos)
+                pos+=4*(rcount+1)
+                rdata=[[self.mem.get(a, 0), 0][bool(rflags & EB_RECORD_RCA)] for a in vals[1:]]
+                out.append(struct.pack(">BBBBI%dI" % rcount, 0, 0xF, rcount, 0, vals[0], *rdata))
+        return "".join(out)
@@ -0,0 +1,34 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Helpers to build SDB tables for the tests
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import struct
+
+from bridges.sdb import SDB_MAGIC
+
+GSI   = 0x651
+CERN  = 0xCE42
+SEVEN = 0x7501
+
+
+def record(rtype, specific="\0"*8, first=0, end=0, vendor=0, device=0, name="", date=0x20151016):
+    ''' Return the 64 bytes of a component record (interconnect, device, bridge, integration) '''
+    return struct.pack(">8sQQQIII19sB", specific, first, end, vendor, device, 1, date, name.ljust(19), rtype)
+
+def interconnect(nrecords, end=0xFFFFF, name="WB4-Crossbar"):
+    return record(0x00, struct.pack(">IHBB", SDB_MAGIC, nrecords, 1, 0), 0, end, GSI, 0xe6a542c9, name)
+
+def device(first, size, vendor, devid, name):
+    return record(0x01, struct.pack(">HBBI", 0, 1, 0, 4), first, first+size-1, vendor, devid, name)
+
+def bridge(first, size, child, name="WB4-Bridge"):
+    return record(0x02, struct.pack(">Q", child), first, first+size-1, GSI, 0xeef0b198, name)
+
+def table(*records):
+    ''' Return a SDB table: the interconnect record followed by records '''
+    return interconnect(len(records)+1)+"".join(records)
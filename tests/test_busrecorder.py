@@ -0,0 +1,88 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the BusRecorder/BusReplayer round trip
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from core.gendrvr import BusCritical
+from bridges.simbus import SimBus
+from bridges.busrecorder import *
+
+
+class TestBusRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir=tempfile.mkdtemp()
+        self.fpath=os.path.join(self.tmpdir, "session.p7sbus")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self, bus):
+        rec=BusRecorder(bus, self.fpath)
+        rec.devwrite(0, 0x100, 4, 0x12345678)
+        rec.devread(0, 0x100, 4)
+        rec.devblockwrite(0, 0x1000, range(8))
+        rec.devblockread_into(0, 0x1000, memoryview(bytearray(16)))
+        with rec.transaction() as t:
+            t.write(0x200, 0x5)
+            t.rmw(0x100, 0xFF, 0xAB)
+            t.read(0x100)
+        return rec
+
+    def test_records(self):
+        rec=self.record(SimBus())
+        rec.close_log()
+        records=list(BusReplayer(self.fpath).records())
+        self.assertEqual([r[1] for r in records], [LOG_WRITE, LOG_READ, LOG_BLOCKWRITE, LOG_BLOCKREAD,
+                                                  LOG_TRANSACTION, LOG_WRITE, LOG_RMW, LOG_READ])
+        self.assertEqual(records[2][8].tolist(), range(8))
+        self.assertEqual(records[3][8].tolist(), range(4))
+        self.assertEqual(records[6][4], (0xFF << 32) | 0xAB)
+        self.assertEqual(records[7][4], 0x123456AB)
+
+    def test_flush_on_delete(self):
+        rec=self.record(SimBus())
+        del rec
+        self.assertEqual(len(list(BusReplayer(self.fpath).records())), 8)
+
+    def test_replay(self):
+        bus=SimBus()
+        self.record(bus).close_log()
+        sim=SimBus()
+        nops, elapsed, mismatches = BusReplayer(self.fpath).replay(sim, check=True)
+        self.assertEqual((nops, mismatches), (5, 0))
+        self.assertEqual(sim.mem, bus.mem)
+
+    def test_mismatch(self):
+        self.record(SimBus()).close_log()
+        sim=SimBus()
+        sim.attach(0x1000, SimRegisterZero(), size=0x20)
+        self.assertEqual(BusReplayer(self.fpath).replay(sim, check=True)[2], 1)
+
+    def test_not_a_log(self):
+        with open(self.fpath, "wb") as f: f.write("garbage")
+        self.assertRaises(BusCritical, BusReplayer, self.fpath)
+
+
+class SimRegisterZero(object):
+    ''' Window that ignores the writes and reads 0 '''
+
+    def read(self, bus, offset):
+        return 0
+
+    def write(self, bus, offset, datum):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
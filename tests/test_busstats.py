@@ -0,0 +1,64 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the BusStats wrapper
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import random
+import unittest
+
+from bridges.simbus import SimBus
+from bridges.busstats import BusStats
+
+
+class TestRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.stats=BusStats(SimBus())
+        self.bridge=self.stats.add_range("bridge", 0x20000, 0x10000)
+        self.dev=self.stats.add_range("dev", 0x20400, 0x100)
+        self.uart=self.stats.add_range("uart", 0x100, 0x100)
+
+    def test_nested(self):
+        self.assertIs(self.stats.getrange(0x20000), self.bridge)
+        self.assertIs(self.stats.getrange(0x20400), self.dev)
+        self.assertIs(self.stats.getrange(0x204FF), self.dev)
+        self.assertIs(self.stats.getrange(0x20500), self.bridge)
+        self.assertIs(self.stats.getrange(0x2FFFF), self.bridge)
+
+    def test_other(self):
+        for offset in (0x0, 0xFF, 0x200, 0x1FFFF, 0x30000, 0xFFFFFFFF):
+            self.assertIs(self.stats.getrange(offset), self.stats.other)
+
+    def test_add_after_lookup(self):
+        self.assertIs(self.stats.getrange(0x20800), self.bridge)
+        reg=self.stats.add_range("reg", 0x20800, 0x4)
+        self.assertIs(self.stats.getrange(0x20800), reg)
+        self.assertIs(self.stats.getrange(0x20804), self.bridge)
+
+    def test_linear(self):
+        ## Same result as looking back through the ranges sorted by first address
+        rnd=random.Random(7)
+        for i in range(50):
+            first=rnd.randrange(0, 0x10000, 0x10)
+            self.stats.add_range("r%d" % i, first, rnd.randrange(0x10, 0x2000, 0x10))
+        for offset in range(0, 0x31000, 0x8):
+            expected=self.stats.other
+            for r in reversed(self.stats._ranges):
+                if r.first<=offset and offset<=r.last:
+                    expected=r
+                    break
+            self.assertIs(self.stats.getrange(offset), expected)
+
+    def test_count(self):
+        self.stats.devwrite(0, 0x20404, 4, 1)
+        self.stats.devread(0, 0x20404, 4)
+        self.stats.devread(0, 0x20800, 4)
+        self.assertEqual((self.dev.reads, self.dev.writes, self.bridge.reads), (1, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the DevMem bridge on a regular file
+
+Run from the top directory with: python -m unittest discover -s tests -t .
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import os
+import struct
+import tempfile
+import unittest
+from array import array
+
+from bridges.devmem import DevMem
+from core.gendrvr import BusCritical, BusWarning
+
+
+class TestDevMem(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.fpath = tempfile.mkstemp()
+        os.write(fd, struct.pack("=256I", *range(256)))
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.fpath)
+
+    def test_lazy_open_read(self):
+        bus=DevMem(0, LUN=self.fpath)
+        self.assertIsNone(bus.mem)
+        self.assertEqual(bus.read(0x10), 4)
+
+    def test_lazy_open_write(self):
+        bus=DevMem(0, LUN=self.fpath)
+        bus.write(0x10, 0xCAFEBABE)
+        self.assertEqual(bus.read(0x10), 0xCAFEBABE)
+
+    def test_widths(self):
+        bus=DevMem(0, LUN=self.fpath)
+        bus.write(0x0, 0x11223344)
+        self.assertEqual(bus.read16(0x0), 0x11223344 & 0xFFFF)
+        self.assertEqual(bus.read8(0x0), 0x44)
+
+    def test_block(self):
+        bus=DevMem(0, LUN=self.fpath)
+        bus.devblockwrite(0, 0x20, [7, 8, 9])
+        self.assertEqual(bus.devblockread(0, 0x1C, 16), [7, 7, 8, 9])
+        buf=array('I', [0])*3
+        bus.devblockread_into(0, 0x20, buf, 0)
+        self.assertEqual(buf.tolist(), [7, 7, 7])
+
+    def test_out_of_window(self):
+        bus=DevMem(0, LUN=self.fpath)
+        self.assertRaises(BusWarning, bus.read, 0x400)
+
+    def test_missing_device(self):
+        bus=DevMem(0, LUN=self.fpath+".missing")
+        self.assertRaises(BusCritical, bus.read, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
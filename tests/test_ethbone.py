@@ -0,0 +1,49 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the parts of the EthBone bridge that do not need libetherbone
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import unittest
+
+from core.gendrvr import BusFuture, BusWarning
+from bridges.ethbone import _EBTransfer, eb_subnet_hosts
+
+
+class TestEBTransfer(unittest.TestCase):
+
+    def test_keep_until_all_cycles_complete(self):
+        fut=BusFuture()
+        keep=object()
+        xfer=_EBTransfer(fut, lambda: 42, keep)
+        done=[xfer.ondone(0x0), xfer.ondone(0x400)]
+        xfer.seal()
+        done[0](0, None)
+        self.assertIs(xfer.keep, keep)
+        self.assertFalse(fut.done)
+        done[1](0, None)
+        self.assertIsNone(xfer.keep)
+        self.assertEqual(fut.value, 42)
+
+    def test_error(self):
+        fut=BusFuture()
+        xfer=_EBTransfer(fut, lambda: 42)
+        done=xfer.ondone(0x100)
+        xfer.seal()
+        done(-7, None)
+        self.assertRaises(BusWarning, getattr, fut, "value")
+
+
+class TestSubnet(unittest.TestCase):
+
+    def test_hosts(self):
+        self.assertEqual(eb_subnet_hosts("192.168.7.0/30"), ["192.168.7.1", "192.168.7.2"])
+        self.assertEqual(eb_subnet_hosts("10.0.0.5"), ["10.0.0.5"])
+        self.assertRaises(ValueError, eb_subnet_hosts, "10.0.0.0/33")
+
+
+if __name__ == '__main__':
+    unittest.main()
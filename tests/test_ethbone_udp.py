@@ -0,0 +1,78 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the pure-Python Etherbone client against a local Etherbone slave
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import unittest
+
+from core.gendrvr import BusWarning, BusCritical
+from bridges.ethbone import EthBone
+from bridges.ethbone_udp import EthBoneUDP, eb_split_cycles, EB_MAX_RECORDS
+from tests.ebslave import EBSlave
+
+
+class TestEthBoneUDP(unittest.TestCase):
+
+    def setUp(self):
+        self.slave=EBSlave()
+        self.bus=EthBoneUDP(self.slave.LUN)
+
+    def tearDown(self):
+        self.bus.close()
+        self.slave.close()
+
+    def test_single(self):
+        self.bus.devwrite(0, 0x100, 4, 0xCAFEBABE)
+        self.assertEqual(self.slave.mem[0x100], 0xCAFEBABE)
+        self.assertEqual(self.bus.devread(0, 0x100, 4), 0xCAFEBABE)
+
+    def test_width(self):
+        self.assertRaises(BusWarning, self.bus.devwrite, 0, 0x100, 1, 5)
+
+    def test_block(self):
+        self.bus.devblockwrite(0, 0x1000, range(3000))
+        self.assertEqual(self.bus.devblockread(0, 0x1000, 4*3000), range(3000))
+        self.assertTrue(self.slave.packets>2)
+
+    def test_transaction(self):
+        futs=[]
+        with self.bus.transaction() as tr:
+            for i in range(500):
+                tr.write(0x20000+8*i, i)
+                futs.append(tr.read(0x20000+8*i))
+        self.assertEqual([f.value for f in futs], range(500))
+
+
+class TestSplitCycles(unittest.TestCase):
+
+    def test_record_limit(self):
+        ## Scattered writes each need a record of their own
+        ops=[(True, 0x1000+64*i, i) for i in range(200)]
+        cycles=eb_split_cycles(ops, 65536)
+        self.assertEqual(sum(map(len, cycles)), 200)
+        self.assertTrue(all(len(c)<EB_MAX_RECORDS for c in cycles))
+
+
+class TestBackend(unittest.TestCase):
+
+    def test_python_backend(self):
+        slave=EBSlave()
+        try:
+            bus=EthBone(slave.LUN, backend="python")
+            self.assertIsInstance(bus, EthBoneUDP)
+            bus.devwrite(0, 0x40, 4, 7)
+            self.assertEqual(slave.mem[0x40], 7)
+            bus.close()
+        finally:
+            slave.close()
+
+    def test_unknown_backend(self):
+        self.assertRaises(BusCritical, EthBone, "", backend="usb")
+
+
+if __name__ == '__main__':
+    unittest.main()
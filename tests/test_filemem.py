@@ -0,0 +1,59 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the FileMem debug driver
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from bridges.filemem import FileMem
+
+
+class TestFileMem(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir=tempfile.mkdtemp()
+        self.fpath=os.path.join(self.tmpdir, "mem.txt")
+        self.image=os.path.join(self.tmpdir, "image.bin")
+        with open(self.image, "wb") as f: f.write(struct.pack("<64I", *range(64)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_text(self):
+        mem=FileMem(self.fpath)
+        mem.devwrite(0, 0x100, 4, 0xCAFE)
+        mem.devblockwrite(0, 0x200, [1, 2, 3])
+        self.assertFalse(os.path.exists(self.fpath))
+        mem.close()
+        mem=FileMem(self.fpath)
+        self.assertEqual(mem.devread(0, 0x100, 4), 0xCAFE)
+        self.assertEqual(mem.devblockread(0, 0x200, 12), [1, 2, 3])
+        self.assertEqual(mem.find(0x104), {'pos': -1, 'val': 0})
+
+    def test_image(self):
+        mem=FileMem(None, image=self.image, base=0x1000)
+        self.assertEqual(mem.devread(0, 0x1008, 4), 2)
+        self.assertEqual(mem.devblockread(0, 0x1010, 16), [4, 5, 6, 7])
+        mem.devblockwrite(0, 0x10F8, [0xAA, 0xBB])
+        mem.devwrite(0, 0x1100, 4, 0xCC) ## Out of the image
+        mem.close()
+        with open(self.image, "rb") as f: words=struct.unpack("<64I", f.read())
+        self.assertEqual(words[62:], (0xAA, 0xBB))
+        self.assertEqual(mem.mem, {0x1100: 0xCC})
+
+    def test_fifo(self):
+        mem=FileMem(None, image=self.image, base=0x1000)
+        self.assertEqual(mem.devblockread(0, 0x1004, 12, incr=0), [1, 1, 1])
+        mem.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
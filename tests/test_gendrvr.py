@@ -0,0 +1,179 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the common parts of the drivers: BusPolicy, BusFuture, BusTransaction and toWords()
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import time
+import unittest
+from array import array
+
+from core.gendrvr import *
+from bridges.simbus import SimBus
+from bridges.filemem import FileMem
+
+
+class FlakyBus(SimBus):
+    ''' SimBus whose next accesses fail with BusWarning '''
+
+    def __init__(self, failures=0):
+        SimBus.__init__(self)
+        self.failures=failures
+        self.calls=0
+
+    def devread(self, bar, offset, width):
+        self.calls+=1
+        if self.failures:
+            self.failures-=1
+            raise BusWarning("No reply @0x%08x" % (offset))
+        return SimBus.devread(self, bar, offset, width)
+
+
+class CountingPolicy(BusPolicy):
+
+    def call(self, func, *args, **kwargs):
+        self.calls.append(func.__name__)
+        return BusPolicy.call(self, func, *args, **kwargs)
+
+
+class TestBusPolicy(unittest.TestCase):
+
+    def test_retry(self):
+        bus=FlakyBus(2)
+        bus.mem[0x100]=0x1234
+        bus.set_policy(BusPolicy(retries=2, backoff=0.0))
+        self.assertEqual(bus.devread(bus.bar, 0x100, 4), 0x1234)
+        self.assertEqual(bus.calls, 3)
+        self.assertEqual(bus.policy.failures, 0)
+
+    def test_retries_exhausted(self):
+        bus=FlakyBus(3)
+        bus.set_policy(BusPolicy(retries=1, backoff=0.0))
+        self.assertRaises(BusWarning, bus.devread, bus.bar, 0x100, 4)
+        self.assertEqual(bus.calls, 2)
+
+    def test_not_retried(self):
+        policy=BusPolicy(retries=3, backoff=0.0)
+        def fail():
+            fail.calls+=1
+            raise BusCritical("Device closed")
+        fail.calls=0
+        self.assertRaises(BusCritical, policy.call, fail)
+        self.assertEqual((fail.calls, policy.failures), (1, 1))
+
+    def test_breaker(self):
+        bus=FlakyBus(10)
+        policy=BusPolicy(retries=0, backoff=0.0, threshold=3, recovery=60)
+        bus.set_policy(policy)
+        for i in range(3):
+            self.assertRaises(BusWarning, bus.devread, bus.bar, 0x100, 4)
+        self.assertTrue(policy.isopen())
+        self.assertRaises(BusCircuitOpen, bus.devread, bus.bar, 0x100, 4)
+        self.assertEqual(bus.calls, 3)
+
+        ## After the recovery time a single access probes the device
+        policy.opened=time.time()-61
+        self.assertRaises(BusWarning, bus.devread, bus.bar, 0x100, 4)
+        self.assertTrue(policy.isopen())
+        bus.failures=0
+        policy.opened=time.time()-61
+        self.assertEqual(bus.devread(bus.bar, 0x100, 4), 0)
+        self.assertFalse(policy.isopen())
+        self.assertEqual(policy.failures, 0)
+
+    def test_applied_once(self):
+        ## The block and transaction methods call the primitives without the wrapper
+        bus=FileMem(None)
+        policy=CountingPolicy(retries=2, backoff=0.0)
+        policy.calls=[]
+        bus.set_policy(policy)
+        bus.devblockread(bus.bar, 0x0, 16, incr=0x0)
+        bus.devblockwrite(bus.bar, 0x0, [1, 2], incr=0x0)
+        with bus.transaction() as t:
+            t.read(0x0)
+            t.write(0x4, 1)
+        self.assertEqual(policy.calls, ["devblockread_into", "devblockwrite", "commit_transaction"])
+
+    def test_remove(self):
+        bus=FlakyBus(1)
+        bus.set_policy(BusPolicy(retries=1, backoff=0.0))
+        bus.set_policy(None)
+        self.assertNotIn("devread", bus.__dict__)
+        self.assertRaises(BusWarning, bus.devread, bus.bar, 0x100, 4)
+
+
+class TestBusFuture(unittest.TestCase):
+
+    def test_pending(self):
+        fut=BusFuture()
+        self.assertRaises(BusWarning, getattr, fut, "value")
+        fut.set(0x10)
+        self.assertEqual((fut.value, int(fut), repr(fut)), (0x10, 16, "<BusFuture 0x10>"))
+
+    def test_waiter(self):
+        fut=BusFuture(lambda f: f.set(7))
+        self.assertEqual(fut.value, 7)
+
+    def test_error(self):
+        fut=BusFuture()
+        fut.fail(BusWarning("Lost"))
+        self.assertTrue(fut.done)
+        self.assertRaises(BusWarning, getattr, fut, "value")
+
+
+class TestTransaction(unittest.TestCase):
+
+    def check(self, bus):
+        bus.devwrite(bus.bar, 0x108, 4, 0x12345678)
+        with bus.transaction() as t:
+            w=t.write(0x100, 0x1)
+            r=t.read(0x100)
+            m=t.rmw(0x108, 0xFF00, 0xAB00)
+            r2=t.read(0x108)
+        self.assertEqual((w.value, r.value, m.value, r2.value), (0x1, 0x1, 0x12345678, 0x1234AB78))
+        self.assertEqual(bus.devread(bus.bar, 0x108, 4), 0x1234AB78)
+
+    def test_simbus(self):
+        bus=SimBus()
+        self.check(bus)
+        self.assertEqual(bus.cycles, 3)
+
+    def test_default(self):
+        self.check(FileMem(None))
+
+    def test_exception(self):
+        bus=SimBus()
+        try:
+            with bus.transaction() as t:
+                t.write(0x100, 0x1)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual((bus.cycles, bus.mem.get(0x100)), (0, None))
+
+
+class TestToWords(unittest.TestCase):
+
+    def test_unsigned_array(self):
+        words=array('I', [1, 2, 3])
+        self.assertIs(GenDrvr.toWords(words), words)
+
+    def test_signed(self):
+        self.assertEqual(GenDrvr.toWords(array('i', [-1, 2])).tolist(), [0xFFFFFFFF, 2])
+        self.assertEqual(GenDrvr.toWords([-1, 0x80000000]).tolist(), [0xFFFFFFFF, 0x80000000])
+
+    def test_by_value(self):
+        ## Arrays that are not 32bits words are converted value by value
+        self.assertEqual(GenDrvr.toWords(array('H', [1, 0xFFFF])).tolist(), [1, 0xFFFF])
+
+    def test_buffer(self):
+        raw=array('I', [0xCAFE, 0xBEEF]).tostring()
+        self.assertEqual(GenDrvr.toWords(bytearray(raw)).tolist(), [0xCAFE, 0xBEEF])
+        self.assertEqual(GenDrvr.toWords(memoryview(raw)).tolist(), [0xCAFE, 0xBEEF])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the SDB parser, its lookups, lazy parse and cache on a SimBus
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import os
+import copy
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+
+from bridges.simbus import SimBus
+from bridges.sdb import SDBNode, SDBRecord
+from tests.sdbimage import *
+
+ROOT  = 0x1000
+CHILD = 0x3000
+
+
+class SDBTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bus=SimBus()
+        self.load(self.child())
+        self.bus.load_image(table(device(0x100, 0x100, CERN, 0x1234, "dev-a"),
+                                  "\x55"*63+"\x83", ## Record of an unknown type
+                                  bridge(0x20000, 0x10000, CHILD)), ROOT, sdbroot=True)
+        self.tmpdir=tempfile.mkdtemp()
+        self.fpath=os.path.join(self.tmpdir, "sdb.cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def child(self, first=0x400):
+        return table(device(first, 0x100, SEVEN, 0x99, "dev-a2"))
+
+    def load(self, raw):
+        self.bus.load_image(raw, CHILD)
+
+    def names(self, node):
+        return [(e.name.strip(), addr) for e, addr, buspath in node.walk()]
+
+
+class TestSDBParse(SDBTestCase):
+
+    def test_walk(self):
+        node=SDBNode(self.bus, None)
+        node.parse()
+        self.assertEqual(node.base, ROOT)
+        self.assertEqual(self.names(node), [("dev-a", 0x100), ("WB4-Bridge", 0x20000), ("dev-a2", 0x20400)])
+
+    def test_unknown_record(self):
+        node=SDBNode(self.bus, ROOT)
+        node.parse()
+        el=node.elements[1][0]
+        self.assertEqual(el.record_type, 0x83)
+        self.assertFalse(el.is_component())
+        self.assertRaises(BaseException, str, el)
+
+    def test_lookups(self):
+        node=SDBNode(self.bus, ROOT)
+        node.parse()
+        self.assertEqual(node.findProduct(SEVEN, 0x99)[0][1], 0x20400)
+        self.assertEqual(node.findProduct(SEVEN, 0x99, first=True)[0][2], "3.1")
+        self.assertEqual(node.findName("dev-a")[0][1], 0x100)
+        self.assertEqual(node.findAddress(0x20480)[0].name.strip(), "dev-a2")
+        self.assertIsNone(node.findAddress(0x300))
+
+    def test_records_are_readonly_and_picklable(self):
+        node=SDBNode(self.bus, ROOT)
+        node.parse()
+        p=node.findProduct(SEVEN, 0x99)[0]
+        self.assertRaises(AttributeError, setattr, p[0], "name", "x")
+        for q in (pickle.loads(pickle.dumps(p, 2)), copy.copy(p), copy.deepcopy(p)):
+            self.assertEqual((q[0].name, q[0].address, q[1], q[2]), (p[0].name, p[0].address, p[1], p[2]))
+            self.assertTrue(isinstance(q[0], SDBRecord))
+
+    def test_lazy(self):
+        node=SDBNode(self.bus, ROOT)
+        node.parse(lazy=True)
+        child=node.elements[2][1]
+        self.assertFalse(child.parsed)
+        self.assertEqual(node.findProduct(CERN, 0x1234, first=True)[0][1], 0x100)
+        self.assertFalse(child.parsed)
+        self.assertEqual(node.findProduct(SEVEN, 0x99, first=True)[0][1], 0x20400)
+        self.assertTrue(child.parsed)
+
+
+class TestSDBCache(SDBTestCase):
+
+    def cached_tables(self):
+        with open(self.fpath, "rb") as f:
+            return pickle.load(f)["tables"]
+
+    def test_cache_hit(self):
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        self.assertEqual(sorted(self.cached_tables()), [ROOT, CHILD])
+        self.bus.reset_stats()
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        self.assertEqual(self.names(node)[-1], ("dev-a2", 0x20400))
+        self.assertEqual(self.bus.cycles, 2) ## One burst per table
+
+    def test_root_changed(self):
+        SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        self.bus.load_image(table(device(0x200, 0x100, CERN, 0x1234, "dev-b")), ROOT)
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        self.assertEqual(self.names(node), [("dev-b", 0x200)])
+
+    def test_child_changed(self):
+        SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        ## Same interconnect record, the device has moved
+        self.load(self.child(0x500))
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath)
+        self.assertEqual(self.names(node)[-1], ("dev-a2", 0x20500))
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath, lazy=True)
+        self.assertEqual(node.findProduct(SEVEN, 0x99, first=True)[0][1], 0x20500)
+
+    def test_lazy_expand_updates_cache(self):
+        node=SDBNode.parse_cached(self.bus, "sim", self.fpath, lazy=True)
+        self.assertEqual(sorted(self.cached_tables()), [ROOT])
+        node.findProduct(SEVEN, 0x99, first=True)
+        self.assertEqual(sorted(self.cached_tables()), [ROOT, CHILD])
+
+    def test_no_cache_file(self):
+        self.assertIsNone(SDBNode.load_cache(self.bus, "sim", self.fpath))
+        self.assertFalse(os.path.exists(self.fpath))
+
+
+if __name__ == '__main__':
+    unittest.main()
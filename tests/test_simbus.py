@@ -0,0 +1,76 @@
+#!   /usr/bin/env   python
+# -*- coding: utf-8 -*
+'''
+Tests of the SimBus simulator
+
+@file
+@copyright LGPL v2.1
+@ingroup tests
+'''
+import unittest
+from array import array
+
+from core.gendrvr import BusWarning
+from bridges.simbus import SimBus, SimRegister, SimFifo, SimStatus
+
+
+class TestSimBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus=SimBus(access_latency=0.001, cycle_latency=0.01)
+
+    def test_widths(self):
+        ## The byte lanes are big endian as on Wishbone
+        self.bus.devwrite(0, 0x100, 4, 0x11223344)
+        self.assertEqual(self.bus.devread(0, 0x101, 1), 0x22)
+        self.assertEqual(self.bus.devread(0, 0x102, 2), 0x3344)
+        self.bus.devwrite(0, 0x100, 1, 0xAA)
+        self.assertEqual(self.bus.devread(0, 0x100, 4), 0xAA223344)
+        self.bus.devwrite(0, 0x200, 8, 0x0102030405060708)
+        self.assertEqual(self.bus.devread(0, 0x204, 4), 0x05060708)
+        self.assertEqual(self.bus.devread(0, 0x200, 8), 0x0102030405060708)
+
+    def test_timing(self):
+        self.bus.devblockwrite(0, 0x1000, range(10))
+        self.bus.devread(0, 0x1000, 4)
+        self.assertEqual((self.bus.cycles, self.bus.accesses), (2, 11))
+        self.assertAlmostEqual(self.bus.now, 2*0.01+11*0.001)
+        self.bus.reset_stats()
+        self.assertEqual((self.bus.cycles, self.bus.now), (0, 0.0))
+
+    def test_block_into(self):
+        self.bus.devblockwrite(0, 0x1000, array('I', [1, 2, 3, 4]))
+        buf=bytearray(8)
+        self.bus.devblockread_into(0, 0x1004, buf)
+        self.assertEqual(array('I', str(buf)).tolist(), [2, 3])
+
+    def test_fifo(self):
+        fifo=self.bus.attach(0x500, SimFifo([7, 8], empty=0xFFFFFFFF))
+        self.bus.devblockwrite(0, 0x500, [1, 2, 3], incr=0)
+        self.assertEqual(fifo.written, [1, 2, 3])
+        self.assertEqual(self.bus.devblockread(0, 0x500, 12, incr=0), [7, 8, 0xFFFFFFFF])
+
+    def test_register(self):
+        reg=self.bus.attach(0x600, SimRegister(onread=lambda bus, offset: offset), size=0x10)
+        self.assertEqual(self.bus.devread(0, 0x608, 4), 0x8)
+        self.bus.detach(0x600)
+        self.assertEqual(self.bus.devread(0, 0x608, 4), 0)
+
+    def test_status(self):
+        self.bus.attach(0x700, SimStatus(busymask=0x1, busytime=0.05))
+        self.bus.devwrite(0, 0x700, 4, 0x10)
+        self.assertEqual(self.bus.devread(0, 0x700, 4), 0x11)
+        while self.bus.devread(0, 0x700, 4) & 0x1: pass
+        self.assertTrue(self.bus.now>=0.05)
+
+    def test_strict(self):
+        bus=SimBus(strict=True)
+        self.assertRaises(BusWarning, bus.devread, 0, 0x100, 4)
+        bus.load_image("\x01\x02\x03\x04\x05", 0x100, sdbroot=True)
+        self.assertEqual(bus.devread(0, 0x100, 4), 0x01020304)
+        self.assertEqual(bus.devread(0, 0x104, 4), 0x05000000)
+        self.assertEqual(bus.getsdbroot(), 0x100)
+
+
+if __name__ == '__main__':
+    unittest.main()